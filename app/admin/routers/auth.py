@@ -3,10 +3,11 @@ Auth Router - 认证路由
 """
 from fastapi import APIRouter, Request, Depends
 
-from core.jwtauth import MapClaims
+from core.jwtauth import MapClaims, user
+from common.response import FastJSONResponse, TrustedRoute
 from common.middleware import jwt_required, get_jwt_auth
 
-router = APIRouter(prefix="/api/v1", tags=["认证"])
+router = APIRouter(prefix="/api/v1", tags=["认证"], route_class=TrustedRoute)
 
 
 @router.post("/login")
@@ -30,7 +31,7 @@ async def logout(request: Request, claims: MapClaims = Depends(jwt_required)):
 @router.get("/user/profile")
 async def get_user_info(request: Request, claims: MapClaims = Depends(jwt_required)):
 
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200,
         content={
             "code": 200,
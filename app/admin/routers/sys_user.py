@@ -6,13 +6,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from core.runtime import get_db
 from common.schemas.pagination import PaginationRequest, PaginationResponse
 from common.schemas.response import APIResponse
+from common.response import TrustedRoute
 from common.middleware.auth import jwt_required
 from core.jwtauth import MapClaims
 from common.middleware.permission import check_permission, DataPermission
+from common.middleware.conditional import Conditional
 from app.admin.services.sys_user import SysUserService
 from app.admin.schemas.sys_user import SysUserCreate, SysUserUpdate, SysUserQuery, SysUserResponse
 
-router = APIRouter(prefix="/api/v1/users", tags=["用户管理"])
+router = APIRouter(prefix="/api/v1/users", tags=["用户管理"], route_class=TrustedRoute)
 
 
 @router.get("/page", response_model=APIResponse[PaginationResponse[SysUserResponse]])
@@ -25,12 +27,19 @@ async def get_user_page(
     db: AsyncSession = Depends(get_db),
     claims: MapClaims = Depends(jwt_required),
     permission: DataPermission = Depends(check_permission("sys:user:list")),
+    conditional: Conditional = Depends(),
 ):
-    """分页查询用户"""
+    """分页查询用户（支持 If-None-Match 条件请求）"""
     pagination = PaginationRequest(page=page, page_size=page_size)
     query = SysUserQuery(username=username, phone=phone, status=status)
     service = SysUserService(db)
-    result = await service.get_page(pagination, query)
+    # 数据未变化时直接返回 304，不加载行数据
+    # 删除为物理删除，不会更新 max(updated_at)，因此不返回 Last-Modified，只用包含记录数的 ETag 校验
+    updated_at, total = await service.get_page_version(query)
+    not_modified = conditional.check(updated_at, total)
+    if not_modified:
+        return not_modified
+    result = await service.get_page(pagination, query, total=total)
     return APIResponse(data=result)
 
 
@@ -39,12 +48,17 @@ async def get_user(
     user_id: int,
     db: AsyncSession = Depends(get_db),
     claims: MapClaims = Depends(jwt_required),
+    conditional: Conditional = Depends(),
 ):
-    """获取用户详情"""
+    """获取用户详情（支持 If-None-Match / If-Modified-Since 条件请求）"""
     service = SysUserService(db)
     user = await service.get_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
+    # 数据未变化时跳过序列化
+    not_modified = conditional.check(user.updated_at, last_modified=user.updated_at)
+    if not_modified:
+        return not_modified
     return APIResponse(data=SysUserResponse.model_validate(user))
 
 
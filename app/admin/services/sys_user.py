@@ -1,7 +1,8 @@
 """
 SysUser service - 用户服务
 """
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Tuple
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import defer
@@ -17,14 +18,9 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 class SysUserService(BaseService):
     """系统用户服务"""
     
-    async def get_page(
-        self,
-        pagination: PaginationRequest,
-        query: Optional[SysUserQuery] = None,
-    ) -> PaginationResponse[SysUserResponse]:
-        """分页查询用户"""
-        offset = (pagination.page - 1) * pagination.page_size
-        stmt = select(SysUser).options(defer(SysUser.password))
+    @staticmethod
+    def _filter(stmt, query: Optional[SysUserQuery] = None):
+        """添加查询条件"""
         if query:
             if query.username:
                 stmt = stmt.where(SysUser.username.like(f"%{query.username}%"))
@@ -32,13 +28,36 @@ class SysUserService(BaseService):
                 stmt = stmt.where(SysUser.phone == query.phone)
             if query.status is not None:
                 stmt = stmt.where(SysUser.status == query.status)
-        count_stmt = select(func.count()).select_from(stmt.subquery())
-        total_result = await self.db.execute(count_stmt)
-        total = total_result.scalar() or 0
+        return stmt
+    
+    async def get_page_version(self, query: Optional[SysUserQuery] = None) -> Tuple[Optional[datetime], int]:
+        """
+        查询结果的数据版本（用于条件请求），一次聚合查询，不加载行数据
+        
+        Returns:
+            Tuple[Optional[datetime], int]: (最大 updated_at, 记录数)
+        """
+        stmt = self._filter(select(func.max(SysUser.updated_at), func.count(SysUser.id)), query)
+        updated_at, total = (await self.db.execute(stmt)).one()
+        return updated_at, total or 0
+    
+    async def get_page(
+        self,
+        pagination: PaginationRequest,
+        query: Optional[SysUserQuery] = None,
+        total: Optional[int] = None,
+    ) -> PaginationResponse[SysUserResponse]:
+        """分页查询用户（已知记录数时跳过 count 查询）"""
+        offset = (pagination.page - 1) * pagination.page_size
+        stmt = self._filter(select(SysUser).options(defer(SysUser.password)), query)
+        if total is None:
+            count_stmt = select(func.count()).select_from(stmt.subquery())
+            total_result = await self.db.execute(count_stmt)
+            total = total_result.scalar() or 0
         stmt = stmt.offset(offset).limit(pagination.page_size)
         result = await self.db.execute(stmt)
         users = result.scalars().all()
-        return PaginationResponse(
+        return PaginationResponse[SysUserResponse](
             page=pagination.page,
             page_size=pagination.page_size,
             total=total,
@@ -1,37 +1,84 @@
 """
 Middleware package - 中间件
 """
-from common.middleware.request_id import request_id_middleware
-from common.middleware.logger import logger_middleware
-from common.middleware.error_handler import error_handler_middleware
+from common.middleware.request_id import RequestIdMiddleware, request_id_middleware
+from common.middleware.logger import LoggerMiddleware, logger_middleware
+from common.middleware.error_handler import ErrorHandlerMiddleware, error_handler_middleware
 from common.middleware.auth import init_auth_middleware, jwt_required, get_jwt_auth
 from common.middleware.permission import DataPermission, check_permission
+from common.middleware.conditional import Conditional, make_etag
 from common.middleware.rate_limit import (
+    RateLimitMiddleware,
     rate_limit_middleware,
     init_rate_limiter,
     get_rate_limiter,
+    close_rate_limiter,
+    get_policy_matcher,
+    get_identity_extractor,
 )
+from common.middleware.concurrency import (
+    ConcurrencyMiddleware,
+    init_load_shedder,
+    close_load_shedder,
+    get_load_shedder,
+)
+from common.middleware.compression import (
+    CompressionMiddleware,
+    init_compression,
+    close_compression,
+    get_compressor,
+)
+from common.middleware.cors import CORSPolicy, init_cors, get_cors_policy
 from common.middleware.header import (
+    NoCacheMiddleware,
+    OptionsMiddleware,
+    SecureMiddleware,
     no_cache_middleware,
     options_middleware,
     secure_middleware,
 )
+from common.middleware.pipeline import PipelineMiddleware
 from common.middleware.loader import register_middlewares
 
 __all__ = [
-    "request_id_middleware",
-    "logger_middleware",
-    "error_handler_middleware",
+    "RequestIdMiddleware",
+    "LoggerMiddleware",
+    "ErrorHandlerMiddleware",
     "init_auth_middleware",
     "jwt_required",
     "get_jwt_auth",
     "DataPermission",
     "check_permission",
-    "rate_limit_middleware",
+    "Conditional",
+    "make_etag",
+    "RateLimitMiddleware",
     "init_rate_limiter",
     "get_rate_limiter",
+    "close_rate_limiter",
+    "get_policy_matcher",
+    "get_identity_extractor",
+    "ConcurrencyMiddleware",
+    "init_load_shedder",
+    "close_load_shedder",
+    "get_load_shedder",
+    "CompressionMiddleware",
+    "init_compression",
+    "close_compression",
+    "get_compressor",
+    "CORSPolicy",
+    "init_cors",
+    "get_cors_policy",
+    "NoCacheMiddleware",
+    "OptionsMiddleware",
+    "SecureMiddleware",
+    "PipelineMiddleware",
+    "register_middlewares",
+    # 已弃用的函数式中间件（app.middleware("http") 注册，调用时发出 DeprecationWarning）
+    "request_id_middleware",
+    "logger_middleware",
+    "error_handler_middleware",
+    "rate_limit_middleware",
     "no_cache_middleware",
     "options_middleware",
     "secure_middleware",
-    "register_middlewares",
 ]
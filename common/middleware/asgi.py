@@ -0,0 +1,84 @@
+"""
+ASGI helpers - 纯 ASGI 中间件公共工具
+中间件直接操作 scope / send，不经过 BaseHTTPMiddleware 的任务、内存流与响应重新包装
+"""
+import re
+import warnings
+from typing import Optional, Pattern, Sequence, Tuple
+from starlette.responses import Response
+from starlette.types import Message, Scope
+
+
+# 响应头：(小写头名, 值)，均为 latin-1 字节串
+RawHeader = Tuple[bytes, bytes]
+
+
+def encode_headers(headers: dict) -> Tuple[RawHeader, ...]:
+    """预编码响应头"""
+    return tuple((name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items())
+
+
+def set_headers(message: Message, headers: Sequence[RawHeader]) -> None:
+    """
+    在 http.response.start 消息上设置响应头，同名头被覆盖
+    
+    Args:
+        message: http.response.start 消息
+        headers: 预编码的响应头
+    """
+    names = {name for name, _ in headers}
+    message["headers"] = [h for h in message.get("headers", ()) if h[0].lower() not in names] + list(headers)
+
+
+def apply_headers(response: Response, headers: Sequence[RawHeader]) -> None:
+    """在 Response 对象上设置预编码的响应头，同名头被覆盖（供弃用的函数式中间件使用）"""
+    for name, value in headers:
+        response.headers[name.decode("latin-1")] = value.decode("latin-1")
+
+
+def warn_deprecated(name: str, replacement: str) -> None:
+    """函数式中间件弃用警告"""
+    warnings.warn(
+        f"{name} 已弃用，请改用 {replacement}（app.add_middleware 注册）或 register_middlewares",
+        DeprecationWarning,
+        stacklevel=3,
+    )
+
+
+def get_header(scope: Scope, name: bytes) -> Optional[bytes]:
+    """
+    读取请求头（第一个同名头）
+    
+    Args:
+        scope: 请求 scope
+        name: 小写头名
+    """
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value
+    return None
+
+
+def get_state(scope: Scope) -> dict:
+    """请求级状态字典（即 request.state 的底层存储）"""
+    return scope.setdefault("state", {})
+
+
+def compile_path(path: str) -> Optional[Pattern]:
+    """
+    编译路径模式：{param} 匹配单个路径段，* 匹配任意后缀
+    
+    Returns:
+        Optional[Pattern]: 正则，不含通配符的精确路径返回 None
+    """
+    if "*" not in path and "{" not in path:
+        return None
+    regex = ""
+    for part in re.split(r"(\{[^/}]+\}|\*)", path):
+        if part == "*":
+            regex += ".*"
+        elif part.startswith("{") and part.endswith("}"):
+            regex += "[^/]+"
+        else:
+            regex += re.escape(part)
+    return re.compile(regex + "$")
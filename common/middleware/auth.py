@@ -5,6 +5,7 @@ from typing import Optional, Callable
 from fastapi import Request
 from core.config import get_settings
 from core.jwtauth import JWTAuth, MapClaims
+from common.middleware.rate_limit import get_identity_extractor
 
 
 # 全局 JWT 认证实例
@@ -137,5 +138,8 @@ async def jwt_required(request: Request) -> MapClaims:
     用于路由中需要认证的端点
     """
     auth = get_jwt_auth()
-    return await auth.middleware_func(request)
+    claims = await auth.middleware_func(request)
+    # 记录已验签 Token 的角色，供限流策略按角色匹配
+    get_identity_extractor().verified(request, claims)
+    return claims
 
@@ -0,0 +1,402 @@
+"""
+Compression middleware - 响应压缩中间件
+按 Accept-Encoding 协商 zstd / br / gzip，按内容类型与大小决定是否压缩；
+流式响应逐块压缩并立即刷新，不缓存整个响应体；
+超过 offload_size 的响应体（或单块）在线程池中压缩，避免阻塞事件循环
+"""
+import asyncio
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from core.config import CompressionTypeConfig
+from common.middleware.asgi import get_header
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli：不提供 br 编码
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # 未安装 zstandard：不提供 zstd 编码
+    zstandard = None
+
+
+# 编码名称
+ENCODING_GZIP = "gzip"
+ENCODING_BROTLI = "br"
+ENCODING_ZSTD = "zstd"
+
+# 各编码的压缩级别范围
+LEVEL_RANGES = {
+    ENCODING_GZIP: (1, 9),
+    ENCODING_BROTLI: (0, 11),
+    ENCODING_ZSTD: (1, 22),
+}
+
+# 默认压缩级别（偏向低 CPU 开销）
+DEFAULT_LEVELS = {
+    ENCODING_GZIP: 5,
+    ENCODING_BROTLI: 4,
+    ENCODING_ZSTD: 3,
+}
+
+# 不压缩的状态码：无响应体或部分内容
+_SKIP_STATUS = frozenset({204, 206, 304})
+
+
+def available_encodings() -> List[str]:
+    """当前环境可用的编码"""
+    encodings = [ENCODING_GZIP]
+    if brotli is not None:
+        encodings.append(ENCODING_BROTLI)
+    if zstandard is not None:
+        encodings.append(ENCODING_ZSTD)
+    return encodings
+
+
+class GzipEncoder:
+    """gzip 增量编码器"""
+    
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+    
+    def flush(self) -> bytes:
+        """刷新已输入的数据（流式响应每块调用）"""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    """br 增量编码器"""
+    
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+    
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+    
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    """zstd 增量编码器"""
+    
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+    
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+    
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+_ENCODERS = {
+    ENCODING_GZIP: GzipEncoder,
+    ENCODING_BROTLI: BrotliEncoder,
+    ENCODING_ZSTD: ZstdEncoder,
+}
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """
+    解析 Accept-Encoding 请求头
+    
+    Returns:
+        Dict[str, float]: {编码: q 值}
+    """
+    result: Dict[str, float] = {}
+    for part in value.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, val = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        result[name] = q
+    return result
+
+
+class Compressor:
+    """
+    响应压缩：编码协商结果按 Accept-Encoding 缓存，内容类型规则按 Content-Type 缓存
+    
+    压缩级别限制在各编码的有效范围内，默认级别偏向低 CPU 开销
+    """
+    
+    def __init__(
+        self,
+        minimum_size: int = 1024,
+        encodings: Iterable[str] = (ENCODING_ZSTD, ENCODING_BROTLI, ENCODING_GZIP),
+        levels: Optional[Dict[str, int]] = None,
+        types: Optional[List[CompressionTypeConfig]] = None,
+        cache_size: int = 1024,
+        offload_size: int = 65536,
+    ):
+        """
+        初始化响应压缩
+        
+        Args:
+            minimum_size: 最小压缩字节数（未命中类型规则覆盖时使用）
+            encodings: 服务端优先的编码顺序，当前环境不可用的编码自动跳过
+            levels: 各编码的压缩级别
+            types: 按内容类型的压缩规则（按顺序匹配，未命中的类型不压缩）
+            cache_size: 协商与规则匹配结果缓存数量
+            offload_size: 达到该字节数的响应体在线程池中压缩（zlib / brotli / zstd 压缩时释放 GIL）
+        """
+        available = available_encodings()
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.encodings = [e for e in encodings if e in available]
+        levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.levels = {e: min(max(levels[e], low), high) for e, (low, high) in LEVEL_RANGES.items()}
+        self.types = types or []
+        self.cache_size = cache_size
+        self._negotiated: "OrderedDict[bytes, Optional[str]]" = OrderedDict()
+        self._minimums: "OrderedDict[bytes, Optional[int]]" = OrderedDict()
+    
+    def _cache(self, cache: OrderedDict, key: bytes, value):
+        """写入匹配结果缓存"""
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+    
+    def negotiate(self, accept_encoding: bytes) -> Optional[str]:
+        """
+        协商响应编码：取 q 值最高的编码，q 值相同按服务端顺序
+        
+        Returns:
+            Optional[str]: 编码名称，None 表示不压缩
+        """
+        if accept_encoding in self._negotiated:
+            return self._negotiated[accept_encoding]
+        
+        accepted = parse_accept_encoding(accept_encoding.decode("latin-1"))
+        wildcard = accepted.get("*", 0.0)
+        best, best_q = None, 0.0
+        for encoding in self.encodings:
+            q = accepted.get(encoding, wildcard)
+            if q > best_q:
+                best, best_q = encoding, q
+        return self._cache(self._negotiated, accept_encoding, best)
+    
+    def minimum_for(self, content_type: bytes) -> Optional[int]:
+        """
+        内容类型对应的最小压缩字节数
+        
+        Returns:
+            Optional[int]: 最小压缩字节数，None 表示该类型不压缩
+        """
+        if content_type in self._minimums:
+            return self._minimums[content_type]
+        
+        media_type = content_type.decode("latin-1").split(";", 1)[0].strip().lower()
+        result = None
+        for rule in self.types:
+            pattern = rule.content_type.lower()
+            if media_type == pattern or (pattern.endswith("*") and media_type.startswith(pattern[:-1])):
+                if rule.enabled:
+                    result = self.minimum_size if rule.minimum_size is None else rule.minimum_size
+                break
+        return self._cache(self._minimums, content_type, result)
+    
+    def encoder(self, encoding: str):
+        """创建增量编码器"""
+        return _ENCODERS[encoding](self.levels[encoding])
+
+
+class CompressionResponder:
+    """压缩响应的 send 包装：暂存响应头，收到第一块响应体后决定是否压缩"""
+    
+    def __init__(self, compressor: Compressor, encoding: str, send: Send):
+        self.compressor = compressor
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+    
+    def _minimum_size(self, headers: List[Tuple[bytes, bytes]], status: int) -> Optional[int]:
+        """响应的最小压缩字节数，None 表示不压缩"""
+        if status < 200 or status in _SKIP_STATUS:
+            return None
+        content_type = b""
+        for name, value in headers:
+            name = name.lower()
+            if name == b"content-encoding":
+                return None
+            if name == b"cache-control" and b"no-transform" in value.lower():
+                return None
+            if name == b"content-type":
+                content_type = value
+        if not content_type:
+            return None
+        return self.compressor.minimum_for(content_type)
+    
+    async def _start(self, compress: bool, content_length: Optional[int] = None) -> None:
+        """发送暂存的响应头"""
+        message = self.start
+        headers = list(message.get("headers", ()))
+        if compress:
+            result = []
+            vary = None
+            for name, value in headers:
+                lower = name.lower()
+                if lower == b"content-length":
+                    continue
+                if lower == b"vary":
+                    vary = value
+                    continue
+                if lower == b"etag" and not value.startswith(b"W/"):
+                    # 压缩后的表示与原响应字节不同，强 ETag 降级为弱 ETag
+                    value = b"W/" + value
+                result.append((name, value))
+            result.append((b"content-encoding", self.encoding.encode("latin-1")))
+            if content_length is not None:
+                result.append((b"content-length", str(content_length).encode("latin-1")))
+            headers = result
+        else:
+            vary = next((value for name, value in headers if name.lower() == b"vary"), None)
+            headers = [h for h in headers if h[0].lower() != b"vary"]
+        # 可压缩的响应都需要 Vary: Accept-Encoding，避免共享缓存把压缩结果发给不支持的客户端
+        if vary is None:
+            vary = b"Accept-Encoding"
+        elif b"accept-encoding" not in vary.lower() and vary.strip() != b"*":
+            vary = vary + b", Accept-Encoding"
+        headers.append((b"vary", vary))
+        message["headers"] = headers
+        await self.send(message)
+    
+    def _encode(self, body: bytes, more_body: bool) -> bytes:
+        """压缩一块响应体：后续还有数据时刷新，否则结束编码"""
+        data = self.encoder.compress(body)
+        return data + (self.encoder.flush() if more_body else self.encoder.finish())
+    
+    async def encode(self, body: bytes, more_body: bool) -> bytes:
+        """压缩一块响应体，大块在线程池中压缩（同一响应的各块按顺序压缩，编码器不会被并发使用）"""
+        if len(body) >= self.compressor.offload_size:
+            return await asyncio.to_thread(self._encode, body, more_body)
+        return self._encode(body, more_body)
+    
+    async def __call__(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start = message
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            # 第一块响应体：决定是否压缩
+            minimum = self._minimum_size(self.start.get("headers", ()), self.start["status"])
+            if minimum is None:
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            if not more_body and len(body) < minimum:
+                self.passthrough = True
+                await self._start(False)
+                await self.send(message)
+                return
+            
+            self.encoder = self.compressor.encoder(self.encoding)
+            if not more_body:
+                # 完整响应体：一次压缩并设置 Content-Length
+                data = await self.encode(body, False)
+                await self._start(True, len(data))
+                await self.send({"type": "http.response.body", "body": data})
+                return
+            await self._start(True)
+        
+        # 流式响应：逐块压缩并刷新，客户端可以立即解压已收到的数据
+        data = await self.encode(body, more_body)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+# 全局压缩实例
+_compressor: Optional[Compressor] = None
+
+
+def init_compression(
+    minimum_size: int = 1024,
+    encodings: Iterable[str] = (ENCODING_ZSTD, ENCODING_BROTLI, ENCODING_GZIP),
+    gzip_level: int = 5,
+    brotli_level: int = 4,
+    zstd_level: int = 3,
+    types: Optional[List[CompressionTypeConfig]] = None,
+    offload_size: int = 65536,
+) -> Compressor:
+    """初始化全局响应压缩"""
+    global _compressor
+    levels = {ENCODING_GZIP: gzip_level, ENCODING_BROTLI: brotli_level, ENCODING_ZSTD: zstd_level}
+    _compressor = Compressor(minimum_size, encodings, levels, types, offload_size=offload_size)
+    return _compressor
+
+
+def close_compression() -> None:
+    """关闭全局响应压缩"""
+    global _compressor
+    _compressor = None
+
+
+def get_compressor() -> Optional[Compressor]:
+    """获取响应压缩实例"""
+    return _compressor
+
+
+def compression_send(scope: Scope, send: Send) -> Send:
+    """
+    按请求协商编码，返回压缩响应的 send
+    
+    Returns:
+        Send: 不压缩时返回原 send
+    """
+    compressor = _compressor
+    if not compressor or scope["method"] == "HEAD":
+        return send
+    accept_encoding = get_header(scope, b"accept-encoding")
+    if not accept_encoding:
+        return send
+    encoding = compressor.negotiate(accept_encoding)
+    if not encoding:
+        return send
+    return CompressionResponder(compressor, encoding, send)
+
+
+class CompressionMiddleware:
+    """响应压缩中间件"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        await self.app(scope, receive, compression_send(scope, send))
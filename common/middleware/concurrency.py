@@ -0,0 +1,354 @@
+"""
+Concurrency middleware - 并发限制与过载保护中间件
+按路由分类限制同时处理的请求数，持续测量事件循环延迟，过载时按优先级丢弃请求（503 + Retry-After）
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+from starlette.types import ASGIApp, Receive, Scope, Send
+from core.config import ConcurrencyClassConfig
+from core.logger import get_request_logger
+from common.response import FastJSONResponse
+from common.middleware.asgi import compile_path, get_state
+
+
+# 请求优先级：过载程度超过阈值时丢弃 low，超过两倍阈值时丢弃 normal，high 只受并发上限约束
+PRIORITY_LOW = "low"
+PRIORITY_NORMAL = "normal"
+PRIORITY_HIGH = "high"
+PRIORITIES = (PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH)
+
+
+class LoopLagMonitor:
+    """事件循环延迟监测：周期性休眠，实际唤醒时间与预期时间之差即为延迟"""
+    
+    def __init__(self, interval: float = 0.1, smoothing: float = 0.3):
+        """
+        初始化延迟监测
+        
+        Args:
+            interval: 采样间隔（秒）
+            smoothing: 指数滑动平均系数，越大对最新样本越敏感
+        """
+        self.interval = interval
+        self.smoothing = smoothing
+        # 平滑后的延迟（秒）
+        self.lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    def sample(self, lag: float) -> None:
+        """记录一个延迟样本"""
+        self.lag += self.smoothing * (max(lag, 0.0) - self.lag)
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.sample(loop.time() - expected)
+    
+    def start(self) -> None:
+        """启动采样任务（需在事件循环中调用）"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    def stop(self) -> None:
+        """停止采样任务"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+class ConcurrencyLimiter:
+    """并发限制器：最多 limit 个请求同时处理，其余请求排队等待，等待超时即拒绝"""
+    
+    def __init__(self, limit: int, queue_timeout: float = 1.0):
+        """
+        初始化并发限制器
+        
+        Args:
+            limit: 最大并发数
+            queue_timeout: 等待并发槽位的最长时间（秒）
+        """
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+    
+    async def acquire(self) -> Optional[float]:
+        """
+        获取并发槽位
+        
+        Returns:
+            Optional[float]: 排队时间（秒），等待超时返回 None
+        """
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            self.in_flight += 1
+            return 0.0
+        
+        start = time.monotonic()
+        self.waiting += 1
+        # 不使用 wait_for：Python 3.10/3.11 中超时与获取同时发生时会丢失已取得的槽位
+        waiter = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+            if not waiter.done():
+                waiter.cancel()
+                try:
+                    # 取消生效前已取得槽位时照常使用
+                    await waiter
+                except asyncio.CancelledError:
+                    return None
+        except asyncio.CancelledError:
+            # 请求被取消：归还已取得的槽位
+            if waiter.done() and not waiter.cancelled():
+                self._semaphore.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return time.monotonic() - start
+    
+    def release(self) -> None:
+        """释放并发槽位"""
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+class ConcurrencyClass:
+    """路由分类：按请求方法 + 路径模式匹配，同一分类共用一个并发限制器"""
+    
+    def __init__(
+        self,
+        name: str,
+        limiter: Optional[ConcurrencyLimiter],
+        path: str = "*",
+        methods: Iterable[str] = (),
+        priority: str = PRIORITY_NORMAL,
+    ):
+        """
+        初始化路由分类
+        
+        Args:
+            name: 分类名称
+            limiter: 并发限制器，None 表示不限制并发
+            path: 路径模式，如 /api/v1/login、/api/v1/users/{id}、/api/v1/*
+            methods: 请求方法，为空表示全部
+            priority: 优先级（low / normal / high）
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unsupported priority: {priority}")
+        self.name = name
+        self.limiter = limiter
+        self.path = path
+        self.pattern = compile_path(path)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.priority = priority
+    
+    def matches(self, method: str, path: str) -> bool:
+        """检查请求是否属于该分类"""
+        if self.methods and method not in self.methods:
+            return False
+        if self.pattern is None:
+            return path == self.path
+        return self.pattern.match(path) is not None
+
+
+class LoadShedder:
+    """
+    过载保护：过载程度取事件循环延迟与近期排队时间的较大值，
+    超过阈值丢弃 low 优先级请求，超过两倍阈值同时丢弃 normal 优先级请求
+    """
+    
+    def __init__(
+        self,
+        classes: List[ConcurrencyClass],
+        default: ConcurrencyClass,
+        lag_threshold: float = 0.2,
+        lag_interval: float = 0.1,
+        retry_after: int = 1,
+        cache_size: int = 4096,
+    ):
+        """
+        初始化过载保护
+        
+        Args:
+            classes: 路由分类列表（按优先级排列）
+            default: 未命中任何分类时使用的分类
+            lag_threshold: 过载阈值（秒）
+            lag_interval: 事件循环延迟采样间隔（秒）
+            retry_after: 拒绝请求时建议的重试秒数
+            cache_size: 分类匹配结果缓存数量
+        """
+        self.classes = classes
+        self.default = default
+        self.lag_threshold = lag_threshold
+        self.retry_after = retry_after
+        self.cache_size = cache_size
+        self.monitor = LoopLagMonitor(lag_interval)
+        # 近期排队时间（秒），与事件循环延迟使用相同的平滑系数，没有新样本时按采样间隔衰减
+        self._queue_time = 0.0
+        self._queue_at = time.monotonic()
+        self._cache: "OrderedDict[Tuple[str, str], ConcurrencyClass]" = OrderedDict()
+    
+    def resolve(self, method: str, path: str) -> ConcurrencyClass:
+        """解析请求所属的路由分类（结果按方法 + 路径缓存）"""
+        cache_key = (method, path)
+        result = self._cache.get(cache_key)
+        if result is not None:
+            return result
+        
+        result = next((c for c in self.classes if c.matches(method, path)), self.default)
+        self._cache[cache_key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+    
+    @property
+    def queue_time(self) -> float:
+        """近期排队时间（秒）"""
+        decay = (1 - self.monitor.smoothing) ** ((time.monotonic() - self._queue_at) / self.monitor.interval)
+        return self._queue_time * decay
+    
+    @property
+    def overload(self) -> float:
+        """当前过载程度（秒）"""
+        return max(self.monitor.lag, self.queue_time)
+    
+    def should_shed(self, route_class: ConcurrencyClass) -> bool:
+        """按优先级判断是否丢弃请求"""
+        if route_class.priority == PRIORITY_HIGH:
+            return False
+        threshold = self.lag_threshold if route_class.priority == PRIORITY_LOW else self.lag_threshold * 2
+        return self.overload > threshold
+    
+    def record_queue_time(self, waited: float) -> None:
+        """记录一次排队时间"""
+        queue_time = self.queue_time
+        self._queue_time = queue_time + self.monitor.smoothing * (waited - queue_time)
+        self._queue_at = time.monotonic()
+    
+    def start(self) -> None:
+        """启动事件循环延迟监测"""
+        self.monitor.start()
+    
+    def close(self) -> None:
+        """停止事件循环延迟监测"""
+        self.monitor.stop()
+
+
+# 全局过载保护实例
+_load_shedder: Optional[LoadShedder] = None
+
+
+def init_load_shedder(
+    limit: int = 200,
+    queue_timeout: float = 1.0,
+    lag_threshold: float = 0.2,
+    lag_interval: float = 0.1,
+    retry_after: int = 1,
+    classes: Optional[List[ConcurrencyClassConfig]] = None,
+) -> LoadShedder:
+    """初始化全局过载保护并启动事件循环延迟监测（需在事件循环中调用）"""
+    global _load_shedder
+    compiled = []
+    for config in classes or []:
+        limiter = ConcurrencyLimiter(config.limit, queue_timeout) if config.limit > 0 else None
+        compiled.append(ConcurrencyClass(
+            name=config.name,
+            limiter=limiter,
+            path=config.path,
+            methods=config.methods,
+            priority=config.priority,
+        ))
+    default = ConcurrencyClass("default", ConcurrencyLimiter(limit, queue_timeout) if limit > 0 else None)
+    _load_shedder = LoadShedder(compiled, default, lag_threshold, lag_interval, retry_after)
+    _load_shedder.start()
+    return _load_shedder
+
+
+def close_load_shedder() -> None:
+    """关闭全局过载保护"""
+    global _load_shedder
+    if _load_shedder:
+        _load_shedder.close()
+        _load_shedder = None
+
+
+def get_load_shedder() -> Optional[LoadShedder]:
+    """获取过载保护实例"""
+    return _load_shedder
+
+
+def _unavailable(scope: Scope, route_class: ConcurrencyClass, reason: str, retry_after: int) -> FastJSONResponse:
+    """返回 503 响应"""
+    request_id = get_state(scope).get("request_id", "")
+    logger = get_request_logger(request_id)
+    logger.warning(f"Request shed ({reason}): {route_class.name} {scope['method']} {scope['path']}")
+    return FastJSONResponse(
+        status_code=HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "code": HTTP_503_SERVICE_UNAVAILABLE,
+            "msg": "服务繁忙，请稍后再试",
+            "data": None,
+            "requestId": request_id,
+        },
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+async def acquire_slot(scope: Scope) -> Tuple[Optional[ConcurrencyLimiter], Optional[FastJSONResponse]]:
+    """
+    按过载程度与并发上限准入请求
+    
+    Returns:
+        (需要在响应结束后释放的限制器, 拒绝时的 503 响应)
+    """
+    shedder = get_load_shedder()
+    if not shedder:
+        return None, None
+    
+    route_class = shedder.resolve(scope["method"], scope["path"])
+    if shedder.should_shed(route_class):
+        reason = f"overload {shedder.overload * 1000:.0f}ms"
+        return None, _unavailable(scope, route_class, reason, shedder.retry_after)
+    
+    limiter = route_class.limiter
+    if not limiter:
+        return None, None
+    
+    waited = await limiter.acquire()
+    if waited is None:
+        shedder.record_queue_time(limiter.queue_timeout)
+        return None, _unavailable(scope, route_class, "queue timeout", shedder.retry_after)
+    shedder.record_queue_time(waited)
+    return limiter, None
+
+
+class ConcurrencyMiddleware:
+    """并发限制与过载保护中间件（并发槽位持有到响应体发送完毕）"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        limiter, rejection = await acquire_slot(scope)
+        if rejection:
+            await rejection(scope, receive, send)
+            return
+        
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if limiter:
+                limiter.release()
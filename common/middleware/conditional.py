@@ -0,0 +1,139 @@
+"""
+Conditional middleware - 条件请求（ETag / Last-Modified）
+路由按需启用校验器缓存：由数据版本（行 updated_at、记录数）与查询指纹生成强 ETag，
+If-None-Match / If-Modified-Since 命中时在查询数据与序列化之前直接返回 304
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+from fastapi import Request
+from starlette.responses import Response
+
+
+# 启用校验器的响应：浏览器可以保存，但每次使用前必须向服务端验证
+VALIDATOR_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    由数据版本生成强 ETag
+    
+    Args:
+        parts: 数据版本（updated_at、记录数、查询参数，或响应内容 bytes）
+    
+    Returns:
+        str: 带引号的 ETag
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif isinstance(part, datetime):
+            data = part.isoformat().encode()
+        else:
+            data = repr(part).encode()
+        digest.update(len(data).to_bytes(4, "big"))
+        digest.update(data)
+    return f'"{digest.hexdigest()}"'
+
+
+def http_date(value: datetime) -> str:
+    """datetime 转 HTTP 日期（无时区的 datetime 按本地时间处理）"""
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def validator_headers(etag: Optional[str], last_modified: Optional[datetime]) -> Dict[str, str]:
+    """校验器响应头"""
+    headers = {"Cache-Control": VALIDATOR_CACHE_CONTROL}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 弱比较（压缩后的响应携带弱 ETag，同样视为命中）"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    """资源在 If-Modified-Since 之后是否有修改（无法解析的日期视为已修改）"""
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return True
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.astimezone(timezone.utc).replace(microsecond=0) > since
+
+
+class Conditional:
+    """
+    条件 GET 依赖：路由在查询数据之前用数据版本调用 check，命中时直接返回 304
+    
+    使用示例:
+        @router.get("/page")
+        async def get_page(conditional: Conditional = Depends()):
+            updated_at, total = await service.get_page_version(query)
+            not_modified = conditional.check(updated_at, total)
+            if not_modified:
+                return not_modified
+            ...
+    
+    校验器写入 request.state.validators，no_cache 阶段据此返回 ETag / Last-Modified 与 Cache-Control: private, no-cache，
+    未启用的路由仍然禁用缓存；集合路由不要传 last_modified：物理删除不会改变 max(updated_at)，
+    If-Modified-Since 会得到过期的 304，由包含记录数的 ETag 校验即可
+    """
+    
+    def __init__(self, request: Request):
+        self.request = request
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[datetime] = None
+    
+    def fingerprint(self) -> Tuple[Any, ...]:
+        """查询指纹：请求路径、排序后的查询参数、当前用户"""
+        request = self.request
+        query = tuple(sorted(request.query_params.multi_items()))
+        return request.url.path, query, getattr(request.state, "user_id", None)
+    
+    def check(self, *version: Any, last_modified: Optional[datetime] = None) -> Optional[Response]:
+        """
+        按数据版本校验条件请求
+        
+        Args:
+            version: 数据版本（如最大 updated_at、记录数），与查询指纹一起生成 ETag
+            last_modified: 最后修改时间
+        
+        Returns:
+            Optional[Response]: 命中时返回 304 响应，否则返回 None
+        """
+        self.etag = make_etag(*self.fingerprint(), *version)
+        self.last_modified = last_modified
+        self.request.state.validators = (self.etag, last_modified)
+        
+        if self.request.method not in ("GET", "HEAD"):
+            return None
+        if self.not_modified():
+            return Response(status_code=304, headers=validator_headers(self.etag, last_modified))
+        return None
+    
+    def not_modified(self) -> bool:
+        """客户端缓存是否仍然有效（有 If-None-Match 时忽略 If-Modified-Since）"""
+        headers = self.request.headers
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.etag)
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since and self.last_modified:
+            return not modified_since(if_modified_since, self.last_modified)
+        return False
@@ -0,0 +1,207 @@
+"""
+CORS - 跨域资源共享
+按 CORSConfig 匹配请求来源，预检响应与跨域响应头按来源预先生成并缓存（每个请求只需一次字典查找）；
+Access-Control-Max-Age 让浏览器缓存预检结果，避免每个跨域请求前都发送预检请求
+"""
+import re
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+from starlette.types import Scope, Send
+from common.middleware.asgi import RawHeader, encode_headers, get_header
+
+
+# allow_methods 为 * 时允许的方法
+DEFAULT_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+
+# OPTIONS 响应的 Allow 头
+ALLOW_METHODS = "HEAD,GET,POST,PUT,PATCH,DELETE,OPTIONS"
+
+# OPTIONS 响应体与其基础响应头（非跨域或来源不被允许时只返回这些）
+PREFLIGHT_BODY = b"{}"
+PREFLIGHT_HEADERS = encode_headers({
+    "Allow": ALLOW_METHODS,
+    "Content-Type": "application/json",
+    "Content-Length": str(len(PREFLIGHT_BODY)),
+})
+
+_VARY_ORIGIN = encode_headers({"Vary": "Origin"})
+
+
+def _compile_origin(pattern: str) -> "re.Pattern[str]":
+    """来源通配规则（如 https://*.example.com）转正则"""
+    return re.compile("^" + ".*".join(re.escape(part) for part in pattern.split("*")) + "$")
+
+
+class CORSPolicy:
+    """
+    CORS 策略：来源匹配结果与生成的响应头按来源缓存
+    
+    只对明确配置的来源（或通配规则）回显请求来源，允许携带凭证时添加 Access-Control-Allow-Credentials；
+    * 只返回字面量 *，不回显来源、不允许携带凭证（否则任意站点都能带凭证读取响应）；
+    allow_headers 为 * 时回显预检请求的 Access-Control-Request-Headers
+    """
+    
+    def __init__(
+        self,
+        allow_origins: Iterable[str] = ("*",),
+        allow_credentials: bool = False,
+        allow_methods: Iterable[str] = ("*",),
+        allow_headers: Iterable[str] = ("*",),
+        expose_headers: Iterable[str] = (),
+        max_age: Optional[int] = 600,
+        cache_size: int = 1024,
+    ):
+        """
+        初始化 CORS 策略
+        
+        Args:
+            allow_origins: 允许的来源，支持 * 与 https://*.example.com 形式的通配
+            allow_credentials: 是否允许携带凭证（只对明确配置的来源生效，* 匹配的来源不携带凭证）
+            allow_methods: 允许的方法
+            allow_headers: 允许的请求头
+            expose_headers: 允许前端读取的响应头
+            max_age: 预检结果缓存秒数（Access-Control-Max-Age），None 表示不发送
+            cache_size: 按来源缓存的响应头数量
+        """
+        allow_origins = list(allow_origins)
+        self.allow_all_origins = "*" in allow_origins
+        self.origins = frozenset(o for o in allow_origins if "*" not in o)
+        self.patterns = [_compile_origin(o) for o in allow_origins if "*" in o and o != "*"]
+        self.allow_credentials = allow_credentials
+        # 响应头随来源变化时（存在明确配置的来源或不允许所有来源），所有响应都需要 Vary: Origin，避免共享缓存串用
+        self.varies = bool(self.origins or self.patterns) or not self.allow_all_origins
+        allow_methods = [m.upper() for m in allow_methods]
+        self.methods = ",".join(DEFAULT_METHODS if "*" in allow_methods else allow_methods)
+        allow_headers = [h.lower() for h in allow_headers]
+        self.allow_all_headers = "*" in allow_headers
+        self.headers = ", ".join(allow_headers)
+        self.expose_headers = ", ".join(expose_headers)
+        self.max_age = max_age
+        self.cache_size = cache_size
+        self._responses: "OrderedDict[Optional[bytes], Tuple[RawHeader, ...]]" = OrderedDict()
+        self._preflights: "OrderedDict[Tuple[Optional[bytes], Optional[bytes]], Tuple[RawHeader, ...]]" = OrderedDict()
+    
+    def _cache(self, cache: OrderedDict, key, value):
+        """写入响应头缓存"""
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+    
+    def is_explicit(self, origin: str) -> bool:
+        """来源是否为明确配置的来源（或匹配通配规则）"""
+        return origin in self.origins or any(pattern.match(origin) for pattern in self.patterns)
+    
+    def is_allowed(self, origin: str) -> bool:
+        """来源是否被允许"""
+        return self.allow_all_origins or self.is_explicit(origin)
+    
+    def _origin_headers(self, origin: Optional[bytes]) -> Optional[dict]:
+        """
+        来源相关的响应头
+        
+        Returns:
+            Optional[dict]: 来源不被允许（或非跨域请求）时返回 None
+        """
+        if origin is None:
+            return None
+        value = origin.decode("latin-1")
+        if self.is_explicit(value):
+            headers = {"Access-Control-Allow-Origin": value, "Vary": "Origin"}
+            if self.allow_credentials:
+                headers["Access-Control-Allow-Credentials"] = "true"
+            return headers
+        if not self.allow_all_origins:
+            return None
+        # * 匹配的来源：返回字面量 *，浏览器不会随请求发送凭证
+        headers = {"Access-Control-Allow-Origin": "*"}
+        if self.varies:
+            headers["Vary"] = "Origin"
+        return headers
+    
+    def response_headers(self, origin: Optional[bytes]) -> Tuple[RawHeader, ...]:
+        """
+        跨域请求的响应头
+        
+        Args:
+            origin: 请求的 Origin 头
+        
+        Returns:
+            Tuple[RawHeader, ...]: 预编码的响应头，来源不被允许时不含 Access-Control-* 头
+        """
+        if origin in self._responses:
+            return self._responses[origin]
+        
+        headers = self._origin_headers(origin)
+        if headers is None:
+            return self._cache(self._responses, origin, _VARY_ORIGIN if self.varies else ())
+        if self.expose_headers:
+            headers["Access-Control-Expose-Headers"] = self.expose_headers
+        return self._cache(self._responses, origin, encode_headers(headers))
+    
+    def preflight_headers(self, origin: Optional[bytes], request_headers: Optional[bytes] = None) -> Tuple[RawHeader, ...]:
+        """
+        预检响应的完整响应头
+        
+        Args:
+            origin: 请求的 Origin 头
+            request_headers: 请求的 Access-Control-Request-Headers 头
+        
+        Returns:
+            Tuple[RawHeader, ...]: 预编码的响应头
+        """
+        key = (origin, request_headers if self.allow_all_headers else None)
+        if key in self._preflights:
+            return self._preflights[key]
+        
+        headers = self._origin_headers(origin)
+        if headers is None:
+            return self._cache(self._preflights, key, PREFLIGHT_HEADERS)
+        headers["Access-Control-Allow-Methods"] = self.methods
+        if self.allow_all_headers:
+            allow_headers = request_headers.decode("latin-1") if request_headers else ""
+        else:
+            allow_headers = self.headers
+        if allow_headers:
+            headers["Access-Control-Allow-Headers"] = allow_headers
+        if self.max_age is not None:
+            headers["Access-Control-Max-Age"] = str(self.max_age)
+        return self._cache(self._preflights, key, PREFLIGHT_HEADERS + encode_headers(headers))
+
+
+# 未初始化时使用 CORSConfig 的默认策略
+_policy: CORSPolicy = CORSPolicy()
+
+
+def init_cors(
+    allow_origins: Iterable[str] = ("*",),
+    allow_credentials: bool = False,
+    allow_methods: Iterable[str] = ("*",),
+    allow_headers: Iterable[str] = ("*",),
+    expose_headers: Iterable[str] = (),
+    max_age: Optional[int] = 600,
+) -> CORSPolicy:
+    """初始化全局 CORS 策略"""
+    global _policy
+    _policy = CORSPolicy(allow_origins, allow_credentials, allow_methods, allow_headers, expose_headers, max_age)
+    return _policy
+
+
+def get_cors_policy() -> CORSPolicy:
+    """获取 CORS 策略"""
+    return _policy
+
+
+def cors_headers(scope: Scope) -> Tuple[RawHeader, ...]:
+    """当前请求的跨域响应头"""
+    return _policy.response_headers(get_header(scope, b"origin"))
+
+
+async def send_preflight(scope: Scope, send: Send) -> None:
+    """发送 OPTIONS 预检响应（响应头按来源缓存）"""
+    headers = _policy.preflight_headers(
+        get_header(scope, b"origin"),
+        get_header(scope, b"access-control-request-headers"),
+    )
+    await send({"type": "http.response.start", "status": 200, "headers": list(headers)})
+    await send({"type": "http.response.body", "body": PREFLIGHT_BODY})
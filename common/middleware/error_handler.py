@@ -2,69 +2,115 @@
 Error handler middleware - 错误处理中间件
 """
 from fastapi import Request
-from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from core.errors import APIException
 from core.logger import get_request_logger
+from common.response import FastJSONResponse
+from common.middleware.asgi import get_state, warn_deprecated
 
 
-async def error_handler_middleware(request: Request, call_next):
-    """错误处理中间件"""
-    try:
-        response = await call_next(request)
-        
-        # 捕获404等HTTP错误
-        if response.status_code == 404:
-            request_id = getattr(request.state, "request_id", "")
-            logger = get_request_logger(request_id)
-            logger.warning(f"404 Not Found: {request.method} {request.url.path}")
-            return JSONResponse(
-                status_code=404,
-                content={
-                    "code": 404,
-                    "msg": f"路由 {request.method} {request.url.path} 不存在",
-                    "data": None,
-                    "requestId": request_id,
-                },
-            )
-        
-        return response
-    except StarletteHTTPException as e:
-        request_id = getattr(request.state, "request_id", "")
-        logger = get_request_logger(request_id)
-        logger.warning(f"HTTP {e.status_code}: {e.detail}")
-        return JSONResponse(
-            status_code=e.status_code,
+def error_response(scope: Scope, exc: Exception) -> FastJSONResponse:
+    """异常转换为统一格式的 JSON 响应"""
+    request_id = get_state(scope).get("request_id", "")
+    logger = get_request_logger(request_id)
+    if isinstance(exc, StarletteHTTPException):
+        logger.warning(f"HTTP {exc.status_code}: {exc.detail}")
+        return FastJSONResponse(
+            status_code=exc.status_code,
             content={
-                "code": e.status_code,
-                "msg": e.detail if isinstance(e.detail, str) else str(e.detail),
+                "code": exc.status_code,
+                "msg": exc.detail if isinstance(exc.detail, str) else str(exc.detail),
                 "data": None,
                 "requestId": request_id,
             },
+            headers=exc.headers,
         )
-    except APIException as e:
-        request_id = getattr(request.state, "request_id", "")
-        logger = get_request_logger(request_id)
-        logger.error(f"API Error: {e.message}, detail: {e.detail}")
-        return JSONResponse(
-            status_code=e.status_code,
+    if isinstance(exc, APIException):
+        logger.error(f"API Error: {exc.message}, detail: {exc.detail}")
+        return FastJSONResponse(
+            status_code=exc.status_code,
             content={
-                "code": e.status_code,
-                "msg": e.message,
-                "data": e.detail,
+                "code": exc.status_code,
+                "msg": exc.message,
+                "data": exc.detail,
                 "requestId": request_id,
             },
         )
+    logger.exception(f"Unhandled exception: {str(exc)}")
+    return FastJSONResponse(
+        status_code=500,
+        content={
+            "code": 500,
+            "msg": "Internal Server Error",
+            "data": str(exc),
+            "requestId": request_id,
+        },
+    )
+
+
+def not_found_response(scope: Scope) -> FastJSONResponse:
+    """404 转换为统一格式的 JSON 响应"""
+    request_id = get_state(scope).get("request_id", "")
+    logger = get_request_logger(request_id)
+    logger.warning(f"404 Not Found: {scope['method']} {scope['path']}")
+    return FastJSONResponse(
+        status_code=404,
+        content={
+            "code": 404,
+            "msg": f"路由 {scope['method']} {scope['path']} 不存在",
+            "data": None,
+            "requestId": request_id,
+        },
+    )
+
+
+class ErrorHandlerMiddleware:
+    """错误处理中间件：捕获内层异常并返回统一格式，404 响应替换为统一格式"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = False
+        not_found = False
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started, not_found
+            if message["type"] == "http.response.start":
+                if message["status"] == 404:
+                    # 丢弃原 404 响应，内层返回后统一替换
+                    not_found = True
+                    return
+                started = True
+            elif not_found:
+                return
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            # 响应已开始发送时无法再替换
+            if started:
+                raise
+            await error_response(scope, e)(scope, receive, send)
+            return
+        
+        if not_found:
+            await not_found_response(scope)(scope, receive, send)
+
+
+async def error_handler_middleware(request: Request, call_next):
+    """错误处理中间件函数版本（已弃用，请改用 ErrorHandlerMiddleware）"""
+    warn_deprecated("error_handler_middleware", "ErrorHandlerMiddleware")
+    try:
+        response = await call_next(request)
     except Exception as e:
-        request_id = getattr(request.state, "request_id", "")
-        logger = get_request_logger(request_id)
-        logger.exception(f"Unhandled exception: {str(e)}")
-        return JSONResponse(
-            status_code=500,
-            content={
-                "code": 500,
-                "msg": "Internal Server Error",
-                "data": str(e),
-                "requestId": request_id,
-            },
-        )
+        return error_response(request.scope, e)
+    if response.status_code == 404:
+        return not_found_response(request.scope)
+    return response
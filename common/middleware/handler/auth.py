@@ -5,7 +5,7 @@ Auth Handlers - 认证处理器
 """
 from typing import Optional
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from common.response import FastJSONResponse
 
 from core.logger import get_request_logger
 from core.runtime import get_db
@@ -115,7 +115,7 @@ async def authorizator(data: dict, request: Request) -> bool:
         return False
 
 
-async def unauthorized_handler(request: Request, code: int, message: str) -> JSONResponse:
+async def unauthorized_handler(request: Request, code: int, message: str) -> FastJSONResponse:
     """
     未授权处理函数（可选）
     
@@ -129,7 +129,7 @@ async def unauthorized_handler(request: Request, code: int, message: str) -> JSO
     Returns:
         JSON 响应
     """
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200,
         content={
             "code": code,
@@ -139,7 +139,7 @@ async def unauthorized_handler(request: Request, code: int, message: str) -> JSO
     )
 
 
-async def login_response(request: Request, token: str, expire: int) -> JSONResponse:
+async def login_response(request: Request, token: str, expire: int) -> FastJSONResponse:
     """
     登录成功响应函数（可选）
     
@@ -154,7 +154,7 @@ async def login_response(request: Request, token: str, expire: int) -> JSONRespo
         JSON 响应
     """
     # 登录阶段返回简化的响应，用户信息已在token中
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200,
         content={
             "code": 200,
@@ -164,7 +164,7 @@ async def login_response(request: Request, token: str, expire: int) -> JSONRespo
     )
 
 
-async def refresh_response(request: Request, token: str, expire: int) -> JSONResponse:
+async def refresh_response(request: Request, token: str, expire: int) -> FastJSONResponse:
     """
     刷新成功响应函数（可选）
     
@@ -178,7 +178,7 @@ async def refresh_response(request: Request, token: str, expire: int) -> JSONRes
     Returns:
         JSON 响应
     """
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200,
         content={
             "code": 200,
@@ -188,7 +188,7 @@ async def refresh_response(request: Request, token: str, expire: int) -> JSONRes
     )
 
 
-async def logout_response(request: Request) -> JSONResponse:
+async def logout_response(request: Request) -> FastJSONResponse:
     """
     登出成功响应函数（可选）
     
@@ -200,7 +200,7 @@ async def logout_response(request: Request) -> JSONResponse:
     Returns:
         JSON 响应
     """
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200,
         content={
             "code": 200,
@@ -1,73 +1,166 @@
 """
 Header middleware - HTTP头中间件
-包括缓存控制、CORS选项、安全头等
+包括缓存控制、CORS选项、安全头等（CORS 头按 CORSConfig 生成，见 cors.py）
 """
 from datetime import datetime
+from typing import Tuple
 from fastapi import Request
-from starlette.responses import JSONResponse
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from common.middleware.asgi import RawHeader, apply_headers, encode_headers, get_header, get_state, set_headers, warn_deprecated
+from common.middleware.conditional import validator_headers
+from common.middleware.cors import PREFLIGHT_BODY, cors_headers, get_cors_policy, send_preflight
 
 
-async def no_cache_middleware(request: Request, call_next):
+# 禁用缓存的响应头（Last-Modified 按请求时间生成）
+NO_CACHE_HEADERS = encode_headers({
+    "Cache-Control": "no-cache, no-store, max-age=0, must-revalidate",
+    "Expires": "Thu, 01 Jan 1970 00:00:00 GMT",
+})
+
+# 安全响应头
+SECURE_HEADERS = encode_headers({
+    # 防止MIME类型嗅探
+    "X-Content-Type-Options": "nosniff",
+    # XSS保护
+    "X-XSS-Protection": "1; mode=block",
+    # 可选：内容安全策略（根据需要启用）
+    # "Content-Security-Policy": "script-src 'self' https://cdnjs.cloudflare.com",
+    # 可选：防止点击劫持（如需启用，取消注释）
+    # "X-Frame-Options": "DENY",
+})
+
+# HTTPS 连接额外添加的 HSTS 头
+HSTS_HEADERS = SECURE_HEADERS + encode_headers({"Strict-Transport-Security": "max-age=31536000"})
+
+
+def last_modified_header() -> RawHeader:
+    """按当前时间生成 Last-Modified 响应头"""
+    return (b"last-modified", datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT").encode("latin-1"))
+
+
+def cache_headers(scope: Scope) -> Tuple[RawHeader, ...]:
+    """
+    缓存控制响应头：路由通过 Conditional 启用校验器时返回 ETag / Last-Modified，否则禁用缓存
+    
+    Args:
+        scope: ASGI scope
+    
+    Returns:
+        Tuple[RawHeader, ...]: 响应头
+    """
+    validators = get_state(scope).get("validators")
+    if validators:
+        return encode_headers(validator_headers(*validators))
+    return NO_CACHE_HEADERS + (last_modified_header(),)
+
+
+def secure_headers(scope: Scope) -> Tuple[RawHeader, ...]:
+    """
+    安全响应头：跨域响应头（按来源缓存）+ 安全头，HTTPS 连接添加 HSTS
+    
+    Args:
+        scope: ASGI scope
+    
+    Returns:
+        Tuple[RawHeader, ...]: 响应头
+    """
+    return cors_headers(scope) + (HSTS_HEADERS if scope.get("scheme") == "https" else SECURE_HEADERS)
+
+
+class NoCacheMiddleware:
     """
     NoCache 中间件 - 防止客户端缓存HTTP响应
-    添加缓存控制头，确保每次都从服务器获取最新数据
+    添加缓存控制头，确保每次都从服务器获取最新数据；
+    通过 Conditional 启用条件请求的路由改为返回 ETag / Last-Modified，由客户端每次验证
     """
-    response = await call_next(request)
     
-    # 添加禁用缓存的响应头
-    response.headers["Cache-Control"] = "no-cache, no-store, max-age=0, must-revalidate"
-    response.headers["Expires"] = "Thu, 01 Jan 1970 00:00:00 GMT"
-    response.headers["Last-Modified"] = datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                set_headers(message, cache_headers(scope))
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
 
 
-async def options_middleware(request: Request, call_next):
+class OptionsMiddleware:
     """
     Options 中间件 - 处理CORS预检请求
-    为OPTIONS请求添加CORS头并直接返回200
+    按 CORSConfig 为OPTIONS请求返回缓存的预检响应（含 Access-Control-Max-Age）并直接返回200
     """
-    if request.method != "OPTIONS":
-        return await call_next(request)
     
-    # OPTIONS请求直接返回CORS头
-    return JSONResponse(
-        status_code=200,
-        content={},
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET,POST,PUT,PATCH,DELETE,OPTIONS",
-            "Access-Control-Allow-Headers": "authorization, origin, content-type, accept",
-            "Allow": "HEAD,GET,POST,PUT,PATCH,DELETE,OPTIONS",
-            "Content-Type": "application/json",
-        }
-    )
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        
+        # OPTIONS请求直接返回CORS头
+        await send_preflight(scope, send)
 
 
-async def secure_middleware(request: Request, call_next):
+class SecureMiddleware:
     """
     Secure 中间件 - 添加安全和资源访问头
-    包括XSS保护、内容类型嗅探保护、HSTS等
+    包括跨域响应头、XSS保护、内容类型嗅探保护、HSTS等
     """
-    response = await call_next(request)
-    
-    # CORS - 允许所有来源（生产环境应配置具体域名）
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    
-    # 防止MIME类型嗅探
-    response.headers["X-Content-Type-Options"] = "nosniff"
     
-    # XSS保护
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    
-    # 如果是HTTPS连接，添加HSTS头
-    if request.url.scheme == "https":
-        response.headers["Strict-Transport-Security"] = "max-age=31536000"
-    
-    # 可选：内容安全策略（根据需要启用）
-    # response.headers["Content-Security-Policy"] = "script-src 'self' https://cdnjs.cloudflare.com"
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    # 可选：防止点击劫持（如需启用，取消注释）
-    # response.headers["X-Frame-Options"] = "DENY"
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # 如果是HTTPS连接，添加HSTS头
+        headers = secure_headers(scope)
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                set_headers(message, headers)
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+
+
+async def no_cache_middleware(request: Request, call_next):
+    """NoCache 中间件函数版本（已弃用，请改用 NoCacheMiddleware）"""
+    warn_deprecated("no_cache_middleware", "NoCacheMiddleware")
+    response = await call_next(request)
+    apply_headers(response, cache_headers(request.scope))
+    return response
+
+
+async def options_middleware(request: Request, call_next):
+    """Options 中间件函数版本（已弃用，请改用 OptionsMiddleware）"""
+    warn_deprecated("options_middleware", "OptionsMiddleware")
+    if request.method != "OPTIONS":
+        return await call_next(request)
     
+    # OPTIONS请求直接返回缓存的预检响应头
+    response = Response(PREFLIGHT_BODY)
+    response.raw_headers = list(get_cors_policy().preflight_headers(
+        get_header(request.scope, b"origin"),
+        get_header(request.scope, b"access-control-request-headers"),
+    ))
+    return response
+
+
+async def secure_middleware(request: Request, call_next):
+    """Secure 中间件函数版本（已弃用，请改用 SecureMiddleware）"""
+    warn_deprecated("secure_middleware", "SecureMiddleware")
+    headers = secure_headers(request.scope)
+    response = await call_next(request)
+    apply_headers(response, headers)
     return response
@@ -2,42 +2,70 @@
 Middleware loader - 中间件加载器
 集中管理所有中间件注册
 """
+from typing import Optional, Sequence
 from fastapi import FastAPI
-from common.middleware.request_id import request_id_middleware
-from common.middleware.logger import logger_middleware
-from common.middleware.error_handler import error_handler_middleware
-from common.middleware.rate_limit import rate_limit_middleware
-from common.middleware.header import no_cache_middleware, options_middleware, secure_middleware
+from core.config import MiddlewareRouteConfig, get_settings
+from common.middleware.request_id import RequestIdMiddleware
+from common.middleware.logger import LoggerMiddleware
+from common.middleware.error_handler import ErrorHandlerMiddleware
+from common.middleware.rate_limit import RateLimitMiddleware
+from common.middleware.concurrency import ConcurrencyMiddleware
+from common.middleware.compression import CompressionMiddleware
+from common.middleware.header import NoCacheMiddleware, OptionsMiddleware, SecureMiddleware
+from common.middleware.pipeline import PipelineMiddleware
 
 
-def register_middlewares(app: FastAPI) -> None:
+def register_middlewares(
+    app: FastAPI,
+    fused: Optional[bool] = None,
+    routes: Optional[Sequence[MiddlewareRouteConfig]] = None,
+) -> None:
     """
     注册所有中间件
     
-    按执行顺序倒序注册：
-    执行顺序: request → error_handler → secure → options → no_cache → request_id → logger → rate_limit → 路由
+    中间件均为纯 ASGI 实现，直接操作 scope / send；add_middleware 后注册的在外层，因此按执行顺序倒序注册：
+    执行顺序: request → compression → secure → options → no_cache → request_id → error_handler → logger → concurrency → rate_limit → 路由
+    error_handler 位于响应头中间件之内，统一格式的错误响应（404 / 429 / 500）同样带有跨域、安全头与 X-Request-Id
+    
+    Args:
+        app: FastAPI 应用
+        fused: 是否注册为单层融合中间件（各阶段在一次调用中完成，可按路由选择阶段），默认读取 middleware.fused
+        routes: 融合模式下按路由的阶段规则，默认读取 middleware.routes
     """
     # 初始化 JWT 认证中间件
     from common.middleware.auth import init_auth_middleware
     init_auth_middleware()
     
-    # 最外层：捕获所有异常
-    app.middleware("http")(error_handler_middleware)
+    config = get_settings().middleware
+    if fused is None:
+        fused = config.fused
+    if fused:
+        app.add_middleware(PipelineMiddleware, routes=config.routes if routes is None else routes)
+        return
     
-    # 安全头
-    app.middleware("http")(secure_middleware)
+    # 最内层：限流检查
+    app.add_middleware(RateLimitMiddleware)
     
-    # CORS预检请求
-    app.middleware("http")(options_middleware)
+    # 并发限制与过载保护
+    app.add_middleware(ConcurrencyMiddleware)
     
-    # 禁用缓存
-    app.middleware("http")(no_cache_middleware)
+    # 记录日志（使用request_id）
+    app.add_middleware(LoggerMiddleware)
+    
+    # 捕获所有异常（替换后的错误响应仍经过外层响应头中间件）
+    app.add_middleware(ErrorHandlerMiddleware)
     
     # 生成请求ID
-    app.middleware("http")(request_id_middleware)
+    app.add_middleware(RequestIdMiddleware)
     
-    # 记录日志（使用request_id）
-    app.middleware("http")(logger_middleware)
+    # 禁用缓存
+    app.add_middleware(NoCacheMiddleware)
     
-    # 最内层：限流检查
-    app.middleware("http")(rate_limit_middleware)
+    # CORS预检请求
+    app.add_middleware(OptionsMiddleware)
+    
+    # 安全头
+    app.add_middleware(SecureMiddleware)
+    
+    # 最外层：响应压缩（错误响应同样压缩）
+    app.add_middleware(CompressionMiddleware)
@@ -3,13 +3,43 @@ Logger middleware - 日志中间件
 """
 import time
 from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from core.logger import get_request_logger
+from common.middleware.asgi import get_state, warn_deprecated
+
+
+class LoggerMiddleware:
+    """日志中间件：记录请求与响应（耗时包含流式响应体的发送）"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        logger = get_request_logger(get_state(scope).get("request_id", ""))
+        method, path = scope["method"], scope["path"]
+        start_time = time.time()
+        logger.info(f"→ {method} {path}")
+        status_code = 0
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+        elapsed = time.time() - start_time
+        logger.info(f"← {method} {path} {status_code} {elapsed:.3f}s")
 
 
 async def logger_middleware(request: Request, call_next):
-    """日志中间件"""
-    request_id = getattr(request.state, "request_id", "")
-    logger = get_request_logger(request_id)
+    """日志中间件函数版本（已弃用，请改用 LoggerMiddleware）"""
+    warn_deprecated("logger_middleware", "LoggerMiddleware")
+    logger = get_request_logger(get_state(request.scope).get("request_id", ""))
     start_time = time.time()
     logger.info(f"→ {request.method} {request.url.path}")
     response = await call_next(request)
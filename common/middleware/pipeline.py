@@ -0,0 +1,237 @@
+"""
+Pipeline middleware - 单层融合中间件
+把 register_middlewares 中的各层中间件合并为一个 ASGI 中间件，每个请求只经过一层协程调用；
+各路由需要的阶段在启动时按路由解析一次并缓存，静态响应头预先编码为字节元组（跨域响应头按来源缓存）
+"""
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from core.config import MiddlewareRouteConfig
+from core.logger import get_request_logger
+from common.middleware.asgi import RawHeader, compile_path, get_state, set_headers
+from common.middleware.compression import compression_send
+from common.middleware.concurrency import acquire_slot
+from common.middleware.error_handler import error_response, not_found_response
+from common.middleware.cors import send_preflight
+from common.middleware.header import cache_headers, secure_headers
+from common.middleware.rate_limit import check_rate_limit
+from common.middleware.request_id import assign_request_id
+
+
+# 中间件阶段（按执行顺序，与分层注册的中间件一一对应）
+STAGE_COMPRESSION = "compression"
+STAGE_ERROR_HANDLER = "error_handler"
+STAGE_SECURE = "secure"
+STAGE_OPTIONS = "options"
+STAGE_NO_CACHE = "no_cache"
+STAGE_REQUEST_ID = "request_id"
+STAGE_LOGGER = "logger"
+STAGE_CONCURRENCY = "concurrency"
+STAGE_RATE_LIMIT = "rate_limit"
+STAGES = (
+    STAGE_COMPRESSION,
+    STAGE_SECURE,
+    STAGE_OPTIONS,
+    STAGE_NO_CACHE,
+    STAGE_REQUEST_ID,
+    STAGE_ERROR_HANDLER,
+    STAGE_LOGGER,
+    STAGE_CONCURRENCY,
+    STAGE_RATE_LIMIT,
+)
+
+
+class StagePlan:
+    """单个路由的执行计划：启用的阶段"""
+    
+    def __init__(self, stages: Iterable[str]):
+        """
+        初始化执行计划
+        
+        Args:
+            stages: 启用的阶段名称
+        """
+        stages = frozenset(stages)
+        unknown = stages - set(STAGES)
+        if unknown:
+            raise ValueError(f"未知的中间件阶段: {', '.join(sorted(unknown))}")
+        self.stages = stages
+        self.compression = STAGE_COMPRESSION in stages
+        self.error_handler = STAGE_ERROR_HANDLER in stages
+        self.options = STAGE_OPTIONS in stages
+        self.no_cache = STAGE_NO_CACHE in stages
+        self.request_id = STAGE_REQUEST_ID in stages
+        self.logger = STAGE_LOGGER in stages
+        self.concurrency = STAGE_CONCURRENCY in stages
+        self.rate_limit = STAGE_RATE_LIMIT in stages
+        self.secure = STAGE_SECURE in stages
+        # 没有任何阶段时直接透传
+        self.passthrough = not stages
+
+
+# 全部阶段（未命中任何规则的路由）
+FULL_PLAN = StagePlan(STAGES)
+
+
+class PipelineMiddleware:
+    """
+    融合中间件：按 compression → secure → options → no_cache → request_id → error_handler → logger → concurrency → rate_limit
+    的顺序在一次调用中完成各阶段，行为与分层注册的中间件栈一致（错误响应与正常响应带有相同的响应头）
+    """
+    
+    def __init__(self, app: ASGIApp, routes: Sequence[MiddlewareRouteConfig] = (), cache_size: int = 4096):
+        """
+        初始化融合中间件
+        
+        Args:
+            app: 内层 ASGI 应用
+            routes: 按路由的阶段规则（按顺序匹配，第一条命中的规则生效），未命中的路由启用全部阶段
+            cache_size: 请求路径到执行计划的缓存数量
+        """
+        self.app = app
+        self.rules = [(rule.path, compile_path(rule.path), StagePlan(rule.stages)) for rule in routes]
+        self.cache_size = cache_size
+        # [(路由路径正则, 执行计划)]，启动时按应用路由编译
+        self._plans: Optional[List[Tuple[object, StagePlan]]] = None
+        self._cache: "OrderedDict[str, StagePlan]" = OrderedDict()
+    
+    def _rule_plan(self, route_path: str) -> StagePlan:
+        """路由路径模板（或请求路径）对应的执行计划"""
+        for path, pattern, plan in self.rules:
+            if pattern is None:
+                if route_path == path:
+                    return plan
+            elif pattern.match(route_path):
+                return plan
+        return FULL_PLAN
+    
+    def compile(self, routes: Iterable) -> None:
+        """
+        按应用路由编译执行计划（每个路由只解析一次）
+        
+        Args:
+            routes: 应用路由列表（app.routes）
+        """
+        plans: List[Tuple[object, StagePlan]] = []
+        for route in routes:
+            path, regex = getattr(route, "path", None), getattr(route, "path_regex", None)
+            if path is None or regex is None:
+                continue
+            plans.append((regex, self._rule_plan(path)))
+        self._plans = plans
+        self._cache.clear()
+    
+    def resolve(self, scope: Scope) -> StagePlan:
+        """解析请求对应的执行计划（结果按路径缓存）"""
+        path = scope["path"]
+        plan = self._cache.get(path)
+        if plan is not None:
+            return plan
+        
+        if self._plans is None:
+            self.compile(getattr(scope.get("app"), "routes", ()))
+        plan = next((plan for regex, plan in self._plans if regex.match(path)), None)
+        if plan is None:
+            # 未编译到的路由（如嵌套路由器中的路由）直接按请求路径匹配规则
+            plan = self._rule_plan(path)
+        self._cache[path] = plan
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return plan
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            # 启动时按路由编译执行计划
+            if scope["type"] == "lifespan" and self._plans is None and "app" in scope:
+                self.compile(getattr(scope["app"], "routes", ()))
+            await self.app(scope, receive, send)
+            return
+        
+        plan = self.resolve(scope)
+        if plan.passthrough:
+            await self.app(scope, receive, send)
+            return
+        
+        if plan.compression:
+            send = compression_send(scope, send)
+        
+        # 安全头与跨域响应头（按来源缓存）
+        static_headers = secure_headers(scope) if plan.secure else ()
+        
+        # CORS 预检请求直接返回缓存的预检响应（只经过安全头与错误处理）
+        if plan.options and scope["method"] == "OPTIONS":
+            
+            async def send_options(message: Message) -> None:
+                if message["type"] == "http.response.start" and static_headers:
+                    set_headers(message, static_headers)
+                await send(message)
+            
+            await send_preflight(scope, send_options)
+            return
+        
+        request_headers: Tuple[RawHeader, ...] = (assign_request_id(scope),) if plan.request_id else ()
+        if plan.logger:
+            logger = get_request_logger(get_state(scope).get("request_id", ""))
+            method, path = scope["method"], scope["path"]
+            start_time = time.time()
+            logger.info(f"→ {method} {path}")
+        
+        status_code = 0
+        started = False
+        not_found = False
+        response_headers: Tuple[RawHeader, ...] = ()
+        
+        def stamp(message: Message) -> None:
+            """在 http.response.start 上设置各阶段的响应头"""
+            if plan.no_cache:
+                # 缓存控制头按响应决定（路由可能启用了条件请求）
+                set_headers(message, response_headers + request_headers + cache_headers(scope) + static_headers)
+            elif response_headers or request_headers or static_headers:
+                set_headers(message, response_headers + request_headers + static_headers)
+        
+        async def send_error(message: Message) -> None:
+            # 替换后的错误响应与正常响应设置相同的响应头
+            if message["type"] == "http.response.start":
+                stamp(message)
+            await send(message)
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, started, not_found
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                stamp(message)
+                if status_code == 404 and plan.error_handler:
+                    # 丢弃原 404 响应，内层返回后统一替换
+                    not_found = True
+                    return
+                started = True
+            elif not_found:
+                return
+            await send(message)
+        
+        limiter = None
+        try:
+            rejection = None
+            if plan.concurrency:
+                limiter, rejection = await acquire_slot(scope)
+            if rejection:
+                await rejection(scope, receive, send_wrapper)
+            else:
+                if plan.rate_limit:
+                    response_headers = await check_rate_limit(scope)
+                await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            # 响应已开始发送时无法再替换
+            if not plan.error_handler or started:
+                raise
+            await error_response(scope, e)(scope, receive, send_error)
+            return
+        finally:
+            if limiter:
+                limiter.release()
+        
+        if plan.logger:
+            logger.info(f"← {method} {path} {status_code} {time.time() - start_time:.3f}s")
+        if not_found:
+            await not_found_response(scope)(scope, receive, send_error)
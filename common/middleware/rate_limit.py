@@ -1,13 +1,131 @@
 """
 Rate limit middleware - 限流中间件
-基于滑动窗口算法实现，支持 Redis 和内存存储
+支持滑动窗口、令牌桶、GCRA 算法，支持 Redis、共享内存（单机多 worker）和内存存储
 """
+import asyncio
+import hashlib
+import math
 import time
-from typing import Dict, Optional
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from uuid import uuid4
 from fastapi import Request, HTTPException
 from starlette.status import HTTP_429_TOO_MANY_REQUESTS
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from core.config import RateLimitPolicyConfig
+from core.jwtauth.constants import IDENTITY_KEY
 from core.runtime import runtime
 from core.logger import get_request_logger
+from core.storage import SharedCounters, register_script
+from common.middleware.asgi import RawHeader, apply_headers, compile_path, encode_headers, set_headers, warn_deprecated
+
+
+# 滑动窗口（Sorted Set）：清理过期成员、计数、判断、写入在一次 EVALSHA 中原子完成
+# ARGV: 当前毫秒时间戳, 窗口毫秒数, 限额, 唯一成员；返回 {是否放行, 剩余次数, 重试毫秒数, 完全恢复毫秒数}
+SLIDING_WINDOW_SCRIPT = register_script("rate_limit_sliding_window", """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count >= limit then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    local newest = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+    local retry, reset = window, window
+    if oldest[2] then
+        retry = tonumber(oldest[2]) + window - now
+        reset = tonumber(newest[2]) + window - now
+    end
+    return {0, 0, retry, reset}
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], window)
+return {1, limit - count - 1, 0, window}
+""")
+
+# 滑动窗口计数：KEYS 为当前/上一固定窗口计数键（同一哈希标签），上一窗口按剩余时间加权
+# ARGV: 限额, 窗口毫秒数, 当前窗口已过毫秒数；返回 {是否放行, 当前窗口计数, 上一窗口计数}
+SLIDING_COUNTER_SCRIPT = register_script("rate_limit_sliding_counter", """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local curr = tonumber(redis.call('GET', KEYS[1]) or '0')
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+if prev * (window - elapsed) / window + curr + 1 > limit then
+    return {0, curr, prev}
+end
+curr = redis.call('INCR', KEYS[1])
+if curr == 1 then
+    redis.call('PEXPIRE', KEYS[1], window * 2)
+end
+return {1, curr, prev}
+""")
+
+# GCRA / 令牌桶：每键只保存一个时间戳 TAT（理论到达时间，令牌桶中即"桶满时刻"）
+# ARGV: 当前毫秒时间戳, 发放间隔毫秒数, 突发容量；返回 {是否放行, 剩余次数, 重试毫秒数, 完全恢复毫秒数}
+GCRA_SCRIPT = register_script("rate_limit_gcra", """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+local new_tat = math.max(tat, now) + interval
+local allow_at = new_tat - burst * interval
+if allow_at > now then
+    return {0, 0, allow_at - now, tat - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, math.floor((now - allow_at) / interval), 0, new_tat - now}
+""")
+
+# 限流算法
+ALGORITHM_SLIDING_LOG = "sliding_log"  # 滑动窗口日志：精确，状态随限额增长
+ALGORITHM_SLIDING_WINDOW = "sliding_window"  # 滑动窗口计数：两个固定窗口加权估算，每键常量状态
+ALGORITHM_TOKEN_BUCKET = "token_bucket"  # 令牌桶：容量 burst，每 window/requests 秒补充一个令牌
+ALGORITHM_GCRA = "gcra"  # 通用信元速率算法：与令牌桶等价，按理论到达时间均匀放行
+ALGORITHMS = (ALGORITHM_SLIDING_LOG, ALGORITHM_SLIDING_WINDOW, ALGORITHM_TOKEN_BUCKET, ALGORITHM_GCRA)
+
+# 近似分布式限流：单次 pipeline 同步的最大键数
+SYNC_BATCH = 500
+# 近似分布式限流：worker 心跳周期（秒），用于估算在线 worker 数量
+HEARTBEAT_TICK = 10
+
+
+class RateLimitResult(NamedTuple):
+    """限流检查结果"""
+    allowed: bool  # 是否放行
+    retry_after: Optional[int]  # 被拒绝时建议的重试秒数，放行时为 None
+    remaining: int  # 本次检查后剩余可用次数
+    reset: int  # 限额完全恢复的剩余秒数
+
+
+def _sliding_retry_after(count: int, prev: int, limit: int, window: float, elapsed: float) -> int:
+    """滑动窗口计数被拒绝后的建议重试秒数"""
+    if count + 1 > limit or prev <= 0:
+        retry_after = window - elapsed
+    else:
+        # 上一窗口权重衰减到估算值低于 limit 所需的时间
+        retry_after = window * (1 - (limit - count - 1) / prev) - elapsed
+    return max(math.ceil(retry_after), 1)
+
+
+def _sliding_result(allowed: bool, count: int, prev: int, limit: int, window: float, elapsed: float) -> RateLimitResult:
+    """
+    滑动窗口计数的检查结果
+    
+    Args:
+        allowed: 是否放行
+        count: 当前窗口计数（放行时已包含本次请求）
+        prev: 上一窗口计数
+        limit: 限额
+        window: 窗口大小（秒）
+        elapsed: 当前窗口已过秒数
+    """
+    # 当前窗口有计数时需等到下一窗口结束才完全恢复
+    reset = math.ceil(window - elapsed + (window if count else 0)) if count or prev else 0
+    if not allowed:
+        return RateLimitResult(False, _sliding_retry_after(count, prev, limit, window, elapsed), 0, reset)
+    remaining = max(math.floor(limit - prev * (1 - elapsed / window) - count), 0)
+    return RateLimitResult(True, None, remaining, reset)
 
 
 class RateLimiter:
@@ -17,7 +135,17 @@ class RateLimiter:
         self,
         requests: int = 100,
         window: int = 60,
-        use_redis: bool = False
+        use_redis: bool = False,
+        use_shared_memory: bool = False,
+        shared_name: str = "dy_yun_rate_limit",
+        shared_slots: int = 65536,
+        algorithm: str = ALGORITHM_SLIDING_LOG,
+        max_keys: int = 100000,
+        gc_interval: int = 60,
+        burst: int = 0,
+        name: str = "",
+        shared: Optional[SharedCounters] = None,
+        sync_interval: float = 0,
     ):
         """
         初始化限流器
@@ -26,105 +154,585 @@ class RateLimiter:
             requests: 时间窗口内允许的最大请求数
             window: 时间窗口大小（秒）
             use_redis: 是否使用 Redis 存储（适合分布式环境）
+            use_shared_memory: 是否使用共享内存计数表（单机多 worker 共享限额）
+            shared_name: 共享内存名称，同一主机上的 worker 使用相同名称
+            shared_slots: 共享计数表槽位数量
+            algorithm: 限流算法（sliding_log / sliding_window / token_bucket / gcra），
+                       共享内存存储固定使用 sliding_window
+            max_keys: 内存存储最多保留的限流标识数量，超出时淘汰最久未访问的标识
+            gc_interval: 内存存储清理空闲标识的间隔（秒）
+            burst: token_bucket / gcra 允许的突发请求数（桶容量），0 表示等于 requests
+            name: 限流器名称（策略名），非空时作为计数键前缀，各策略计数互不影响
+            shared: 复用已挂载的共享内存计数表（多个策略共用一张表）
+            sync_interval: 近似分布式限流的同步间隔（秒），仅 use_redis 时生效；
+                           大于 0 时各 worker 本地计数、定期批量同步到 Redis，两次同步之间只使用自己那份全局限额，
+                           固定使用固定窗口计数，0 表示每个请求都访问 Redis（精确）
         """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unsupported rate limit algorithm: {algorithm}")
         self.requests = requests
         self.window = window
         self.use_redis = use_redis
+        self.algorithm = algorithm
+        self.name = name
+        self.max_keys = max_keys
+        self.gc_interval = gc_interval
+        self.burst = burst if burst > 0 else requests
+        # 发放间隔：稳定速率下相邻两次请求的最小间隔（秒）
+        self.interval = window / requests
+        
+        # 内存存储：{key: [最后访问时间, 状态]}，按访问顺序排列
+        # sliding_log 状态为定长环形缓冲 deque(maxlen=requests)，sliding_window 状态为 [窗口序号, 当前计数, 上一计数]，
+        # token_bucket / gcra 状态为单个浮点数 TAT
+        self.memory_store: "OrderedDict[str, list]" = OrderedDict()
+        self._last_gc = time.time()
+        
+        # 共享内存存储：同一主机的所有 worker 共用计数，限额不随 worker 数放大
+        self.shared: Optional[SharedCounters] = shared
+        self._owns_shared = False
+        if use_shared_memory and shared is None:
+            self.shared = SharedCounters(shared_name, slots=shared_slots)
+            self._owns_shared = True
         
-        # 内存存储：{key: [(timestamp1, timestamp2, ...)]}
-        self.memory_store: Dict[str, list] = {}
+        # 近似分布式限流：{key: [窗口序号, 上次同步时的全局计数, 未同步的本地计数]}
+        self.sync_interval = sync_interval
+        self._approx: Dict[str, List[int]] = {}
+        self._workers = 1
+        self._heartbeat_tick = -1
+        self._sync_task: Optional[asyncio.Task] = None
     
-    async def is_allowed(self, key: str) -> tuple[bool, Optional[int]]:
+    async def is_allowed(self, key: str) -> RateLimitResult:
         """
-        检查是否允许请求
+        检查是否允许请求（剩余次数与恢复时间在同一次检查中算出，不额外访问存储）
         
         Args:
             key: 限流标识（如 IP 地址或用户 ID）
             
         Returns:
-            (是否允许, 剩余秒数)
+            RateLimitResult: (是否允许, 重试秒数, 剩余次数, 完全恢复秒数)
         """
-        current_time = int(time.time())
-        window_start = current_time - self.window
+        current_time = time.time()
+        if self.name:
+            key = f"{self.name}:{key}"
         
         if self.use_redis:
-            return await self._check_redis(key, current_time, window_start)
+            return await self._check_redis(key, current_time)
+        elif self.shared:
+            return await self._check_shared(key)
         else:
-            return await self._check_memory(key, current_time, window_start)
+            return self._check_memory(key, current_time)
     
-    async def _check_redis(self, key: str, current_time: int, window_start: int) -> tuple[bool, Optional[int]]:
+    async def _check_redis(self, key: str, current_time: float) -> RateLimitResult:
         """Redis 存储的限流检查"""
         cache_client = runtime.get_cache_client()
         if not cache_client:
             # Redis 未配置，回退到内存模式
-            return await self._check_memory(key, current_time, window_start)
+            return self._check_memory(key, current_time)
+        
+        if self.sync_interval > 0:
+            if self._sync_task is None:
+                self._sync_task = asyncio.get_running_loop().create_task(self._sync_loop())
+            return self._check_approximate(key, current_time)
         
         try:
-            # 使用 Redis sorted set 实现滑动窗口
-            cache_key = f"rate_limit:{key}"
-            
-            # 移除窗口外的记录
-            await cache_client.zremrangebyscore(cache_key, 0, window_start)
-            
-            # 获取当前窗口内的请求数
-            count = await cache_client.zcard(cache_key)
+            now_ms = int(current_time * 1000)
+            window_ms = self.window * 1000
             
-            if count >= self.requests:
-                # 获取最早的请求时间
-                oldest = await cache_client.zrange(cache_key, 0, 0, withscores=True)
-                if oldest:
-                    retry_after = int(oldest[0][1]) + self.window - current_time
-                    return False, max(retry_after, 1)
-                return False, self.window
+            if self.algorithm in (ALGORITHM_TOKEN_BUCKET, ALGORITHM_GCRA):
+                allowed, remaining, retry_ms, reset_ms = await cache_client.run_script(
+                    GCRA_SCRIPT,
+                    keys=[f"rate_limit:{key}"],
+                    args=[now_ms, max(round(self.interval * 1000), 1), self.burst],
+                )
+                return self._script_result(allowed, remaining, retry_ms, reset_ms)
             
-            # 添加当前请求
-            await cache_client.zadd(cache_key, {str(current_time): current_time})
+            if self.algorithm == ALGORITHM_SLIDING_WINDOW:
+                # 两个固定窗口计数键使用同一哈希标签，保证落在同一分片
+                index = now_ms // window_ms
+                allowed, count, prev = await cache_client.run_script(
+                    SLIDING_COUNTER_SCRIPT,
+                    keys=[f"rate_limit:{{{key}}}:{index}", f"rate_limit:{{{key}}}:{index - 1}"],
+                    args=[self.requests, window_ms, now_ms - index * window_ms],
+                )
+                elapsed = (now_ms - index * window_ms) / 1000
+                return _sliding_result(bool(allowed), int(count), int(prev), self.requests, self.window, elapsed)
             
-            # 设置过期时间（窗口大小 + 缓冲）
-            await cache_client.expire(cache_key, self.window + 10)
-            
-            return True, None
+            # 使用 Redis sorted set 实现滑动窗口，单次 Lua 调用完成，成员唯一避免同毫秒请求合并
+            allowed, remaining, retry_ms, reset_ms = await cache_client.run_script(
+                SLIDING_WINDOW_SCRIPT,
+                keys=[f"rate_limit:{key}"],
+                args=[now_ms, window_ms, self.requests, f"{now_ms}:{uuid4().hex}"],
+            )
+            return self._script_result(allowed, remaining, retry_ms, reset_ms)
             
         except Exception as e:
             # Redis 错误时回退到内存模式
             logger = get_request_logger()
             logger.warning(f"Redis rate limit failed, fallback to memory: {e}")
-            return await self._check_memory(key, current_time, window_start)
+            return self._check_memory(key, current_time)
+    
+    @staticmethod
+    def _script_result(allowed, remaining, retry_ms, reset_ms) -> RateLimitResult:
+        """Lua 脚本返回值转换为检查结果（毫秒向上取整为秒）"""
+        reset = max(math.ceil(int(reset_ms) / 1000), 0)
+        if not allowed:
+            return RateLimitResult(False, max(math.ceil(int(retry_ms) / 1000), 1), 0, reset)
+        return RateLimitResult(True, None, int(remaining), reset)
     
-    async def _check_memory(self, key: str, current_time: int, window_start: int) -> tuple[bool, Optional[int]]:
-        """内存存储的限流检查"""
-        # 获取或初始化记录
-        if key not in self.memory_store:
-            self.memory_store[key] = []
+    def _check_approximate(self, key: str, current_time: float) -> RateLimitResult:
+        """
+        近似分布式限流检查（不访问 Redis）：
+        窗口剩余的全局限额按在线 worker 数均分，本地未同步计数不超过自己那一份即放行
+        """
+        index = int(current_time // self.window)
+        state = self._approx.get(key)
+        if state is None or state[0] != index:
+            state = [index, 0, 0]
+            self._approx[key] = state
+            if len(self._approx) > self.max_keys:
+                # 只淘汰没有未同步计数的标识，有未同步计数的保留到下次同步
+                evict = next((k for k, s in self._approx.items() if s[2] == 0 and k != key), None)
+                if evict is not None:
+                    del self._approx[evict]
         
-        requests = self.memory_store[key]
+        # 向上取整：剩余限额不足一人一份时仍放行，总超发不超过 worker 数
+        share = math.ceil((self.requests - state[1]) / self._workers)
+        reset = max(math.ceil((index + 1) * self.window - current_time), 1)
+        if state[2] >= share:
+            return RateLimitResult(False, reset, 0, reset)
+        state[2] += 1
+        # 剩余次数按上次同步的全局计数估算
+        return RateLimitResult(True, None, max(self.requests - state[1] - state[2], 0), reset)
+    
+    async def _sync_loop(self) -> None:
+        """定期把本地计数同步到 Redis"""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            cache_client = runtime.get_cache_client()
+            if not cache_client:
+                continue
+            try:
+                await self._sync(cache_client)
+            except Exception as e:
+                # 同步失败保留未同步计数，下次同步时一并提交
+                logger = get_request_logger()
+                logger.warning(f"Redis rate limit sync failed: {e}")
+    
+    async def _sync(self, cache_client) -> None:
+        """
+        同步一次：本地未同步计数以 INCRBY 批量提交（计数为 0 的键只读取），
+        用返回值刷新全局计数，并通过心跳键估算在线 worker 数
+        """
+        index = int(time.time() // self.window)
+        for key in [key for key, state in self._approx.items() if state[0] < index and state[2] == 0]:
+            del self._approx[key]
         
-        # 移除窗口外的记录
-        requests[:] = [ts for ts in requests if ts > window_start]
+        items = list(self._approx.items())
+        for start in range(0, len(items), SYNC_BATCH):
+            chunk = items[start:start + SYNC_BATCH]
+            sent = [state[2] for _, state in chunk]
+            results = await cache_client.incr_many(
+                {f"rate_limit:{key}:{state[0]}": n for (key, state), n in zip(chunk, sent)},
+                expire=self.window * 2,
+            )
+            for (key, state), n in zip(chunk, sent):
+                state[1] = results[f"rate_limit:{key}:{state[0]}"]
+                state[2] -= n
+                if state[0] < index and self._approx.get(key) is state:
+                    # 已结束的窗口提交后不再需要
+                    del self._approx[key]
         
-        if len(requests) >= self.requests:
-            # 计算需要等待的时间
-            retry_after = requests[0] + self.window - current_time
-            return False, max(retry_after, 1)
+        # 每个心跳周期登记一次，在线 worker 数取上一周期与当前周期的较大值
+        tick_size = max(HEARTBEAT_TICK, math.ceil(self.sync_interval * 2))
+        tick = int(time.time() // tick_size)
+        prefix = f"rate_limit:_workers:{self.name}"
+        beats = await cache_client.incr_many(
+            {f"{prefix}:{tick}": 0 if tick == self._heartbeat_tick else 1, f"{prefix}:{tick - 1}": 0},
+            expire=tick_size * 2,
+        )
+        self._heartbeat_tick = tick
+        self._workers = max(max(beats.values()), 1)
+    
+    async def _check_shared(self, key: str) -> RateLimitResult:
+        """共享内存存储的限流检查（滑动窗口计数，跨 worker 精确计数；分段锁被占用时让出事件循环）"""
+        return RateLimitResult(*await self.shared.ahit(f"rate_limit:{key}", self.requests, self.window))
+    
+    def _check_memory(self, key: str, current_time: float) -> RateLimitResult:
+        """内存存储的限流检查（每次 O(1)，总内存受 max_keys 约束）"""
+        if current_time - self._last_gc >= self.gc_interval:
+            self._gc(current_time)
         
-        # 添加当前请求
-        requests.append(current_time)
+        entry = self.memory_store.get(key)
+        if entry is None:
+            entry = [current_time, self._new_state(current_time)]
+            self.memory_store[key] = entry
+            if len(self.memory_store) > self.max_keys:
+                # 超出上限淘汰最久未访问的标识
+                self.memory_store.popitem(last=False)
+        else:
+            entry[0] = current_time
+            self.memory_store.move_to_end(key)
         
-        return True, None
+        if self.algorithm in (ALGORITHM_TOKEN_BUCKET, ALGORITHM_GCRA):
+            return self._hit_gcra(entry, current_time)
+        if self.algorithm == ALGORITHM_SLIDING_WINDOW:
+            return self._hit_counter(entry[1], current_time)
+        return self._hit_log(entry[1], current_time)
+    
+    def _new_state(self, current_time: float) -> Union[deque, List[int], float]:
+        """创建单个标识的限流状态"""
+        if self.algorithm in (ALGORITHM_TOKEN_BUCKET, ALGORITHM_GCRA):
+            return current_time
+        if self.algorithm == ALGORITHM_SLIDING_WINDOW:
+            return [0, 0, 0]
+        return deque(maxlen=self.requests)
+    
+    def _hit_gcra(self, entry: list, current_time: float) -> RateLimitResult:
+        """
+        GCRA：请求放行后 TAT 前移一个发放间隔，TAT 超前当前时间不超过 burst 个间隔即放行；
+        令牌桶中 TAT 即桶重新装满的时刻，桶内令牌数 = burst - (TAT - now) / interval
+        """
+        new_tat = max(entry[1], current_time) + self.interval
+        allow_at = new_tat - self.burst * self.interval
+        if allow_at > current_time:
+            reset = max(math.ceil(entry[1] - current_time), 0)
+            return RateLimitResult(False, max(math.ceil(allow_at - current_time), 1), 0, reset)
+        entry[1] = new_tat
+        remaining = int((current_time - allow_at) / self.interval)
+        return RateLimitResult(True, None, remaining, math.ceil(new_tat - current_time))
+    
+    def _hit_log(self, ring: deque, current_time: float) -> RateLimitResult:
+        """
+        环形缓冲精确滑动窗口：只保存窗口内最近 requests 次放行时间，
+        先弹出已滑出窗口的记录，缓冲已满即超限，缓冲长度即窗口内的请求数
+        """
+        while ring and ring[0] <= current_time - self.window:
+            ring.popleft()
+        if len(ring) >= self.requests:
+            reset = math.ceil(ring[-1] + self.window - current_time)
+            return RateLimitResult(False, max(math.ceil(ring[0] + self.window - current_time), 1), 0, reset)
+        ring.append(current_time)
+        return RateLimitResult(True, None, self.requests - len(ring), math.ceil(self.window))
+    
+    def _hit_counter(self, state: List[int], current_time: float) -> RateLimitResult:
+        """滑动窗口计数：上一窗口计数按剩余时间加权 + 当前窗口计数"""
+        index = int(current_time // self.window)
+        elapsed = current_time - index * self.window
+        if state[0] != index:
+            # 滚动窗口：相邻窗口保留上一窗口计数
+            state[2] = state[1] if state[0] == index - 1 else 0
+            state[1] = 0
+            state[0] = index
+        
+        count, prev = state[1], state[2]
+        if prev * (1 - elapsed / self.window) + count + 1 > self.requests:
+            return _sliding_result(False, count, prev, self.requests, self.window, elapsed)
+        state[1] = count + 1
+        return _sliding_result(True, count + 1, prev, self.requests, self.window, elapsed)
+    
+    def _gc(self, current_time: float) -> int:
+        """
+        清理空闲标识：存储按访问顺序排列，从最久未访问的一端删除，遇到仍活跃的标识即停止
+        
+        Returns:
+            int: 清理的标识数量
+        """
+        self._last_gc = current_time
+        # 超过该时长未访问的标识状态已完全过期（滑动窗口计数需保留上一窗口，GCRA 需等桶装满）
+        if self.algorithm == ALGORITHM_SLIDING_WINDOW:
+            idle = self.window * 2
+        elif self.algorithm in (ALGORITHM_TOKEN_BUCKET, ALGORITHM_GCRA):
+            idle = self.burst * self.interval
+        else:
+            idle = self.window
+        removed = 0
+        while self.memory_store:
+            key, entry = next(iter(self.memory_store.items()))
+            if current_time - entry[0] < idle:
+                break
+            del self.memory_store[key]
+            removed += 1
+        return removed
+    
+    async def flush(self) -> None:
+        """提交未同步的本地计数（近似分布式限流）"""
+        if not any(state[2] for state in self._approx.values()):
+            return
+        cache_client = runtime.get_cache_client()
+        if not cache_client:
+            return
+        try:
+            await self._sync(cache_client)
+        except Exception as e:
+            logger = get_request_logger()
+            logger.warning(f"Redis rate limit flush failed: {e}")
+    
+    async def close(self) -> None:
+        """停止同步任务并提交未同步的本地计数，释放共享内存计数表"""
+        if self._sync_task:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        await self.flush()
+        if self.shared and self._owns_shared:
+            self.shared.close()
+        self.shared = None
+
+
+class RateLimitPolicy:
+    """限流策略：按请求方法 + 路径模式 + 角色匹配，命中后使用独立的限流器"""
+    
+    def __init__(
+        self,
+        name: str,
+        limiter: Optional[RateLimiter],
+        path: str = "*",
+        methods: Iterable[str] = (),
+        roles: Iterable[str] = (),
+    ):
+        """
+        初始化限流策略
+        
+        Args:
+            name: 策略名称
+            limiter: 策略限流器，None 表示命中后不限流
+            path: 路径模式，如 /api/v1/login、/api/v1/users/{id}、/api/v1/*
+            methods: 请求方法，为空表示全部
+            roles: 角色标识（rolekey），为空表示全部
+        """
+        self.name = name
+        self.limiter = limiter
+        self.path = path
+        self.pattern = compile_path(path)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.roles = frozenset(roles)
+    
+    def matches(self, method: str, path: str, role: str) -> bool:
+        """检查请求是否命中策略"""
+        if self.methods and method not in self.methods:
+            return False
+        if self.roles and role not in self.roles:
+            return False
+        if self.pattern is None:
+            return path == self.path
+        return self.pattern.match(path) is not None
 
 
+class RateLimitPolicyMatcher:
+    """
+    策略匹配器：启动时编译规则，按配置顺序取第一条命中的策略
+    
+    精确路径规则按路径建索引，匹配结果按 (方法, 路径, 角色) 缓存，稳定后每个请求只需一次字典查找
+    """
+    
+    def __init__(self, policies: List[RateLimitPolicy], default: Optional[RateLimiter], cache_size: int = 4096):
+        """
+        初始化策略匹配器
+        
+        Args:
+            policies: 策略列表（按优先级排列）
+            default: 未命中任何策略时使用的限流器
+            cache_size: 匹配结果缓存数量
+        """
+        self.policies = policies
+        self.default = default
+        self.cache_size = cache_size
+        # 精确路径索引：{path: [策略序号]}；通配策略序号
+        self._exact: Dict[str, List[int]] = {}
+        self._patterns: List[int] = []
+        for index, policy in enumerate(policies):
+            if policy.pattern is None:
+                self._exact.setdefault(policy.path, []).append(index)
+            else:
+                self._patterns.append(index)
+        self._cache: "OrderedDict[Tuple[str, str, str], Tuple[str, Optional[RateLimiter]]]" = OrderedDict()
+    
+    def resolve(self, method: str, path: str, role: str = "") -> Tuple[str, Optional[RateLimiter]]:
+        """
+        解析请求对应的策略
+        
+        Returns:
+            (策略名称, 限流器)，限流器为 None 表示不限流
+        """
+        cache_key = (method, path, role)
+        result = self._cache.get(cache_key)
+        if result is not None:
+            return result
+        
+        result = ("default", self.default)
+        for index in sorted(self._exact.get(path, []) + self._patterns):
+            policy = self.policies[index]
+            if policy.matches(method, path, role):
+                result = (policy.name, policy.limiter)
+                break
+        
+        self._cache[cache_key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+    
+    def limiters(self) -> List[RateLimiter]:
+        """所有限流器（含默认限流器）"""
+        limiters = [policy.limiter for policy in self.policies if policy.limiter]
+        if self.default:
+            limiters.append(self.default)
+        return limiters
+
+
+class IdentityExtractor:
+    """
+    限流标识提取器：限流中间件早于 JWT 认证执行，Token 经 jwt_required 验签后按摘要记录其 identity 与 rolekey，
+    之后携带同一 Token 的请求按用户计数；未验签、已过期或无 Token 的请求按 IP 计数
+    
+    不读取未验签的声明：伪造 Token 无法换取新的计数桶绕过 IP 限流，也无法冒用他人身份耗尽其限额
+    """
+    
+    def __init__(self, identity_key: str = IDENTITY_KEY, head_name: str = "Bearer", cache_size: int = 10000):
+        """
+        初始化标识提取器
+        
+        Args:
+            identity_key: Claims 中身份标识的键
+            head_name: Authorization 头中 Token 的前缀
+            cache_size: 缓存的 Token 数量
+        """
+        self.identity_key = identity_key
+        self.head_name = head_name
+        self.cache_size = cache_size
+        # 已验签的 Token：{Token 摘要: [身份标识, 过期时间戳, rolekey]}
+        self._cache: "OrderedDict[bytes, list]" = OrderedDict()
+    
+    def _token(self, request: Request) -> Optional[str]:
+        """从 Authorization 头读取 Bearer Token"""
+        header = request.headers.get("Authorization", "")
+        if not header.startswith(self.head_name):
+            return None
+        return header[len(self.head_name):].strip() or None
+    
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        """Token 摘要"""
+        return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+    
+    def extract(self, request: Request) -> Tuple[str, str]:
+        """
+        提取限流标识
+        
+        Returns:
+            (限流标识, 已验签的 rolekey)，限流标识形如 user:{identity} 或 ip:{address}
+        """
+        token = self._token(request)
+        if token:
+            digest = self._digest(token)
+            entry = self._cache.get(digest)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                self._cache.move_to_end(digest)
+                return f"user:{entry[0]}", entry[2]
+        return f"ip:{_client_ip(request)}", ""
+    
+    def verified(self, request: Request, claims: dict) -> None:
+        """Token 验签通过后记录 identity 与 rolekey，后续携带该 Token 的请求按用户计数、按角色匹配策略"""
+        token = self._token(request)
+        identity = claims.get(self.identity_key)
+        if not token or identity is None:
+            return
+        exp = claims.get("exp")
+        digest = self._digest(token)
+        self._cache[digest] = [
+            str(identity),
+            float(exp) if isinstance(exp, (int, float)) else None,
+            claims.get("rolekey", "") or "",
+        ]
+        self._cache.move_to_end(digest)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+def _client_ip(request: Request) -> str:
+    """获取客户端 IP（优先 X-Forwarded-For、X-Real-IP）"""
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(',')[0].strip()
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip:
+        return real_ip
+    return request.client.host if request.client else "unknown"
+
+
+# 全局限流标识提取器
+_identity_extractor = IdentityExtractor()
 # 全局限流器实例
 _rate_limiter: Optional[RateLimiter] = None
+# 全局策略匹配器（配置了策略时创建）
+_policy_matcher: Optional[RateLimitPolicyMatcher] = None
 
 
 def init_rate_limiter(
     requests: int = 100,
     window: int = 60,
-    use_redis: bool = False
+    use_redis: bool = False,
+    use_shared_memory: bool = False,
+    shared_name: str = "dy_yun_rate_limit",
+    algorithm: str = ALGORITHM_SLIDING_LOG,
+    max_keys: int = 100000,
+    burst: int = 0,
+    policies: Optional[List[RateLimitPolicyConfig]] = None,
+    sync_interval: float = 0,
 ) -> None:
-    """初始化全局限流器"""
-    global _rate_limiter
-    _rate_limiter = RateLimiter(requests=requests, window=window, use_redis=use_redis)
+    """初始化全局限流器（配置了策略时同时编译策略匹配器）"""
+    global _rate_limiter, _policy_matcher
+    _rate_limiter = RateLimiter(
+        requests=requests,
+        window=window,
+        use_redis=use_redis,
+        use_shared_memory=use_shared_memory,
+        shared_name=shared_name,
+        algorithm=algorithm,
+        max_keys=max_keys,
+        burst=burst,
+        sync_interval=sync_interval,
+    )
+    
+    _policy_matcher = None
+    if policies:
+        compiled = []
+        for config in policies:
+            limiter = None
+            if config.requests > 0:
+                limiter = RateLimiter(
+                    requests=config.requests,
+                    window=config.window,
+                    use_redis=use_redis,
+                    algorithm=config.algorithm or algorithm,
+                    max_keys=max_keys,
+                    burst=config.burst,
+                    name=config.name,
+                    shared=_rate_limiter.shared,
+                    sync_interval=sync_interval,
+                )
+            compiled.append(RateLimitPolicy(
+                name=config.name,
+                limiter=limiter,
+                path=config.path,
+                methods=config.methods,
+                roles=config.roles,
+            ))
+        _policy_matcher = RateLimitPolicyMatcher(compiled, _rate_limiter)
+
+
+async def close_rate_limiter() -> None:
+    """关闭全局限流器（提交未同步的本地计数）"""
+    global _rate_limiter, _policy_matcher
+    if _policy_matcher:
+        for limiter in _policy_matcher.limiters():
+            await limiter.close()
+        _policy_matcher = None
+    if _rate_limiter:
+        await _rate_limiter.close()
+        _rate_limiter = None
 
 
 def get_rate_limiter() -> Optional[RateLimiter]:
@@ -132,51 +740,114 @@ def get_rate_limiter() -> Optional[RateLimiter]:
     return _rate_limiter
 
 
-async def rate_limit_middleware(request: Request, call_next):
-    """限流中间件"""
-    limiter = get_rate_limiter()
+def get_policy_matcher() -> Optional[RateLimitPolicyMatcher]:
+    """获取策略匹配器"""
+    return _policy_matcher
+
+
+def get_identity_extractor() -> IdentityExtractor:
+    """获取限流标识提取器"""
+    return _identity_extractor
+
+
+def _rate_limit_headers(limiter: RateLimiter, result: RateLimitResult) -> Dict[str, str]:
+    """
+    限流响应头：X-RateLimit-* 与 IETF RateLimit-* 草案头
     
-    # 如果未初始化限流器，直接放行
-    if not limiter:
-        return await call_next(request)
+    X-RateLimit-Reset 为限额完全恢复的 Unix 时间戳，RateLimit-Reset 为剩余秒数
+    """
+    return {
+        "X-RateLimit-Limit": str(limiter.requests),
+        "X-RateLimit-Window": str(limiter.window),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(int(time.time()) + result.reset),
+        "RateLimit-Limit": str(limiter.requests),
+        "RateLimit-Remaining": str(result.remaining),
+        "RateLimit-Reset": str(result.reset),
+        "RateLimit-Policy": f"{limiter.requests};w={limiter.window}",
+    }
+
+
+async def check_rate_limit(scope: Scope) -> Tuple[RawHeader, ...]:
+    """
+    检查请求是否超出限流
     
-    # 获取客户端标识（优先使用用户 ID，否则使用 IP）
-    client_id = None
+    Returns:
+        Tuple[RawHeader, ...]: 需要添加的限流响应头，不限流时为空
+    
+    Raises:
+        HTTPException: 超出限流（429）
+    """
+    limiter = get_rate_limiter()
+    if not limiter and not _policy_matcher:
+        return ()
+    request = Request(scope)
+    
+    # 获取客户端标识（已认证的用户 ID > Token 中的 identity 声明 > IP）
     if hasattr(request.state, "user_id"):
         client_id = f"user:{request.state.user_id}"
+        rolekey = getattr(request.state, "rolekey", "")
     else:
-        # 从 X-Forwarded-For 或 X-Real-IP 获取真实 IP
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            client_id = f"ip:{forwarded.split(',')[0].strip()}"
-        else:
-            real_ip = request.headers.get("X-Real-IP")
-            if real_ip:
-                client_id = f"ip:{real_ip}"
-            else:
-                client_id = f"ip:{request.client.host}" if request.client else "ip:unknown"
+        client_id, rolekey = _identity_extractor.extract(request)
+    
+    # 按请求方法、路径、角色解析策略
+    if _policy_matcher:
+        _policy, limiter = _policy_matcher.resolve(scope["method"], scope["path"], rolekey)
+    
+    # 如果未初始化限流器或策略不限流，直接放行
+    if not limiter:
+        return ()
     
     # 检查限流
-    allowed, retry_after = await limiter.is_allowed(client_id)
+    result = await limiter.is_allowed(client_id)
+    headers = _rate_limit_headers(limiter, result)
     
-    if not allowed:
+    if not result.allowed:
         logger = get_request_logger(getattr(request.state, "request_id", ""))
-        logger.warning(f"Rate limit exceeded: {client_id} {request.method} {request.url.path}")
+        logger.warning(f"Rate limit exceeded: {client_id} {scope['method']} {scope['path']}")
         
         raise HTTPException(
             status_code=HTTP_429_TOO_MANY_REQUESTS,
             detail={
                 "code": HTTP_429_TOO_MANY_REQUESTS,
                 "message": "请求过于频繁，请稍后再试",
-                "retry_after": retry_after
+                "retry_after": result.retry_after
             },
-            headers={"Retry-After": str(retry_after)} if retry_after else {}
+            headers={**headers, "Retry-After": str(result.retry_after)}
         )
     
-    response = await call_next(request)
+    return encode_headers(headers)
+
+
+class RateLimitMiddleware:
+    """限流中间件"""
     
-    # 添加限流信息到响应头
-    response.headers["X-RateLimit-Limit"] = str(limiter.requests)
-    response.headers["X-RateLimit-Window"] = str(limiter.window)
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        raw_headers = await check_rate_limit(scope)
+        if not raw_headers:
+            await self.app(scope, receive, send)
+            return
+        
+        # 添加限流信息到响应头
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                set_headers(message, raw_headers)
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+
+
+async def rate_limit_middleware(request: Request, call_next):
+    """限流中间件函数版本（已弃用，请改用 RateLimitMiddleware；超出限流时抛出 429 HTTPException）"""
+    warn_deprecated("rate_limit_middleware", "RateLimitMiddleware")
+    headers = await check_rate_limit(request.scope)
+    response = await call_next(request)
+    apply_headers(response, headers)
     return response
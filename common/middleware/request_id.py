@@ -2,13 +2,43 @@
 Request ID middleware - 请求 ID 中间件
 """
 import uuid
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from fastapi import Request
+from common.middleware.asgi import RawHeader, apply_headers, get_state, set_headers, warn_deprecated
 
 
-async def request_id_middleware(request: Request, call_next):
-    """请求 ID 中间件函数版本"""
+def assign_request_id(scope: Scope) -> RawHeader:
+    """生成请求 ID 写入 request.state，返回 X-Request-Id 响应头"""
     request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
+    get_state(scope)["request_id"] = request_id
+    return (b"x-request-id", request_id.encode("latin-1"))
+
+
+class RequestIdMiddleware:
+    """请求 ID 中间件：生成请求 ID 写入 request.state，并添加 X-Request-Id 响应头"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        headers = (assign_request_id(scope),)
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                set_headers(message, headers)
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+
+
+async def request_id_middleware(request: Request, call_next):
+    """请求 ID 中间件函数版本（已弃用，请改用 RequestIdMiddleware）"""
+    warn_deprecated("request_id_middleware", "RequestIdMiddleware")
+    header = assign_request_id(request.scope)
     response = await call_next(request)
-    response.headers["X-Request-Id"] = request_id
+    apply_headers(response, (header,))
     return response
@@ -0,0 +1,159 @@
+"""
+Response - 快速 JSON 响应
+全局默认响应类使用 orjson 序列化（未安装时回退到标准库 json）；
+APIResponse 信封按路由缓存 pydantic 序列化器，可信的服务层输出直接序列化为 JSON 字节，跳过 response_model 的重复校验
+"""
+import functools
+import inspect
+import json
+import typing
+from typing import Any, Callable, Dict, Optional
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import JSONResponse
+from common.schemas.response import APIResponse
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson：回退到标准库 json
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """orjson 不能直接序列化的对象"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为紧凑的 UTF-8 JSON 字节"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=_default,
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON 响应：orjson 序列化，已编码的 bytes 内容直接使用"""
+    
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+# 数据类型 → 序列化器
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def get_serializer(data_type: Any) -> TypeAdapter:
+    """获取数据类型的序列化器（按类型缓存）"""
+    adapter = _adapters.get(data_type)
+    if adapter is None:
+        adapter = _adapters[data_type] = TypeAdapter(data_type)
+    return adapter
+
+
+@functools.lru_cache(maxsize=256)
+def _envelope_prefix(code: int, msg: str) -> bytes:
+    """预编码的信封前缀：{"code":...,"msg":...,"data":"""
+    return dumps({"code": code, "msg": msg})[:-1] + b',"data":'
+
+
+def encode_envelope(code: int, msg: str, data: bytes, request_id: Optional[str] = None) -> bytes:
+    """
+    拼接 APIResponse 信封（字段顺序与 APIResponse 一致）
+    
+    Args:
+        code: 状态码
+        msg: 消息
+        data: 已序列化的数据
+        request_id: 请求 ID
+    
+    Returns:
+        bytes: 信封 JSON
+    """
+    return _envelope_prefix(code, msg) + data + b',"request_id":' + dumps(request_id) + b"}"
+
+
+def _envelope_data_type(response_model: Any) -> Optional[type]:
+    """
+    解析 APIResponse[X] 中的数据类型 X
+    
+    Returns:
+        Optional[type]: X 为具体的类时返回 X，否则返回 None（不走快速路径）
+    """
+    if not (inspect.isclass(response_model) and issubclass(response_model, APIResponse)):
+        return None
+    annotation = response_model.model_fields["data"].annotation
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    data_type = args[0] if len(args) == 1 else annotation
+    return data_type if inspect.isclass(data_type) and data_type is not Any else None
+
+
+def _uses_response_param(dependant: Dependant) -> bool:
+    """端点或任一（子）依赖是否注入了 Response 参数"""
+    if dependant.response_param_name is not None:
+        return True
+    return any(_uses_response_param(sub) for sub in dependant.dependencies)
+
+
+class TrustedRoute(APIRoute):
+    """
+    APIResponse 快速路径路由：response_model 为 APIResponse[X] 时，
+    端点返回的 APIResponse 的 data 类型正好是 X（或为 None）则视为可信输出，
+    用缓存的 X 序列化器直接生成 JSON 字节并拼接预编码的信封，跳过 response_model 的校验与 jsonable_encoder；
+    其它返回值仍按 FastAPI 的默认流程校验。
+    端点或其依赖注入了 Response 参数（设置响应头、Cookie、状态码）时不走快速路径：
+    FastAPI 只在端点未返回 Response 时合并这些设置
+    """
+    
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        self.data_type: Optional[type] = None
+        # include_router 复制路由时传入的是已包装的端点
+        endpoint = getattr(endpoint, "__trusted_endpoint__", endpoint)
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = self._wrap(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+        # 字段过滤选项由默认流程处理
+        filtered = (
+            self.response_model_include is not None
+            or self.response_model_exclude is not None
+            or self.response_model_exclude_unset
+            or self.response_model_exclude_defaults
+            or self.response_model_exclude_none
+        )
+        if not filtered and not _uses_response_param(self.dependant):
+            self.data_type = _envelope_data_type(self.response_model)
+    
+    def _wrap(self, endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        """包装端点：可信的 APIResponse 直接序列化为响应"""
+        
+        @functools.wraps(endpoint)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            result = await endpoint(*args, **kwargs)
+            data_type = self.data_type
+            if data_type is None or not isinstance(result, APIResponse):
+                return result
+            data = result.data
+            if data is None:
+                body = b"null"
+            elif type(data) is data_type:
+                body = get_serializer(data_type).dump_json(data, by_alias=self.response_model_by_alias)
+            else:
+                return result
+            return FastJSONResponse(
+                encode_envelope(result.code, result.msg, body, result.request_id),
+                status_code=self.status_code or 200,
+            )
+        
+        wrapper.__trusted_endpoint__ = endpoint
+        return wrapper
@@ -5,7 +5,14 @@ from core.config.loader import Settings, get_settings, load_config, set_config_p
 from core.config.config import (
     ApplicationConfig,
     JWTConfig,
+    RateLimitPolicyConfig,
     RateLimitConfig,
+    ConcurrencyClassConfig,
+    ConcurrencyConfig,
+    CompressionTypeConfig,
+    CompressionConfig,
+    MiddlewareRouteConfig,
+    MiddlewareConfig,
     DatabaseConfig,
     CacheConfig,
     QueueConfig,
@@ -18,7 +25,14 @@ from core.config.config import (
 __all__ = [
     "ApplicationConfig",
     "JWTConfig",
+    "RateLimitPolicyConfig",
     "RateLimitConfig",
+    "ConcurrencyClassConfig",
+    "ConcurrencyConfig",
+    "CompressionTypeConfig",
+    "CompressionConfig",
+    "MiddlewareRouteConfig",
+    "MiddlewareConfig",
     "DatabaseConfig",
     "CacheConfig",
     "QueueConfig",
@@ -1,7 +1,7 @@
 """
 Configuration models - 配置模型
 """
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -23,12 +23,92 @@ class JWTConfig(BaseModel):
     timeout: int = 1440  # Token 过期时间（分钟）
 
 
+class RateLimitPolicyConfig(BaseModel):
+    """限流策略配置（按顺序匹配，第一条命中的策略生效）"""
+    name: str  # 策略名称，同时作为计数键前缀
+    path: str = "*"  # 路径模式：/api/v1/login、/api/v1/users/{id}、/api/v1/*
+    methods: List[str] = Field(default_factory=list)  # 请求方法，为空表示全部
+    roles: List[str] = Field(default_factory=list)  # 角色标识（rolekey），为空表示全部
+    requests: int = 100  # 时间窗口内允许的最大请求数，0 表示不限流
+    window: int = 60  # 时间窗口大小（秒）
+    algorithm: str = ""  # 限流算法，为空表示使用全局配置
+    burst: int = 0  # token_bucket / gcra 突发请求数
+
+
 class RateLimitConfig(BaseModel):
     """限流配置"""
     enabled: bool = False
     requests: int = 100
     window: int = 60
     use_redis: bool = False
+    use_shared_memory: bool = False  # 单机多 worker 共享限额（multiprocessing.shared_memory）
+    shared_name: str = "dy_yun_rate_limit"  # 共享内存名称，同一主机上的多套部署需使用不同名称
+    algorithm: str = "sliding_log"  # 限流算法：sliding_log, sliding_window, token_bucket, gcra
+    burst: int = 0  # token_bucket / gcra 允许的突发请求数，0 表示等于 requests
+    policies: List[RateLimitPolicyConfig] = Field(default_factory=list)  # 按路由/角色的限流策略
+    max_keys: int = 100000  # 内存存储最多保留的限流标识数量
+    sync_interval: float = 0  # use_redis 时的近似限流同步间隔（秒），0 表示每个请求访问 Redis
+
+
+class ConcurrencyClassConfig(BaseModel):
+    """并发限制路由分类（按顺序匹配，第一条命中的分类生效）"""
+    name: str  # 分类名称
+    path: str = "*"  # 路径模式：/api/v1/login、/api/v1/users/{id}、/api/v1/*
+    methods: List[str] = Field(default_factory=list)  # 请求方法，为空表示全部
+    limit: int = 100  # 最大并发数，0 表示不限制
+    priority: str = "normal"  # 过载时的丢弃优先级：low, normal, high
+
+
+class ConcurrencyConfig(BaseModel):
+    """并发限制与过载保护配置"""
+    enabled: bool = False
+    limit: int = 200  # 未命中分类的请求最大并发数，0 表示不限制
+    queue_timeout: float = 1.0  # 等待并发槽位的最长时间（秒），超时返回 503
+    lag_threshold: float = 0.2  # 过载阈值（秒）：事件循环延迟或排队时间超过阈值丢弃 low，超过两倍丢弃 normal
+    lag_interval: float = 0.1  # 事件循环延迟采样间隔（秒）
+    retry_after: int = 1  # 503 响应的 Retry-After（秒）
+    classes: List[ConcurrencyClassConfig] = Field(default_factory=list)  # 路由分类
+
+
+class CompressionTypeConfig(BaseModel):
+    """按内容类型的压缩规则（按顺序匹配，第一条命中的规则生效）"""
+    content_type: str  # 内容类型：application/json、text/*
+    minimum_size: Optional[int] = None  # 最小压缩字节数，为空使用全局 minimum_size
+    enabled: bool = True  # 是否压缩
+
+
+def _default_compression_types() -> List[CompressionTypeConfig]:
+    return [
+        CompressionTypeConfig(content_type="application/json"),
+        CompressionTypeConfig(content_type="text/*"),
+        CompressionTypeConfig(content_type="application/javascript"),
+        CompressionTypeConfig(content_type="application/xml"),
+        CompressionTypeConfig(content_type="image/svg+xml"),
+    ]
+
+
+class CompressionConfig(BaseModel):
+    """响应压缩配置"""
+    enabled: bool = False
+    minimum_size: int = 1024  # 小于该字节数的响应不压缩（流式响应总是压缩）
+    encodings: List[str] = Field(default_factory=lambda: ["zstd", "br", "gzip"])  # 服务端优先顺序，未安装 zstandard / brotli 时自动跳过
+    gzip_level: int = 5  # gzip 压缩级别（1-9）
+    brotli_level: int = 4  # br 压缩级别（0-11）
+    zstd_level: int = 3  # zstd 压缩级别（1-22）
+    types: List[CompressionTypeConfig] = Field(default_factory=_default_compression_types)  # 按内容类型的压缩规则，未命中的类型不压缩
+    offload_size: int = 65536  # 达到该字节数的响应体在线程池中压缩，避免阻塞事件循环
+
+
+class MiddlewareRouteConfig(BaseModel):
+    """按路由的中间件阶段（按顺序匹配，第一条命中的规则生效）"""
+    path: str  # 路由路径模式：/health、/api/v1/users/{id}、/api/v1/*
+    stages: List[str] = Field(default_factory=list)  # 启用的阶段，为空表示直接透传
+
+
+class MiddlewareConfig(BaseModel):
+    """中间件配置"""
+    fused: bool = True  # 是否使用单层融合中间件，False 时逐层注册
+    routes: List[MiddlewareRouteConfig] = Field(default_factory=list)  # 按路由的阶段规则，未命中的路由启用全部阶段
 
 
 class DatabaseConfig(BaseModel):
@@ -47,11 +127,19 @@ class DatabaseConfig(BaseModel):
 
 class CacheConfig(BaseModel):
     """缓存配置"""
-    driver: str = "memory"
+    driver: str = "memory"  # memory, redis, sharded, sqlite
     host: str = "localhost"
     port: int = 6379
     password: str = ""
     db: int = 0
+    nodes: List[str] = Field(default_factory=list)  # sharded 驱动节点列表（host:port）
+    replicas: int = 160  # sharded 驱动每个节点的虚拟节点数
+    tracking: bool = False  # redis 驱动启用客户端缓存（Redis 6+ CLIENT TRACKING）
+    tracking_max_keys: int = 10000  # 客户端缓存最大键数
+    snapshot_file: str = ""  # memory 驱动快照文件，为空表示不持久化
+    snapshot_interval: int = 0  # memory 驱动定期快照间隔（秒），0 表示仅在关闭时保存
+    sqlite_file: str = "./dy_yun_cache.db"  # sqlite 驱动数据库文件，同主机 worker 共享
+    sqlite_purge_interval: int = 60  # sqlite 驱动过期键清理间隔（秒）
 
 
 class QueueConfig(BaseModel):
@@ -76,10 +164,12 @@ class LogConfig(BaseModel):
 
 class CORSConfig(BaseModel):
     """CORS 配置"""
-    allow_origins: List[str] = Field(default_factory=lambda: ["*"])
-    allow_credentials: bool = True
+    allow_origins: List[str] = Field(default_factory=lambda: ["*"])  # 支持 https://*.example.com 形式的通配
+    allow_credentials: bool = False  # 只对明确配置的来源生效，* 不携带凭证
     allow_methods: List[str] = Field(default_factory=lambda: ["*"])
     allow_headers: List[str] = Field(default_factory=lambda: ["*"])
+    expose_headers: List[str] = Field(default_factory=list)  # 允许前端读取的响应头
+    max_age: Optional[int] = 600  # 预检结果缓存秒数（Access-Control-Max-Age），None 表示不发送
 
 
 class SecurityConfig(BaseModel):
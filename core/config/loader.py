@@ -12,6 +12,9 @@ from core.config.config import (
     ApplicationConfig,
     JWTConfig,
     RateLimitConfig,
+    ConcurrencyConfig,
+    CompressionConfig,
+    MiddlewareConfig,
     DatabaseConfig,
     CacheConfig,    QueueConfig,    QueueConfig,
     LogConfig,
@@ -26,6 +29,9 @@ class Settings(BaseSettings):
     application: ApplicationConfig = Field(default_factory=ApplicationConfig)
     jwt: JWTConfig = Field(default_factory=JWTConfig)
     rate_limit: RateLimitConfig = Field(default_factory=RateLimitConfig)
+    concurrency: ConcurrencyConfig = Field(default_factory=ConcurrencyConfig)
+    compression: CompressionConfig = Field(default_factory=CompressionConfig)
+    middleware: MiddlewareConfig = Field(default_factory=MiddlewareConfig)
     database: DatabaseConfig = Field(default_factory=DatabaseConfig)
     cache: CacheConfig = Field(default_factory=CacheConfig)
     queue: QueueConfig = Field(default_factory=QueueConfig)
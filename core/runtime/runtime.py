@@ -1,11 +1,13 @@
 """
 Core runtime module - 运行时依赖注入容器
 """
-from typing import Optional, Dict, Any, TYPE_CHECKING
+import asyncio
+from typing import Optional, Dict, Any, Tuple, TYPE_CHECKING
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from loguru import logger
 
 if TYPE_CHECKING:
+    from redis import asyncio as aioredis
     from core.storage.cache.adapter import AdapterCache
     from core.storage.queue.adapter import AdapterQueue
 
@@ -18,6 +20,10 @@ class Runtime:
         self._db_sessions: Dict[str, async_sessionmaker] = {}
         self._cache_clients: Dict[str, "AdapterCache"] = {}
         self._queue_clients: Dict[str, "AdapterQueue"] = {}
+        # 共享 Redis 连接池：{(host, port, db, password, options): client}
+        self._redis_pools: Dict[Tuple, "aioredis.Redis"] = {}
+        self._redis_refs: Dict[Tuple, int] = {}
+        self._redis_lock: Optional[asyncio.Lock] = None
         self._logger = logger
         self._config: Optional[Dict[str, Any]] = None
         
@@ -61,6 +67,88 @@ class Runtime:
         """获取队列客户端"""
         return self._queue_clients.get(host)
         
+    @staticmethod
+    def _redis_key(host: str, port: int, db: int, password: Optional[str], options: Dict[str, Any]) -> Tuple:
+        """生成 Redis 连接池注册键"""
+        return (host, int(port), int(db), password or None, tuple(sorted(options.items())))
+    
+    def _get_redis_lock(self) -> asyncio.Lock:
+        """获取保护连接池注册表的锁（首次使用时在事件循环内创建）"""
+        if self._redis_lock is None:
+            self._redis_lock = asyncio.Lock()
+        return self._redis_lock
+    
+    async def acquire_redis(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        **options
+    ) -> "aioredis.Redis":
+        """
+        获取共享 Redis 客户端
+        
+        相同 (host, port, db, password, options) 的调用方复用同一个连接池，
+        缓存、队列、限流、锁等子系统不再各自建立连接。
+        每次 acquire 都需要对应一次 release_redis。
+        
+        Args:
+            host: Redis主机
+            port: Redis端口
+            db: 数据库编号
+            password: 密码
+            **options: 其他redis连接参数（参与注册键计算）
+            
+        Returns:
+            aioredis客户端实例
+        """
+        from redis import asyncio as aioredis
+        
+        key = self._redis_key(host, port, db, password, options)
+        async with self._get_redis_lock():
+            client = self._redis_pools.get(key)
+            if client is None:
+                client = aioredis.from_url(
+                    f"redis://{host}:{port}/{db}",
+                    password=password if password else None,
+                    encoding="utf-8",
+                    decode_responses=True,
+                    **options
+                )
+                try:
+                    # 仅在首次创建连接池时测试连接
+                    await client.ping()
+                except Exception:
+                    await client.aclose()
+                    raise
+                self._redis_pools[key] = client
+                self._redis_refs[key] = 0
+                self._logger.success(f"Redis pool created: {host}:{port}/{db}")
+            self._redis_refs[key] += 1
+            return client
+    
+    async def release_redis(self, client: "aioredis.Redis") -> None:
+        """
+        释放共享 Redis 客户端，引用计数归零时关闭连接池
+        
+        与 acquire_redis 持有同一把锁，避免关闭刚被并发 acquire 取走的连接池。
+        
+        Args:
+            client: acquire_redis 返回的客户端
+        """
+        async with self._get_redis_lock():
+            for key, pooled in list(self._redis_pools.items()):
+                if pooled is not client:
+                    continue
+                self._redis_refs[key] -= 1
+                if self._redis_refs[key] <= 0:
+                    self._redis_pools.pop(key, None)
+                    self._redis_refs.pop(key, None)
+                    await client.aclose()
+                    self._logger.debug(f"Redis pool closed: {key[0]}:{key[1]}/{key[2]}")
+                return
+    
     def get_logger(self):
         """获取日志器"""
         return self._logger
@@ -73,6 +161,12 @@ class Runtime:
             await client.close()
         for client in self._queue_clients.values():
             await client.close()
+        # 关闭仍被持有的共享 Redis 连接池
+        async with self._get_redis_lock():
+            for client in list(self._redis_pools.values()):
+                await client.aclose()
+            self._redis_pools.clear()
+            self._redis_refs.clear()
 
 
 # 全局运行时实例
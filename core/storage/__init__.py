@@ -2,10 +2,16 @@
 Storage package - 存储管理包
 """
 from core.storage.cache.adapter import AdapterCache
+from core.storage.cache.lock import CacheLock, LockNotAcquired
+from core.storage.cache.script import Script, register_script
 from core.storage.cache.memory import Memory as CacheMemory
 from core.storage.cache.redis import Redis as CacheRedis
+from core.storage.cache.sharded import Sharded as CacheSharded
+from core.storage.cache.sqlite import SQLite as CacheSQLite
 from core.storage.cache.cache import setup_cache, close_cache
 
+from core.storage.counter.shared import SharedCounters
+
 from core.storage.queue.adapter import AdapterQueue, ConsumerFunc
 from core.storage.queue.message import Message
 from core.storage.queue.memory import Memory as QueueMemory
@@ -15,10 +21,18 @@ from core.storage.queue.queue import setup_queue, close_queue
 __all__ = [
     # Cache
     "AdapterCache",
+    "CacheLock",
+    "LockNotAcquired",
+    "Script",
+    "register_script",
     "CacheMemory",
     "CacheRedis",
+    "CacheSharded",
+    "CacheSQLite",
     "setup_cache",
     "close_cache",
+    # Counter
+    "SharedCounters",
     # Queue
     "AdapterQueue",
     "ConsumerFunc",
@@ -2,14 +2,26 @@
 Cache package - 缓存管理包
 """
 from core.storage.cache.adapter import AdapterCache
+from core.storage.cache.lock import CacheLock, LockNotAcquired
+from core.storage.cache.script import Script, register_script, get_script
 from core.storage.cache.memory import Memory
 from core.storage.cache.redis import Redis
+from core.storage.cache.sharded import Sharded, HashRing
+from core.storage.cache.sqlite import SQLite
 from core.storage.cache.cache import setup_cache, close_cache
 
 __all__ = [
     "AdapterCache",
+    "CacheLock",
+    "LockNotAcquired",
+    "Script",
+    "register_script",
+    "get_script",
     "Memory",
     "Redis",
+    "Sharded",
+    "HashRing",
+    "SQLite",
     "setup_cache",
     "close_cache",
 ]
@@ -1,14 +1,22 @@
 """
 Cache Adapter - 缓存适配器接口
 """
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
 from datetime import timedelta
 
+from .lock import CacheLock
+from .script import Script, get_script
+
 
 class AdapterCache(ABC):
     """缓存适配器抽象基类"""
     
+    # 命名空间代数在本地缓存的时间（秒），其他进程的失效最多延迟该时长可见
+    namespace_generation_ttl: float = 1.0
+    
     @abstractmethod
     def string(self) -> str:
         """返回适配器名称"""
@@ -53,12 +61,61 @@ class AdapterCache(ABC):
     
     @abstractmethod
     async def increase(self, key: str) -> int:
-        """递增计数器"""
+        """递增计数器（键不存在时从 0 开始）"""
         pass
     
     @abstractmethod
     async def decrease(self, key: str) -> int:
-        """递减计数器"""
+        """递减计数器（键不存在时从 0 开始）"""
+        pass
+    
+    @abstractmethod
+    async def incr_by(self, key: str, n: int = 1, ttl_if_new: int = 0) -> int:
+        """
+        原子递增指定步长
+        
+        Args:
+            key: 键
+            n: 步长（可为负数）
+            ttl_if_new: 键由本次调用创建时设置的过期时间（秒），0 表示不设置
+            
+        Returns:
+            int: 递增后的值
+            
+        Raises:
+            ValueError: 原值不是整数
+        """
+        pass
+    
+    @abstractmethod
+    async def set_if_absent(self, key: str, val: Any, expire: int = 0) -> bool:
+        """
+        键不存在时设置值（SETNX）
+        
+        Returns:
+            bool: 是否设置成功
+        """
+        pass
+    
+    @abstractmethod
+    async def compare_and_set(self, key: str, expected: Optional[str], val: Any, expire: int = 0) -> bool:
+        """
+        当前值等于 expected 时设置为新值（CAS）
+        
+        Args:
+            key: 键
+            expected: 期望的当前值，None 表示期望键不存在
+            val: 新值
+            expire: 过期时间（秒），0 表示永不过期
+            
+        Returns:
+            bool: 是否设置成功
+        """
+        pass
+    
+    @abstractmethod
+    async def get_and_delete(self, key: str) -> Optional[str]:
+        """原子读取并删除（GETDEL）"""
         pass
     
     @abstractmethod
@@ -75,3 +132,196 @@ class AdapterCache(ABC):
     async def close(self) -> None:
         """关闭连接"""
         pass
+    
+    # ========== 批量操作（默认逐个执行，适配器可覆盖为单次往返） ==========
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """批量获取缓存值"""
+        return {key: await self.get(key) for key in keys}
+    
+    async def set_many(self, mapping: Dict[str, Any], expire: int = 0) -> None:
+        """
+        批量设置缓存值
+        
+        Args:
+            mapping: {键: 值} 字典
+            expire: 过期时间（秒），0 表示永不过期
+        """
+        for key, val in mapping.items():
+            await self.set(key, val, expire)
+    
+    async def delete_many(self, keys: List[str]) -> None:
+        """批量删除缓存键"""
+        for key in keys:
+            await self.delete(key)
+    
+    async def incr_many(self, mapping: Dict[str, int], expire: int = 0) -> Dict[str, int]:
+        """
+        批量递增计数器
+        
+        Args:
+            mapping: {键: 步长} 字典，步长为 0 时只读取当前值
+            expire: 每次递增后刷新的过期时间（秒），0 表示不设置
+        
+        Returns:
+            Dict[str, int]: {键: 递增后的值}
+        """
+        results = {}
+        for key, n in mapping.items():
+            results[key] = await self.incr_by(key, n)
+            if expire > 0:
+                await self.expire(key, timedelta(seconds=expire))
+        return results
+    
+    # ========== 键遍历 ==========
+    
+    def scan(self, prefix: str = "", batch: int = 100) -> AsyncIterator[str]:
+        """
+        按前缀增量遍历键（非阻塞，遍历期间的增删可能可见也可能不可见）
+        
+        用法:
+            async for key in cache.scan("session:", batch=500):
+                ...
+        
+        Args:
+            prefix: 键前缀，为空表示全部键
+            batch: 每批读取的键数量（Redis SCAN COUNT）
+        """
+        raise NotImplementedError(f"{self.string()} cache adapter does not support scan")
+    
+    async def delete_prefix(self, prefix: str, batch: int = 100) -> int:
+        """
+        按前缀批量删除键
+        
+        Args:
+            prefix: 键前缀（不允许为空）
+            batch: 每批删除的键数量
+        
+        Returns:
+            int: 删除的键数量
+        """
+        if not prefix:
+            raise ValueError("delete_prefix requires a non-empty prefix")
+        
+        deleted = 0
+        pending: List[str] = []
+        async for key in self.scan(prefix, batch):
+            pending.append(key)
+            if len(pending) >= batch:
+                await self.delete_many(pending)
+                deleted += len(pending)
+                pending = []
+        if pending:
+            await self.delete_many(pending)
+            deleted += len(pending)
+        return deleted
+    
+    # ========== 命名空间（基于代数的批量失效） ==========
+    
+    @staticmethod
+    def _generation_key(namespace: str) -> str:
+        """命名空间代数计数器的键"""
+        return f"ns:{namespace}:gen"
+    
+    def _generation_cache(self) -> Dict[str, Tuple[int, float]]:
+        """本地代数缓存：{namespace: (代数, 获取时间)}"""
+        cache = self.__dict__.get("_ns_generations")
+        if cache is None:
+            cache = self._ns_generations = {}
+        return cache
+    
+    async def namespace_generation(self, namespace: str) -> int:
+        """
+        获取命名空间当前代数（本地缓存 namespace_generation_ttl 秒，避免每次查询多一次往返）
+        
+        Args:
+            namespace: 命名空间，如 "user_pages"、"perm:role:3"
+        """
+        local = self._generation_cache()
+        cached = local.get(namespace)
+        now = time.monotonic()
+        if cached and now - cached[1] < self.namespace_generation_ttl:
+            return cached[0]
+        
+        value = await self.get(self._generation_key(namespace))
+        generation = int(value) if value else 0
+        local[namespace] = (generation, now)
+        return generation
+    
+    async def namespace_key(self, namespace: str, key: str) -> str:
+        """
+        生成带代数的命名空间键：{namespace}:g{generation}:{key}
+        
+        代数变化后旧键不再被访问，依靠各自的过期时间自然淘汰，
+        因此命名空间内的键应设置过期时间
+        """
+        generation = await self.namespace_generation(namespace)
+        return f"{namespace}:g{generation}:{key}"
+    
+    async def invalidate_namespace(self, namespace: str) -> int:
+        """
+        使整个命名空间失效（O(1)：递增代数计数器）
+        
+        Returns:
+            int: 新的代数
+        """
+        generation = await self.increase(self._generation_key(namespace))
+        self._generation_cache()[namespace] = (generation, time.monotonic())
+        return generation
+    
+    # ========== Lua 脚本 ==========
+    
+    async def run_script(
+        self,
+        script: Union[str, Script],
+        keys: Sequence[str] = (),
+        args: Sequence[Any] = (),
+    ) -> Any:
+        """
+        执行已注册的脚本（默认使用脚本的 Python 模拟实现，Redis 适配器覆盖为 EVALSHA）
+        
+        Args:
+            script: 脚本对象或注册名称
+            keys: KEYS 参数
+            args: ARGV 参数
+        """
+        if isinstance(script, str):
+            script = get_script(script)
+        if script.emulate is None:
+            raise NotImplementedError(f"Script '{script.name}' has no emulation for {self.string()} cache adapter")
+        return await script.emulate(self, list(keys), list(args))
+    
+    # ========== 锁 ==========
+    
+    async def acquire_lock(self, name: str, ttl: float = 30, wait: float = 10) -> CacheLock:
+        """
+        获取锁
+        
+        Args:
+            name: 锁名称
+            ttl: 锁有效期（秒）
+            wait: 最长等待时间（秒），0 表示不等待
+        
+        Raises:
+            LockNotAcquired: 等待超时
+        """
+        raise NotImplementedError(f"{self.string()} cache adapter does not support locks")
+    
+    async def release_lock(self, lock: CacheLock) -> None:
+        """释放锁（仅持有者可释放）"""
+        raise NotImplementedError(f"{self.string()} cache adapter does not support locks")
+    
+    @asynccontextmanager
+    async def lock(self, name: str, ttl: float = 30, wait: float = 10) -> AsyncIterator[CacheLock]:
+        """
+        锁上下文管理器
+        
+        用法:
+            async with cache.lock("migration", ttl=30, wait=5) as lock:
+                ...  # lock.token 为防护令牌
+        """
+        handle = await self.acquire_lock(name, ttl=ttl, wait=wait)
+        try:
+            yield handle
+        finally:
+            await self.release_lock(handle)
@@ -8,6 +8,8 @@ from core.config.config import CacheConfig
 from .adapter import AdapterCache
 from .memory import Memory
 from .redis import Redis
+from .sharded import Sharded
+from .sqlite import SQLite
 
 
 async def setup_cache(config: CacheConfig, host: str = "default") -> AdapterCache:
@@ -27,7 +29,13 @@ async def setup_cache(config: CacheConfig, host: str = "default") -> AdapterCach
     
     if config.driver == "memory":
         logger.info("Initializing memory cache adapter")
-        adapter = Memory()
+        adapter = Memory(
+            snapshot_file=config.snapshot_file,
+            snapshot_interval=config.snapshot_interval,
+        )
+        # 热启动：映射快照文件，值按需解码
+        adapter.load_snapshot()
+        adapter.start_snapshot()
         
     elif config.driver == "redis":
         logger.info(f"Initializing Redis cache: {config.host}:{config.port}")
@@ -37,10 +45,34 @@ async def setup_cache(config: CacheConfig, host: str = "default") -> AdapterCach
                 port=config.port,
                 db=config.db,
                 password=config.password if config.password else None,
+                tracking=config.tracking,
+                tracking_max_keys=config.tracking_max_keys,
             )
         except Exception as e:
             logger.error(f"Redis connection failed: {e}")
             raise
+    
+    elif config.driver == "sharded":
+        nodes = config.nodes or [f"{config.host}:{config.port}"]
+        logger.info(f"Initializing sharded Redis cache: {', '.join(nodes)}")
+        try:
+            adapter = await Sharded.create(
+                nodes=nodes,
+                db=config.db,
+                password=config.password if config.password else None,
+                replicas=config.replicas,
+            )
+        except Exception as e:
+            logger.error(f"Sharded Redis connection failed: {e}")
+            raise
+    
+    elif config.driver == "sqlite":
+        logger.info(f"Initializing SQLite cache: {config.sqlite_file}")
+        adapter = SQLite(
+            path=config.sqlite_file,
+            purge_interval=config.sqlite_purge_interval,
+        )
+        adapter.start_purge()
     else:
         raise ValueError(f"Unsupported cache driver: {config.driver}")
     
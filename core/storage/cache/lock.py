@@ -0,0 +1,41 @@
+"""
+Cache Lock - 基于缓存的分布式锁
+"""
+import asyncio
+from typing import Optional
+from uuid import uuid4
+
+
+class LockNotAcquired(TimeoutError):
+    """在等待时间内未获取到锁"""
+    
+    def __init__(self, name: str, wait: float):
+        self.name = name
+        self.wait = wait
+        super().__init__(f"Lock '{name}' not acquired within {wait}s")
+
+
+class CacheLock:
+    """锁句柄"""
+    
+    def __init__(self, name: str, token: int, ttl: float, owner: Optional[str] = None):
+        """
+        初始化锁句柄
+        
+        Args:
+            name: 锁名称
+            token: 防护令牌（fencing token），每次成功加锁单调递增，
+                   写入下游资源时携带，下游拒绝比已见令牌更小的写入
+            ttl: 锁有效期（秒）
+            owner: 持有者标识，释放/续期时校验
+        """
+        self.name = name
+        self.token = token
+        self.ttl = ttl
+        self.owner = owner or uuid4().hex
+        # 续期失败（锁已过期或被他人持有）时置为 True
+        self.lost = False
+        self._extend_task: Optional[asyncio.Task] = None
+    
+    def __repr__(self) -> str:
+        return f"CacheLock(name={self.name!r}, token={self.token}, lost={self.lost})"
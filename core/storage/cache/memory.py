@@ -2,11 +2,24 @@
 Memory Cache Adapter - 内存缓存适配器
 """
 import asyncio
+import bisect
+import mmap
+import os
+import struct
 from datetime import datetime, timedelta
-from typing import Any, Optional, Dict
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional, Dict, List, Tuple
 from loguru import logger
 
 from .adapter import AdapterCache
+from .lock import CacheLock, LockNotAcquired
+
+
+# 快照文件格式：文件头 (magic, version, count) + 记录 (expire_ts, key_len, val_len, key, val)
+SNAPSHOT_MAGIC = b"DYMC"
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<4sBI")
+_SNAPSHOT_RECORD = struct.Struct("<dII")
 
 
 class CacheItem:
@@ -26,9 +39,28 @@ class CacheItem:
 class Memory(AdapterCache):
     """内存缓存适配器"""
     
-    def __init__(self):
+    def __init__(self, snapshot_file: str = "", snapshot_interval: int = 0):
+        """
+        初始化内存缓存
+        
+        Args:
+            snapshot_file: 快照文件路径，为空表示不持久化
+            snapshot_interval: 定期快照间隔（秒），0 表示仅在关闭时保存
+        """
         self._items: Dict[str, CacheItem] = {}
+        # 有序键索引（含快照懒加载键），用于前缀遍历；键集合变化时置为 None，下次遍历时重建，写入路径保持 O(1)
+        self._keys: Optional[List[str]] = []
         self._lock = asyncio.Lock()
+        self.snapshot_file = snapshot_file
+        self.snapshot_interval = snapshot_interval
+        # 快照懒加载索引：{key: (值偏移, 值长度, 过期时间)}，首次访问时才解码值
+        self._lazy: Dict[str, Tuple[int, int, Optional[datetime]]] = {}
+        self._mmap: Optional[mmap.mmap] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._closed = False
+        # 本地锁：{name: asyncio.Lock}，防护令牌：{name: 最新令牌}
+        self._named_locks: Dict[str, asyncio.Lock] = {}
+        self._fences: Dict[str, int] = {}
         logger.debug("Memory cache adapter initialized")
     
     def string(self) -> str:
@@ -36,18 +68,168 @@ class Memory(AdapterCache):
         return "memory"
     
     async def _get_item(self, key: str) -> Optional[CacheItem]:
-        """获取缓存项"""
+        """获取缓存项（调用方需持有锁）"""
         item = self._items.get(key)
         if item is None:
-            return None
+            if key not in self._lazy:
+                return None
+            item = self._promote(key)
         
         if item.is_expired():
-            # 过期则删除
-            await self.delete(key)
+            # 过期则删除（已持有锁，直接移除）
+            self._remove(key)
             return None
         
         return item
     
+    def _put(self, key: str, item: CacheItem) -> None:
+        """写入缓存项，新键使有序索引失效（调用方需持有锁）"""
+        if key not in self._items and key not in self._lazy:
+            self._keys = None
+        self._lazy.pop(key, None)
+        self._items[key] = item
+    
+    def _remove(self, key: str) -> None:
+        """移除缓存项，使有序索引失效（调用方需持有锁）"""
+        found = self._items.pop(key, None) is not None
+        found = self._lazy.pop(key, None) is not None or found
+        if found:
+            self._keys = None
+    
+    def _sorted_keys(self) -> List[str]:
+        """有序键索引，键集合变化后首次遍历时排序一次（调用方需持有锁）"""
+        if self._keys is None:
+            self._keys = sorted(self._items.keys() | self._lazy.keys())
+        return self._keys
+    
+    # ========== 快照与热启动 ==========
+    
+    def _promote(self, key: str) -> CacheItem:
+        """从快照映射中解码单个值并放入内存"""
+        offset, length, expired = self._lazy.pop(key)
+        item = CacheItem(self._mmap[offset:offset + length].decode("utf-8"), expired)
+        self._items[key] = item
+        if not self._lazy:
+            self._release_mmap()
+        return item
+    
+    def _release_mmap(self) -> None:
+        """关闭快照映射"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+    
+    def _materialize(self) -> None:
+        """解码全部懒加载项（保存快照前释放文件映射）"""
+        for key in list(self._lazy.keys()):
+            if key not in self._items:
+                self._promote(key)
+        self._lazy.clear()
+        self._release_mmap()
+    
+    def load_snapshot(self) -> int:
+        """
+        通过内存映射加载快照
+        
+        仅扫描记录头建立键索引，值在首次访问时解码；过期项在加载时丢弃
+        
+        Returns:
+            int: 恢复的键数量
+        """
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return 0
+        
+        with open(self.snapshot_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _SNAPSHOT_HEADER.size:
+                return 0
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        try:
+            magic, version, count = _SNAPSHOT_HEADER.unpack_from(mm, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError("invalid snapshot header")
+            
+            now = datetime.now().timestamp()
+            pos = _SNAPSHOT_HEADER.size
+            index: Dict[str, Tuple[int, int, Optional[datetime]]] = {}
+            for _ in range(count):
+                expire_ts, key_len, val_len = _SNAPSHOT_RECORD.unpack_from(mm, pos)
+                pos += _SNAPSHOT_RECORD.size
+                key = mm[pos:pos + key_len].decode("utf-8")
+                pos += key_len
+                if not expire_ts or expire_ts > now:
+                    expired = datetime.fromtimestamp(expire_ts) if expire_ts else None
+                    index[key] = (pos, val_len, expired)
+                pos += val_len
+        except Exception as e:
+            mm.close()
+            logger.warning(f"Memory cache snapshot ignored ({self.snapshot_file}): {e}")
+            return 0
+        
+        self._release_mmap()
+        if index:
+            self._mmap = mm
+            self._lazy = index
+            self._keys = None
+        else:
+            mm.close()
+        logger.info(f"Memory cache snapshot loaded: {len(index)} keys from {self.snapshot_file}")
+        return len(index)
+    
+    @staticmethod
+    def _write_snapshot(path: str, records: List[Tuple[str, str, float]]) -> None:
+        """写入快照文件（先写临时文件再原子替换）"""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(records)))
+            for key, value, expire_ts in records:
+                key_bytes = key.encode("utf-8")
+                val_bytes = value.encode("utf-8")
+                f.write(_SNAPSHOT_RECORD.pack(expire_ts, len(key_bytes), len(val_bytes)))
+                f.write(key_bytes)
+                f.write(val_bytes)
+        os.replace(tmp_path, target)
+    
+    async def save_snapshot(self) -> int:
+        """
+        保存快照（过期项不写入）
+        
+        Returns:
+            int: 写入的键数量
+        """
+        if not self.snapshot_file:
+            return 0
+        
+        async with self._lock:
+            self._materialize()
+            records = [
+                (key, item.value, item.expired.timestamp() if item.expired else 0.0)
+                for key, item in self._items.items()
+                if not item.is_expired()
+            ]
+        
+        # 序列化与写文件放到线程中执行，不阻塞事件循环
+        await asyncio.to_thread(self._write_snapshot, self.snapshot_file, records)
+        logger.debug(f"Memory cache snapshot saved: {len(records)} keys to {self.snapshot_file}")
+        return len(records)
+    
+    def start_snapshot(self) -> None:
+        """启动定期快照任务"""
+        if not self.snapshot_file or self.snapshot_interval <= 0 or self._snapshot_task:
+            return
+        self._snapshot_task = asyncio.create_task(self._snapshot_loop(), name="memory_cache_snapshot")
+    
+    async def _snapshot_loop(self) -> None:
+        """定期保存快照"""
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.save_snapshot()
+            except Exception as e:
+                logger.error(f"Memory cache snapshot failed: {e}")
+    
     async def get(self, key: str) -> Optional[str]:
         """获取缓存值"""
         async with self._lock:
@@ -69,12 +251,52 @@ class Memory(AdapterCache):
             if expire > 0:
                 expired = datetime.now() + timedelta(seconds=expire)
             
-            self._items[key] = CacheItem(value_str, expired)
+            self._put(key, CacheItem(value_str, expired))
     
     async def delete(self, key: str) -> None:
         """删除缓存键"""
         async with self._lock:
-            self._items.pop(key, None)
+            self._remove(key)
+    
+    async def scan(self, prefix: str = "", batch: int = 100) -> AsyncIterator[str]:
+        """
+        按前缀增量遍历键（有序索引上二分定位，每批只短暂持有锁；批次之间键集合变化时按游标在重建的索引上继续）
+        
+        Args:
+            prefix: 键前缀，为空表示全部键
+            batch: 每批读取的键数量
+        """
+        batch = max(int(batch), 1)
+        cursor = prefix
+        inclusive = True
+        while True:
+            async with self._lock:
+                sorted_keys = self._sorted_keys()
+                if inclusive:
+                    start = bisect.bisect_left(sorted_keys, cursor)
+                else:
+                    start = bisect.bisect_right(sorted_keys, cursor)
+                now = datetime.now()
+                keys: List[str] = []
+                end = start
+                while end < len(sorted_keys) and len(keys) < batch:
+                    key = sorted_keys[end]
+                    if not key.startswith(prefix):
+                        break
+                    end += 1
+                    item = self._items.get(key)
+                    expired = item.expired if item is not None else self._lazy[key][2]
+                    if expired is None or now < expired:
+                        keys.append(key)
+                exhausted = end >= len(sorted_keys) or not sorted_keys[end].startswith(prefix)
+                if end > start:
+                    cursor = sorted_keys[end - 1]
+                    inclusive = False
+            
+            for key in keys:
+                yield key
+            if exhausted:
+                return
     
     async def hash_get(self, hk: str, key: str) -> Optional[str]:
         """从哈希表获取值"""
@@ -93,36 +315,66 @@ class Memory(AdapterCache):
         await self.delete(hash_key)
     
     async def increase(self, key: str) -> int:
-        """递增计数器"""
+        """递增计数器（键不存在时从 0 开始，与 Redis INCR 一致）"""
+        return await self.incr_by(key, 1)
+    
+    async def decrease(self, key: str) -> int:
+        """递减计数器（键不存在时从 0 开始，与 Redis DECR 一致）"""
+        return await self.incr_by(key, -1)
+    
+    async def incr_by(self, key: str, n: int = 1, ttl_if_new: int = 0) -> int:
+        """
+        原子递增指定步长
+        
+        Args:
+            key: 键
+            n: 步长（可为负数）
+            ttl_if_new: 键由本次调用创建时设置的过期时间（秒），0 表示不设置
+        """
         async with self._lock:
             item = await self._get_item(key)
             if item is None:
-                raise KeyError(f"Key '{key}' does not exist")
+                expired = None
+                if ttl_if_new > 0:
+                    expired = datetime.now() + timedelta(seconds=ttl_if_new)
+                self._put(key, CacheItem(str(n), expired))
+                return n
             
             try:
                 current_value = int(item.value)
             except ValueError:
                 raise ValueError(f"Value of '{key}' is not an integer")
             
-            new_value = current_value + 1
+            new_value = current_value + n
             item.value = str(new_value)
             return new_value
     
-    async def decrease(self, key: str) -> int:
-        """递减计数器"""
+    async def set_if_absent(self, key: str, val: Any, expire: int = 0) -> bool:
+        """键不存在时设置值"""
+        async with self._lock:
+            if await self._get_item(key) is not None:
+                return False
+            expired = datetime.now() + timedelta(seconds=expire) if expire > 0 else None
+            self._put(key, CacheItem(str(val), expired))
+            return True
+    
+    async def compare_and_set(self, key: str, expected: Optional[str], val: Any, expire: int = 0) -> bool:
+        """当前值等于 expected 时设置为新值，expected 为 None 表示期望键不存在"""
         async with self._lock:
             item = await self._get_item(key)
-            if item is None:
-                raise KeyError(f"Key '{key}' does not exist")
-            
-            try:
-                current_value = int(item.value)
-            except ValueError:
-                raise ValueError(f"Value of '{key}' is not an integer")
-            
-            new_value = current_value - 1
-            item.value = str(new_value)
-            return new_value
+            current = item.value if item else None
+            if current != (None if expected is None else str(expected)):
+                return False
+            expired = datetime.now() + timedelta(seconds=expire) if expire > 0 else None
+            self._put(key, CacheItem(str(val), expired))
+            return True
+    
+    async def get_and_delete(self, key: str) -> Optional[str]:
+        """原子读取并删除"""
+        async with self._lock:
+            item = await self._get_item(key)
+            self._remove(key)
+            return item.value if item else None
     
     async def expire(self, key: str, duration: timedelta) -> None:
         """设置键的过期时间"""
@@ -139,8 +391,59 @@ class Memory(AdapterCache):
             item = await self._get_item(key)
             return item is not None
     
+    async def acquire_lock(self, name: str, ttl: float = 30, wait: float = 10) -> CacheLock:
+        """
+        获取本地锁（进程内有效，持有者与进程同生命周期，ttl 不生效）
+        
+        Args:
+            name: 锁名称
+            ttl: 锁有效期（秒）
+            wait: 最长等待时间（秒），0 表示不等待
+        """
+        lock = self._named_locks.setdefault(name, asyncio.Lock())
+        if wait <= 0:
+            if lock.locked():
+                raise LockNotAcquired(name, wait)
+            await lock.acquire()
+        else:
+            try:
+                await asyncio.wait_for(lock.acquire(), timeout=wait)
+            except asyncio.TimeoutError:
+                raise LockNotAcquired(name, wait) from None
+        
+        token = self._fences.get(name, 0) + 1
+        self._fences[name] = token
+        return CacheLock(name, token, ttl)
+    
+    async def release_lock(self, lock: CacheLock) -> None:
+        """释放本地锁"""
+        named = self._named_locks.get(lock.name)
+        if named is not None and named.locked() and self._fences.get(lock.name) == lock.token:
+            named.release()
+    
     async def close(self) -> None:
-        """关闭连接（内存缓存无需关闭）"""
+        """关闭连接（配置了快照文件时先保存快照）"""
+        if self._closed:
+            return
+        self._closed = True
+        
+        if self._snapshot_task:
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except asyncio.CancelledError:
+                pass
+            self._snapshot_task = None
+        
+        if self.snapshot_file:
+            try:
+                await self.save_snapshot()
+            except Exception as e:
+                logger.error(f"Memory cache snapshot failed: {e}")
+        
         async with self._lock:
             self._items.clear()
+            self._lazy.clear()
+            self._keys = []
+            self._release_mmap()
         logger.debug("Memory cache cleared")
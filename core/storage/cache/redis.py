@@ -1,25 +1,131 @@
 """
 Redis Cache Adapter - Redis缓存适配器
 """
+import asyncio
+from collections import OrderedDict
 from datetime import timedelta
-from typing import Any, Optional, Union
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Union
+from uuid import uuid4
 from redis import asyncio as aioredis
+from redis.asyncio.connection import Connection
+from redis.exceptions import NoScriptError
 from loguru import logger
 
 from .adapter import AdapterCache
+from .lock import CacheLock, LockNotAcquired
+from .script import Script, get_script, get_scripts, register_script
+
+
+# 客户端缓存失效通知频道（CLIENT TRACKING REDIRECT 模式）
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+
+# ========== 内置脚本的模拟实现（供 Memory 等适配器执行同名脚本） ==========
+
+async def _emulate_incr_by(cache: AdapterCache, keys: Sequence[str], args: Sequence[Any]) -> int:
+    return await cache.incr_by(keys[0], int(args[0]), int(args[1]))
+
+
+async def _emulate_compare_and_set(cache: AdapterCache, keys: Sequence[str], args: Sequence[Any]) -> int:
+    expected = None if str(args[0]) == "1" else args[1]
+    return int(await cache.compare_and_set(keys[0], expected, args[2], int(args[3])))
+
+
+async def _emulate_lock_acquire(cache: AdapterCache, keys: Sequence[str], args: Sequence[Any]) -> int:
+    expire = max((int(args[1]) + 999) // 1000, 1)
+    if not await cache.set_if_absent(keys[0], args[0], expire=expire):
+        return 0
+    return await cache.incr_by(keys[1], 1)
+
+
+async def _emulate_lock_release(cache: AdapterCache, keys: Sequence[str], args: Sequence[Any]) -> int:
+    if await cache.get(keys[0]) != args[0]:
+        return 0
+    await cache.delete(keys[0])
+    return 1
+
+
+async def _emulate_lock_extend(cache: AdapterCache, keys: Sequence[str], args: Sequence[Any]) -> int:
+    if await cache.get(keys[0]) != args[0]:
+        return 0
+    await cache.expire(keys[0], timedelta(milliseconds=int(args[1])))
+    return 1
+
+
+# 递增并仅在键新建时设置过期时间
+INCR_BY_SCRIPT = register_script("incr_by", """
+local created = redis.call('EXISTS', KEYS[1]) == 0
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if created and tonumber(ARGV[2]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return value
+""", emulate=_emulate_incr_by)
+
+# 比较并设置：ARGV[1] 为 "1" 时期望键不存在
+COMPARE_AND_SET_SCRIPT = register_script("compare_and_set", """
+local current = redis.call('GET', KEYS[1])
+if ARGV[1] == '1' then
+    if current then return 0 end
+elseif current ~= ARGV[2] then
+    return 0
+end
+if tonumber(ARGV[4]) > 0 then
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[4])
+else
+    redis.call('SET', KEYS[1], ARGV[3])
+end
+return 1
+""", emulate=_emulate_compare_and_set)
+
+# 加锁：SET NX PX 成功后递增防护令牌
+LOCK_ACQUIRE_SCRIPT = register_script("lock_acquire", """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('INCR', KEYS[2])
+end
+return 0
+""", emulate=_emulate_lock_acquire)
+
+# 解锁：仅持有者可删除（compare-and-delete）
+LOCK_RELEASE_SCRIPT = register_script("lock_release", """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""", emulate=_emulate_lock_release)
+
+# 续期：仅持有者可延长有效期
+LOCK_EXTEND_SCRIPT = register_script("lock_extend", """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""", emulate=_emulate_lock_extend)
 
 
 class Redis(AdapterCache):
     """Redis缓存适配器"""
     
-    def __init__(self, client: aioredis.Redis):
+    def __init__(self, client: aioredis.Redis, shared: bool = False, local_cache_size: int = 0):
         """
         初始化Redis适配器
         
         Args:
             client: aioredis客户端实例
+            shared: 客户端是否来自 runtime 共享连接池（关闭时释放引用而非直接断开）
+            local_cache_size: 客户端缓存（tracking 模式）最大键数，0 表示不启用
         """
         self.client = client
+        self._shared = shared
+        # 客户端缓存：{key: value}，按 LRU 淘汰
+        self._local_size = local_cache_size
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        # 读取中的键：失效通知到达时移除，避免把过期值写入本地缓存
+        self._inflight: Dict[str, object] = {}
+        self._tracking_conn: Optional[Connection] = None
+        self._tracking_task: Optional[asyncio.Task] = None
+        # 客户端缓存读取专用连接池（OPTIN 模式，只跟踪经本地缓存读取的键），不进入 runtime 共享连接池
+        self._tracked_client: Optional[aioredis.Redis] = None
         logger.debug("Redis cache adapter initialized")
     
     @classmethod
@@ -29,31 +135,197 @@ class Redis(AdapterCache):
         port: int = 6379,
         db: int = 0,
         password: Optional[str] = None,
+        tracking: bool = False,
+        tracking_max_keys: int = 10000,
         **kwargs
     ) -> "Redis":
         """
-        创建Redis适配器实例
+        创建Redis适配器实例（使用 runtime 共享连接池）
         
         Args:
             host: Redis主机
             port: Redis端口
             db: 数据库编号
             password: 密码
+            tracking: 是否启用服务端辅助的客户端缓存（Redis 6+ CLIENT TRACKING，OPTIN 模式）
+            tracking_max_keys: 客户端缓存最大键数
             **kwargs: 其他redis连接参数
         """
-        client = await aioredis.from_url(
-            f"redis://{host}:{port}/{db}",
+        from core.runtime import runtime
+        
+        client = await runtime.acquire_redis(
+            host=host,
+            port=port,
+            db=db,
+            password=password,
+            **kwargs
+        )
+        logger.success(f"Redis connected: {host}:{port}/{db}")
+        
+        adapter = cls(client, shared=True, local_cache_size=tracking_max_keys if tracking else 0)
+        if tracking:
+            # 跟踪连接单独建池：共享连接池保持可复用，限流脚本等其他读取不会注册跟踪
+            try:
+                tracking_conn, client_id = await cls._open_invalidation_connection(host, port, db, password)
+            except Exception:
+                await adapter.close()
+                raise
+            adapter._tracked_client = aioredis.Redis(
+                host=host,
+                port=port,
+                db=db,
+                password=password if password else None,
+                encoding="utf-8",
+                decode_responses=True,
+                redis_connect_func=cls._tracking_connect_func(client_id),
+                **kwargs
+            )
+            adapter._start_tracking(tracking_conn)
+        await adapter.load_scripts()
+        return adapter
+    
+    # ========== Lua 脚本（EVALSHA） ==========
+    
+    async def load_scripts(self) -> None:
+        """预加载所有已注册脚本（SCRIPT LOAD），后续调用只传 SHA"""
+        try:
+            for script in get_scripts().values():
+                await self.client.script_load(script.lua)
+        except Exception as e:
+            # 预加载失败不影响使用，首次调用时按 NOSCRIPT 重新加载
+            logger.warning(f"Redis SCRIPT LOAD failed: {e}")
+    
+    async def run_script(
+        self,
+        script: Union[str, Script],
+        keys: Sequence[str] = (),
+        args: Sequence[Any] = (),
+    ) -> Any:
+        """
+        通过 EVALSHA 执行已注册脚本，服务端脚本缓存丢失（重启/SCRIPT FLUSH）时自动重新加载
+        
+        Args:
+            script: 脚本对象或注册名称
+            keys: KEYS 参数
+            args: ARGV 参数
+        """
+        if isinstance(script, str):
+            script = get_script(script)
+        try:
+            return await self.client.evalsha(script.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            await self.client.script_load(script.lua)
+            return await self.client.evalsha(script.sha, len(keys), *keys, *args)
+    
+    # ========== 客户端缓存（CLIENT TRACKING） ==========
+    
+    @staticmethod
+    async def _open_invalidation_connection(
+        host: str,
+        port: int,
+        db: int,
+        password: Optional[str],
+    ) -> tuple[Connection, int]:
+        """
+        建立失效通知专用连接并订阅失效频道
+        
+        Returns:
+            (连接, 连接的 CLIENT ID)
+        """
+        conn = Connection(
+            host=host,
+            port=port,
+            db=db,
             password=password if password else None,
             encoding="utf-8",
             decode_responses=True,
-            **kwargs
         )
+        await conn.connect()
+        try:
+            await conn.send_command("CLIENT", "ID")
+            client_id = int(await conn.read_response())
+            await conn.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+            await conn.read_response()
+        except Exception:
+            await conn.disconnect()
+            raise
+        return conn, client_id
+    
+    @staticmethod
+    def _tracking_connect_func(client_id: int):
+        """
+        生成连接初始化函数：跟踪连接建立后以 OPTIN 模式开启 TRACKING 并重定向到失效通知连接，
+        只有紧跟在 CLIENT CACHING YES 之后读取的键才会被跟踪
+        """
+        async def enable_tracking(conn: Connection) -> None:
+            await conn.on_connect()
+            await conn.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "OPTIN")
+            await conn.read_response()
+        
+        return enable_tracking
+    
+    def _start_tracking(self, conn: Connection) -> None:
+        """启动失效通知监听任务"""
+        self._tracking_conn = conn
+        self._tracking_task = asyncio.create_task(
+            self._listen_invalidations(),
+            name="redis_cache_tracking"
+        )
+    
+    async def _listen_invalidations(self) -> None:
+        """监听失效通知并淘汰本地缓存"""
+        try:
+            while True:
+                message = await self._tracking_conn.read_response()
+                if not isinstance(message, list) or len(message) < 3 or message[0] != "message":
+                    continue
+                keys = message[2]
+                if keys is None:
+                    # FLUSHDB / FLUSHALL：清空全部本地缓存
+                    self._local.clear()
+                    self._inflight.clear()
+                    continue
+                for key in keys:
+                    self._evict_local(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 失效通知中断后本地缓存无法保证一致，直接停用
+            logger.warning(f"Redis tracking connection lost, client-side cache disabled: {e}")
+            self._local_size = 0
+            self._local.clear()
+            self._inflight.clear()
+    
+    def _evict_local(self, key: str) -> None:
+        """淘汰本地缓存键"""
+        self._local.pop(key, None)
+        self._inflight.pop(key, None)
+    
+    async def _get_tracked(self, key: str) -> Optional[str]:
+        """通过客户端缓存读取"""
+        if key in self._local:
+            self._local.move_to_end(key)
+            return self._local[key]
         
-        # 测试连接
-        await client.ping()
-        logger.success(f"Redis connected: {host}:{port}/{db}")
+        token = object()
+        self._inflight[key] = token
+        try:
+            # CLIENT CACHING YES 与 GET 在同一连接上依次执行，只跟踪本次读取的键
+            async with self._tracked_client.pipeline(transaction=False) as pipe:
+                pipe.execute_command("CLIENT", "CACHING", "YES")
+                pipe.get(key)
+                _, value = await pipe.execute()
+        finally:
+            # 读取期间收到失效通知时 token 已被移除，此时不写入本地缓存
+            valid = self._inflight.get(key) is token
+            if valid:
+                del self._inflight[key]
         
-        return cls(client)
+        if valid and value is not None and self._local_size > 0:
+            self._local[key] = value
+            while len(self._local) > self._local_size:
+                self._local.popitem(last=False)
+        return value
     
     def string(self) -> str:
         """返回适配器名称"""
@@ -62,6 +334,8 @@ class Redis(AdapterCache):
     async def get(self, key: str) -> Optional[str]:
         """获取缓存值"""
         try:
+            if self._local_size > 0 and self._tracked_client:
+                return await self._get_tracked(key)
             return await self.client.get(key)
         except Exception as e:
             logger.error(f"Redis GET error: {e}")
@@ -81,6 +355,7 @@ class Redis(AdapterCache):
                 await self.client.setex(key, expire, str(val))
             else:
                 await self.client.set(key, str(val))
+            self._evict_local(key)
         except Exception as e:
             logger.error(f"Redis SET error: {e}")
             raise
@@ -89,6 +364,7 @@ class Redis(AdapterCache):
         """删除缓存键"""
         try:
             await self.client.delete(key)
+            self._evict_local(key)
         except Exception as e:
             logger.error(f"Redis DEL error: {e}")
             raise
@@ -119,18 +395,76 @@ class Redis(AdapterCache):
     
     async def increase(self, key: str) -> int:
         """递增计数器"""
+        return await self.incr_by(key, 1)
+    
+    async def decrease(self, key: str) -> int:
+        """递减计数器"""
+        return await self.incr_by(key, -1)
+    
+    async def incr_by(self, key: str, n: int = 1, ttl_if_new: int = 0) -> int:
+        """
+        原子递增指定步长（INCRBY；带 ttl_if_new 时使用 Lua 单次往返）
+        
+        Args:
+            key: 键
+            n: 步长（可为负数）
+            ttl_if_new: 键由本次调用创建时设置的过期时间（秒），0 表示不设置
+        """
         try:
-            return await self.client.incr(key)
+            if ttl_if_new > 0:
+                value = await self.run_script(INCR_BY_SCRIPT, keys=[key], args=[n, ttl_if_new])
+            else:
+                value = await self.client.incrby(key, n)
+            self._evict_local(key)
+            return int(value)
+        except aioredis.ResponseError as e:
+            if "not an integer" in str(e):
+                raise ValueError(f"Value of '{key}' is not an integer") from e
+            logger.error(f"Redis INCRBY error: {e}")
+            raise
         except Exception as e:
-            logger.error(f"Redis INCR error: {e}")
+            logger.error(f"Redis INCRBY error: {e}")
             raise
     
-    async def decrease(self, key: str) -> int:
-        """递减计数器"""
+    async def set_if_absent(self, key: str, val: Any, expire: int = 0) -> bool:
+        """键不存在时设置值（SET NX [EX]）"""
+        try:
+            ok = await self.client.set(key, str(val), nx=True, ex=expire if expire > 0 else None)
+            if ok:
+                self._evict_local(key)
+            return bool(ok)
+        except Exception as e:
+            logger.error(f"Redis SET NX error: {e}")
+            raise
+    
+    async def compare_and_set(self, key: str, expected: Optional[str], val: Any, expire: int = 0) -> bool:
+        """当前值等于 expected 时设置为新值（Lua 单次往返），expected 为 None 表示期望键不存在"""
         try:
-            return await self.client.decr(key)
+            ok = await self.run_script(
+                COMPARE_AND_SET_SCRIPT,
+                keys=[key],
+                args=[
+                    "1" if expected is None else "0",
+                    "" if expected is None else str(expected),
+                    str(val),
+                    max(int(expire), 0),
+                ],
+            )
+            if ok:
+                self._evict_local(key)
+            return bool(ok)
         except Exception as e:
-            logger.error(f"Redis DECR error: {e}")
+            logger.error(f"Redis CAS error: {e}")
+            raise
+    
+    async def get_and_delete(self, key: str) -> Optional[str]:
+        """原子读取并删除（GETDEL，Redis 6.2+）"""
+        try:
+            value = await self.client.getdel(key)
+            self._evict_local(key)
+            return value
+        except Exception as e:
+            logger.error(f"Redis GETDEL error: {e}")
             raise
     
     async def expire(self, key: str, duration: Union[int, timedelta]) -> None:
@@ -159,6 +493,102 @@ class Redis(AdapterCache):
             logger.error(f"Redis EXISTS error: {e}")
             return False
     
+    @staticmethod
+    def _escape_pattern(prefix: str) -> str:
+        """转义 glob 特殊字符，使前缀按字面匹配"""
+        for char in ("\\", "*", "?", "[", "]"):
+            prefix = prefix.replace(char, "\\" + char)
+        return prefix
+    
+    async def scan(self, prefix: str = "", batch: int = 100) -> AsyncIterator[str]:
+        """
+        按前缀增量遍历键（游标 SCAN，不阻塞服务端；同一键可能返回多次）
+        
+        Args:
+            prefix: 键前缀，为空表示全部键
+            batch: 每次 SCAN 的 COUNT 提示值
+        """
+        match = self._escape_pattern(prefix) + "*"
+        cursor = 0
+        while True:
+            try:
+                cursor, keys = await self.client.scan(cursor, match=match, count=batch)
+            except Exception as e:
+                logger.error(f"Redis SCAN error: {e}")
+                raise
+            for key in keys:
+                yield key
+            if not cursor:
+                return
+    
+    # ========== 批量操作 ==========
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """批量获取缓存值（MGET）"""
+        if not keys:
+            return {}
+        try:
+            values = await self.client.mget(keys)
+            return dict(zip(keys, values))
+        except Exception as e:
+            logger.error(f"Redis MGET error: {e}")
+            return {key: None for key in keys}
+    
+    async def set_many(self, mapping: Dict[str, Any], expire: int = 0) -> None:
+        """
+        批量设置缓存值（单次 pipeline 往返）
+        
+        Args:
+            mapping: {键: 值} 字典
+            expire: 过期时间（秒），0 表示永不过期
+        """
+        if not mapping:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, val in mapping.items():
+                    if expire > 0:
+                        pipe.setex(key, expire, str(val))
+                    else:
+                        pipe.set(key, str(val))
+                await pipe.execute()
+            for key in mapping:
+                self._evict_local(key)
+        except Exception as e:
+            logger.error(f"Redis pipeline SET error: {e}")
+            raise
+    
+    async def incr_many(self, mapping: Dict[str, int], expire: int = 0) -> Dict[str, int]:
+        """批量递增计数器（单次 pipeline 往返）"""
+        if not mapping:
+            return {}
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, n in mapping.items():
+                    pipe.incrby(key, n)
+                    if expire > 0:
+                        pipe.expire(key, expire)
+                results = await pipe.execute()
+            for key in mapping:
+                self._evict_local(key)
+        except Exception as e:
+            logger.error(f"Redis pipeline INCRBY error: {e}")
+            raise
+        step = 2 if expire > 0 else 1
+        return {key: int(results[i * step]) for i, key in enumerate(mapping)}
+    
+    async def delete_many(self, keys: List[str]) -> None:
+        """批量删除缓存键"""
+        if not keys:
+            return
+        try:
+            await self.client.delete(*keys)
+            for key in keys:
+                self._evict_local(key)
+        except Exception as e:
+            logger.error(f"Redis DEL error: {e}")
+            raise
+    
     # ========== Sorted Set 操作 ==========
     
     async def zremrangebyscore(self, key: str, min_score: float, max_score: float) -> int:
@@ -231,10 +661,113 @@ class Redis(AdapterCache):
             logger.error(f"Redis ZADD error: {e}")
             raise
     
+    # ========== 分布式锁 ==========
+    
+    @staticmethod
+    def _lock_keys(name: str) -> tuple[str, str]:
+        """锁键与防护令牌键（哈希标签保证二者落在同一节点）"""
+        return f"lock:{{{name}}}", f"lock:{{{name}}}:fence"
+    
+    async def acquire_lock(
+        self,
+        name: str,
+        ttl: float = 30,
+        wait: float = 10,
+        auto_extend: bool = True,
+    ) -> CacheLock:
+        """
+        获取分布式锁（SET NX PX + 防护令牌）
+        
+        Args:
+            name: 锁名称
+            ttl: 锁有效期（秒）
+            wait: 最长等待时间（秒），0 表示不等待
+            auto_extend: 是否在持有期间自动续期（每 ttl/3 续期一次）
+        """
+        lock_key, fence_key = self._lock_keys(name)
+        owner = uuid4().hex
+        ttl_ms = max(int(ttl * 1000), 1)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        delay = 0.01
+        
+        while True:
+            token = await self.run_script(LOCK_ACQUIRE_SCRIPT, keys=[lock_key, fence_key], args=[owner, ttl_ms])
+            if token:
+                break
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise LockNotAcquired(name, wait)
+            # 指数退避轮询，上限 200ms
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.2)
+        
+        lock = CacheLock(name, int(token), ttl, owner=owner)
+        if auto_extend:
+            lock._extend_task = asyncio.create_task(
+                self._extend_lock(lock, lock_key, ttl_ms),
+                name=f"redis_lock_extend_{name}"
+            )
+        return lock
+    
+    async def _extend_lock(self, lock: CacheLock, lock_key: str, ttl_ms: int) -> None:
+        """自动续期任务"""
+        interval = max(lock.ttl / 3, 0.01)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                extended = await self.run_script(LOCK_EXTEND_SCRIPT, keys=[lock_key], args=[lock.owner, ttl_ms])
+            except Exception as e:
+                logger.error(f"Redis lock extend error: {e}")
+                continue
+            if not extended:
+                lock.lost = True
+                logger.warning(f"Redis lock lost: {lock.name} (token {lock.token})")
+                return
+    
+    async def release_lock(self, lock: CacheLock) -> None:
+        """释放分布式锁（compare-and-delete）"""
+        if lock._extend_task:
+            lock._extend_task.cancel()
+            try:
+                await lock._extend_task
+            except asyncio.CancelledError:
+                pass
+            lock._extend_task = None
+        
+        lock_key, _ = self._lock_keys(lock.name)
+        try:
+            released = await self.run_script(LOCK_RELEASE_SCRIPT, keys=[lock_key], args=[lock.owner])
+        except Exception as e:
+            logger.error(f"Redis lock release error: {e}")
+            raise
+        if not released:
+            lock.lost = True
+            logger.warning(f"Redis lock already expired on release: {lock.name} (token {lock.token})")
+    
     async def close(self) -> None:
         """关闭连接"""
         try:
-            await self.client.close()
+            if self._tracking_task:
+                self._tracking_task.cancel()
+                try:
+                    await self._tracking_task
+                except asyncio.CancelledError:
+                    pass
+                self._tracking_task = None
+            if self._tracking_conn:
+                await self._tracking_conn.disconnect()
+                self._tracking_conn = None
+            if self._tracked_client:
+                await self._tracked_client.aclose()
+                self._tracked_client = None
+            self._local.clear()
+            if self._shared:
+                from core.runtime import runtime
+                await runtime.release_redis(self.client)
+                self._shared = False
+            else:
+                await self.client.close()
             logger.debug("Redis connection closed")
         except Exception as e:
             logger.error(f"Redis close error: {e}")
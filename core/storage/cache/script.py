@@ -0,0 +1,68 @@
+"""
+Cache Script - Lua 脚本注册表
+脚本按名称注册一次，Redis 适配器通过 EVALSHA 调用，Memory 适配器使用 Python 模拟实现
+"""
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from core.storage.cache.adapter import AdapterCache
+
+
+# 模拟函数：接收 (缓存适配器, keys, args)，返回与 Lua 脚本一致的结果
+EmulateFunc = Callable[["AdapterCache", Sequence[str], Sequence[Any]], Awaitable[Any]]
+
+
+class Script:
+    """Lua 脚本"""
+    
+    def __init__(self, name: str, lua: str, emulate: Optional[EmulateFunc] = None):
+        """
+        初始化脚本
+        
+        Args:
+            name: 脚本名称
+            lua: Lua 源码
+            emulate: 非 Redis 适配器使用的模拟实现（可选）
+        """
+        self.name = name
+        self.lua = lua
+        self.emulate = emulate
+        self.sha = hashlib.sha1(lua.encode("utf-8")).hexdigest()
+    
+    def __repr__(self) -> str:
+        return f"Script(name={self.name!r}, sha={self.sha[:8]})"
+
+
+# 全局脚本注册表：{name: Script}
+_scripts: Dict[str, Script] = {}
+
+
+def register_script(name: str, lua: str, emulate: Optional[EmulateFunc] = None) -> Script:
+    """
+    注册 Lua 脚本（同名重复注册时覆盖）
+    
+    Args:
+        name: 脚本名称
+        lua: Lua 源码
+        emulate: 非 Redis 适配器使用的模拟实现（可选）
+    
+    Returns:
+        Script: 脚本对象
+    """
+    script = Script(name, lua, emulate)
+    _scripts[name] = script
+    return script
+
+
+def get_script(name: str) -> Script:
+    """按名称获取脚本"""
+    script = _scripts.get(name)
+    if script is None:
+        raise KeyError(f"Script '{name}' is not registered")
+    return script
+
+
+def get_scripts() -> Dict[str, Script]:
+    """获取所有已注册脚本"""
+    return dict(_scripts)
@@ -0,0 +1,313 @@
+"""
+Sharded Redis Cache Adapter - 分片Redis缓存适配器
+基于一致性哈希（虚拟节点）在多个 Redis 节点间路由键
+"""
+import asyncio
+import hashlib
+from bisect import bisect, insort
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+from loguru import logger
+
+from .adapter import AdapterCache
+from .lock import CacheLock
+from .script import Script
+from .redis import Redis
+
+
+class HashRing:
+    """一致性哈希环"""
+    
+    def __init__(self, nodes: Optional[List[str]] = None, replicas: int = 160):
+        """
+        初始化哈希环
+        
+        Args:
+            nodes: 节点名称列表
+            replicas: 每个节点的虚拟节点数量
+        """
+        self.replicas = replicas
+        self._ring: Dict[int, str] = {}
+        self._sorted_hashes: List[int] = []
+        for node in nodes or []:
+            self.add_node(node)
+    
+    @staticmethod
+    def _hash(value: str) -> int:
+        """计算64位哈希值"""
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+    
+    @staticmethod
+    def hash_tag(key: str) -> str:
+        """
+        提取哈希标签（兼容 Redis Cluster 规则）
+        
+        键中第一个非空 {...} 的内容参与哈希，例如 {user:1}:profile 与
+        {user:1}:roles 落在同一分片
+        """
+        start = key.find("{")
+        if start == -1:
+            return key
+        end = key.find("}", start + 1)
+        if end == -1 or end == start + 1:
+            return key
+        return key[start + 1:end]
+    
+    @property
+    def nodes(self) -> List[str]:
+        """返回所有物理节点"""
+        return sorted(set(self._ring.values()))
+    
+    def add_node(self, node: str) -> None:
+        """添加节点（仅约 1/N 的键会迁移到新节点）"""
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            if h not in self._ring:
+                insort(self._sorted_hashes, h)
+            self._ring[h] = node
+    
+    def remove_node(self, node: str) -> None:
+        """移除节点"""
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            if self._ring.get(h) == node:
+                del self._ring[h]
+                self._sorted_hashes.remove(h)
+    
+    def get_node(self, key: str) -> str:
+        """获取键所属节点"""
+        if not self._sorted_hashes:
+            raise RuntimeError("Hash ring is empty")
+        h = self._hash(self.hash_tag(key))
+        idx = bisect(self._sorted_hashes, h) % len(self._sorted_hashes)
+        return self._ring[self._sorted_hashes[idx]]
+
+
+class Sharded(AdapterCache):
+    """分片Redis缓存适配器（客户端分片）"""
+    
+    def __init__(self, shards: Dict[str, Redis], replicas: int = 160):
+        """
+        初始化分片适配器
+        
+        Args:
+            shards: {节点名称: Redis适配器} 字典
+            replicas: 每个节点的虚拟节点数量
+        """
+        if not shards:
+            raise ValueError("Sharded cache requires at least one node")
+        self.shards = shards
+        self.ring = HashRing(list(shards.keys()), replicas=replicas)
+        logger.debug(f"Sharded cache adapter initialized with {len(shards)} nodes")
+    
+    @staticmethod
+    def parse_node(node: str, default_port: int = 6379) -> Tuple[str, int]:
+        """解析 host:port 形式的节点地址"""
+        host, _, port = node.rpartition(":")
+        if not host:
+            return node, default_port
+        return host, int(port)
+    
+    @classmethod
+    async def create(
+        cls,
+        nodes: List[str],
+        db: int = 0,
+        password: Optional[str] = None,
+        replicas: int = 160,
+        **kwargs
+    ) -> "Sharded":
+        """
+        创建分片适配器实例
+        
+        Args:
+            nodes: 节点地址列表（host:port）
+            db: 数据库编号
+            password: 密码
+            replicas: 每个节点的虚拟节点数量
+            **kwargs: 其他redis连接参数
+        """
+        shards: Dict[str, Redis] = {}
+        try:
+            for node in nodes:
+                host, port = cls.parse_node(node)
+                shards[node] = await Redis.create(
+                    host=host,
+                    port=port,
+                    db=db,
+                    password=password,
+                    **kwargs
+                )
+        except Exception:
+            for shard in shards.values():
+                await shard.close()
+            raise
+        return cls(shards, replicas=replicas)
+    
+    def string(self) -> str:
+        """返回适配器名称"""
+        return "sharded"
+    
+    def get_shard(self, key: str) -> Redis:
+        """获取键所属分片"""
+        return self.shards[self.ring.get_node(key)]
+    
+    def _group(self, keys: List[str]) -> Dict[str, List[str]]:
+        """按分片分组键"""
+        groups: Dict[str, List[str]] = {}
+        for key in keys:
+            groups.setdefault(self.ring.get_node(key), []).append(key)
+        return groups
+    
+    async def get(self, key: str) -> Optional[str]:
+        """获取缓存值"""
+        return await self.get_shard(key).get(key)
+    
+    async def set(self, key: str, val: Any, expire: int = 0) -> None:
+        """设置缓存值"""
+        await self.get_shard(key).set(key, val, expire)
+    
+    async def delete(self, key: str) -> None:
+        """删除缓存键"""
+        await self.get_shard(key).delete(key)
+    
+    async def hash_get(self, hk: str, key: str) -> Optional[str]:
+        """从哈希表获取值（按哈希表名路由）"""
+        return await self.get_shard(hk).hash_get(hk, key)
+    
+    async def hash_set(self, hk: str, key: str, val: Any) -> None:
+        """设置哈希表值"""
+        await self.get_shard(hk).hash_set(hk, key, val)
+    
+    async def hash_delete(self, hk: str, key: str) -> None:
+        """删除哈希表键"""
+        await self.get_shard(hk).hash_delete(hk, key)
+    
+    async def increase(self, key: str) -> int:
+        """递增计数器"""
+        return await self.get_shard(key).increase(key)
+    
+    async def decrease(self, key: str) -> int:
+        """递减计数器"""
+        return await self.get_shard(key).decrease(key)
+    
+    async def incr_by(self, key: str, n: int = 1, ttl_if_new: int = 0) -> int:
+        """原子递增指定步长"""
+        return await self.get_shard(key).incr_by(key, n, ttl_if_new)
+    
+    async def set_if_absent(self, key: str, val: Any, expire: int = 0) -> bool:
+        """键不存在时设置值"""
+        return await self.get_shard(key).set_if_absent(key, val, expire)
+    
+    async def compare_and_set(self, key: str, expected: Optional[str], val: Any, expire: int = 0) -> bool:
+        """比较并设置"""
+        return await self.get_shard(key).compare_and_set(key, expected, val, expire)
+    
+    async def get_and_delete(self, key: str) -> Optional[str]:
+        """原子读取并删除"""
+        return await self.get_shard(key).get_and_delete(key)
+    
+    async def expire(self, key: str, duration: Union[int, timedelta]) -> None:
+        """设置键的过期时间"""
+        await self.get_shard(key).expire(key, duration)
+    
+    async def exists(self, key: str) -> bool:
+        """检查键是否存在"""
+        return await self.get_shard(key).exists(key)
+    
+    # ========== 批量操作（按分片并行扇出） ==========
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """批量获取缓存值"""
+        groups = self._group(keys)
+        results = await asyncio.gather(
+            *(self.shards[node].get_many(group) for node, group in groups.items())
+        )
+        merged: Dict[str, Optional[str]] = {}
+        for result in results:
+            merged.update(result)
+        return {key: merged.get(key) for key in keys}
+    
+    async def set_many(self, mapping: Dict[str, Any], expire: int = 0) -> None:
+        """批量设置缓存值"""
+        groups = self._group(list(mapping.keys()))
+        await asyncio.gather(
+            *(
+                self.shards[node].set_many({key: mapping[key] for key in group}, expire)
+                for node, group in groups.items()
+            )
+        )
+    
+    async def delete_many(self, keys: List[str]) -> None:
+        """批量删除缓存键"""
+        groups = self._group(keys)
+        await asyncio.gather(
+            *(self.shards[node].delete_many(group) for node, group in groups.items())
+        )
+    
+    async def incr_many(self, mapping: Dict[str, int], expire: int = 0) -> Dict[str, int]:
+        """批量递增计数器"""
+        groups = self._group(list(mapping.keys()))
+        results = await asyncio.gather(
+            *(
+                self.shards[node].incr_many({key: mapping[key] for key in group}, expire)
+                for node, group in groups.items()
+            )
+        )
+        merged: Dict[str, int] = {}
+        for result in results:
+            merged.update(result)
+        return merged
+    
+    async def scan(self, prefix: str = "", batch: int = 100) -> AsyncIterator[str]:
+        """按前缀遍历键（依次遍历每个分片）"""
+        for shard in self.shards.values():
+            async for key in shard.scan(prefix, batch):
+                yield key
+    
+    # ========== Lua 脚本（按第一个键路由，多键脚本需使用哈希标签） ==========
+    
+    async def run_script(
+        self,
+        script: Union[str, Script],
+        keys: Sequence[str] = (),
+        args: Sequence[Any] = (),
+    ) -> Any:
+        """执行已注册脚本"""
+        if not keys:
+            raise ValueError("Sharded cache requires at least one key to route a script")
+        return await self.get_shard(keys[0]).run_script(script, keys, args)
+    
+    # ========== 分布式锁（按锁名路由到单个分片） ==========
+    
+    async def acquire_lock(self, name: str, ttl: float = 30, wait: float = 10) -> CacheLock:
+        """获取分布式锁"""
+        return await self.get_shard(name).acquire_lock(name, ttl=ttl, wait=wait)
+    
+    async def release_lock(self, lock: CacheLock) -> None:
+        """释放分布式锁"""
+        await self.get_shard(lock.name).release_lock(lock)
+    
+    # ========== Sorted Set 操作 ==========
+    
+    async def zremrangebyscore(self, key: str, min_score: float, max_score: float) -> int:
+        """移除有序集合中指定分数区间的成员"""
+        return await self.get_shard(key).zremrangebyscore(key, min_score, max_score)
+    
+    async def zcard(self, key: str) -> int:
+        """获取有序集合的成员数量"""
+        return await self.get_shard(key).zcard(key)
+    
+    async def zrange(self, key: str, start: int, end: int, withscores: bool = False):
+        """获取有序集合指定范围内的成员"""
+        return await self.get_shard(key).zrange(key, start, end, withscores=withscores)
+    
+    async def zadd(self, key: str, mapping: dict) -> int:
+        """向有序集合添加成员"""
+        return await self.get_shard(key).zadd(key, mapping)
+    
+    async def close(self) -> None:
+        """关闭所有分片连接"""
+        for shard in self.shards.values():
+            await shard.close()
+        logger.debug("Sharded cache connections closed")
@@ -0,0 +1,460 @@
+"""
+SQLite Cache Adapter - SQLite缓存适配器
+
+基于 WAL 模式的 SQLite 文件，同一主机上的多个 worker 进程共享缓存，无需外部服务
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, TypeVar
+from loguru import logger
+
+from .adapter import AdapterCache
+from .lock import CacheLock, LockNotAcquired
+
+T = TypeVar("T")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache ("
+    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL"
+    ") WITHOUT ROWID",
+    # 过期索引：只索引设置了过期时间的键，供批量清理使用
+    "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires) WHERE expires IS NOT NULL",
+)
+
+# 未过期条件
+_ALIVE = "(expires IS NULL OR expires > ?)"
+
+
+def _deadline(expire: float) -> Optional[float]:
+    """过期秒数转换为时间戳，0 表示永不过期"""
+    return time.time() + expire if expire > 0 else None
+
+
+def _prefix_upper(prefix: str) -> Optional[str]:
+    """前缀区间上界（不含），None 表示无上界"""
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            return prefix[:-1] + chr(last + 1)
+        prefix = prefix[:-1]
+    return None
+
+
+class SQLite(AdapterCache):
+    """SQLite缓存适配器"""
+    
+    def __init__(
+        self,
+        path: str,
+        purge_interval: int = 60,
+        purge_batch: int = 1000,
+        busy_timeout: float = 5.0,
+    ):
+        """
+        初始化SQLite缓存
+        
+        Args:
+            path: 数据库文件路径，同一主机上的 worker 使用同一文件即共享缓存
+            purge_interval: 过期键清理间隔（秒），0 表示不启动后台清理
+            purge_batch: 每批清理的过期键数量
+            busy_timeout: 等待其他进程写锁的超时时间（秒）
+        """
+        self.path = path
+        self.purge_interval = purge_interval
+        self.purge_batch = purge_batch
+        self.busy_timeout = busy_timeout
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        
+        # WAL 模式下读写互不阻塞：读、写各用一个连接，连接内串行执行
+        self._writer = self._connect()
+        self._reader = self._connect()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        for statement in _SCHEMA:
+            self._writer.execute(statement)
+        
+        self._purge_task: Optional[asyncio.Task] = None
+        self._closed = False
+        logger.debug(f"SQLite cache adapter initialized: {path}")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """创建连接（自动提交模式，事务显式开启）"""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def string(self) -> str:
+        """返回适配器名称"""
+        return "sqlite"
+    
+    # ========== 线程执行 ==========
+    
+    def _read_sync(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        with self._read_lock:
+            return fn(self._reader)
+    
+    def _write_sync(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        with self._write_lock:
+            # BEGIN IMMEDIATE 立即获取写锁，保证读-改-写在多进程间原子
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._writer)
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+            return result
+    
+    async def _read(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """在线程中执行只读操作，不阻塞事件循环"""
+        return await asyncio.to_thread(self._read_sync, fn)
+    
+    async def _write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """在线程中执行写事务"""
+        return await asyncio.to_thread(self._write_sync, fn)
+    
+    @staticmethod
+    def _get_value(conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute(
+            f"SELECT value FROM cache WHERE key = ? AND {_ALIVE}", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def _put_value(conn: sqlite3.Connection, key: str, val: Any, expires: Optional[float]) -> None:
+        conn.execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            (key, str(val), expires),
+        )
+    
+    # ========== 过期清理 ==========
+    
+    def start_purge(self) -> None:
+        """启动后台过期键清理"""
+        if self.purge_interval > 0 and self._purge_task is None:
+            self._purge_task = asyncio.create_task(self._purge_loop())
+    
+    async def _purge_loop(self) -> None:
+        """定期清理过期键"""
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self.purge_expired()
+            except Exception as e:
+                logger.error(f"SQLite cache purge failed: {e}")
+    
+    async def purge_expired(self) -> int:
+        """
+        分批删除过期键（每批一个短事务，避免长时间持有写锁）
+        
+        Returns:
+            int: 删除的键数量
+        """
+        def purge(conn: sqlite3.Connection) -> int:
+            return conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache WHERE expires <= ? LIMIT ?)",
+                (time.time(), self.purge_batch),
+            ).rowcount
+        
+        total = 0
+        while True:
+            deleted = await self._write(purge)
+            total += deleted
+            if deleted < self.purge_batch:
+                break
+        if total:
+            logger.debug(f"SQLite cache purged {total} expired keys")
+        return total
+    
+    # ========== 基础操作 ==========
+    
+    async def get(self, key: str) -> Optional[str]:
+        """获取缓存值"""
+        return await self._read(lambda conn: self._get_value(conn, key))
+    
+    async def set(self, key: str, val: Any, expire: int = 0) -> None:
+        """
+        设置缓存值
+        
+        Args:
+            key: 键
+            val: 值
+            expire: 过期时间（秒），0 表示永不过期
+        """
+        await self._write(lambda conn: self._put_value(conn, key, val, _deadline(expire)))
+    
+    async def delete(self, key: str) -> None:
+        """删除缓存键"""
+        await self._write(lambda conn: conn.execute("DELETE FROM cache WHERE key = ?", (key,)))
+    
+    async def hash_get(self, hk: str, key: str) -> Optional[str]:
+        """从哈希表获取值"""
+        return await self.get(f"{hk}:{key}")
+    
+    async def hash_set(self, hk: str, key: str, val: Any) -> None:
+        """设置哈希表值"""
+        await self.set(f"{hk}:{key}", val, expire=0)
+    
+    async def hash_delete(self, hk: str, key: str) -> None:
+        """删除哈希表键"""
+        await self.delete(f"{hk}:{key}")
+    
+    async def increase(self, key: str) -> int:
+        """递增计数器（键不存在时从 0 开始，与 Redis INCR 一致）"""
+        return await self.incr_by(key, 1)
+    
+    async def decrease(self, key: str) -> int:
+        """递减计数器（键不存在时从 0 开始，与 Redis DECR 一致）"""
+        return await self.incr_by(key, -1)
+    
+    async def incr_by(self, key: str, n: int = 1, ttl_if_new: int = 0) -> int:
+        """
+        原子递增指定步长（跨进程原子）
+        
+        Args:
+            key: 键
+            n: 步长（可为负数）
+            ttl_if_new: 键由本次调用创建时设置的过期时间（秒），0 表示不设置
+        """
+        def incr(conn: sqlite3.Connection) -> int:
+            row = conn.execute(
+                f"SELECT value, expires FROM cache WHERE key = ? AND {_ALIVE}", (key, time.time())
+            ).fetchone()
+            if row is None:
+                self._put_value(conn, key, n, _deadline(ttl_if_new))
+                return n
+            try:
+                value = int(row[0]) + n
+            except ValueError:
+                raise ValueError(f"Value of '{key}' is not an integer")
+            conn.execute("UPDATE cache SET value = ? WHERE key = ?", (str(value), key))
+            return value
+        
+        return await self._write(incr)
+    
+    async def set_if_absent(self, key: str, val: Any, expire: int = 0) -> bool:
+        """键不存在时设置值"""
+        def set_nx(conn: sqlite3.Connection) -> bool:
+            if self._get_value(conn, key) is not None:
+                return False
+            self._put_value(conn, key, val, _deadline(expire))
+            return True
+        
+        return await self._write(set_nx)
+    
+    async def compare_and_set(self, key: str, expected: Optional[str], val: Any, expire: int = 0) -> bool:
+        """当前值等于 expected 时设置为新值，expected 为 None 表示期望键不存在"""
+        def cas(conn: sqlite3.Connection) -> bool:
+            if self._get_value(conn, key) != (None if expected is None else str(expected)):
+                return False
+            self._put_value(conn, key, val, _deadline(expire))
+            return True
+        
+        return await self._write(cas)
+    
+    async def get_and_delete(self, key: str) -> Optional[str]:
+        """原子读取并删除"""
+        def pop(conn: sqlite3.Connection) -> Optional[str]:
+            value = self._get_value(conn, key)
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return value
+        
+        return await self._write(pop)
+    
+    async def expire(self, key: str, duration: timedelta) -> None:
+        """设置键的过期时间"""
+        def update(conn: sqlite3.Connection) -> int:
+            return conn.execute(
+                f"UPDATE cache SET expires = ? WHERE key = ? AND {_ALIVE}",
+                (time.time() + duration.total_seconds(), key, time.time()),
+            ).rowcount
+        
+        if not await self._write(update):
+            raise KeyError(f"Key '{key}' does not exist")
+    
+    async def exists(self, key: str) -> bool:
+        """检查键是否存在"""
+        return await self.get(key) is not None
+    
+    # ========== 批量操作（单次线程调用 / 单个事务） ==========
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """批量获取缓存值"""
+        if not keys:
+            return {}
+        
+        def select(conn: sqlite3.Connection) -> Dict[str, str]:
+            found: Dict[str, str] = {}
+            now = time.time()
+            # 分块以避开 SQLite 绑定参数数量上限
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND {_ALIVE}",
+                    (*chunk, now),
+                )
+                found.update(rows)
+            return found
+        
+        found = await self._read(select)
+        return {key: found.get(key) for key in keys}
+    
+    async def set_many(self, mapping: Dict[str, Any], expire: int = 0) -> None:
+        """批量设置缓存值"""
+        if not mapping:
+            return
+        expires = _deadline(expire)
+        await self._write(lambda conn: conn.executemany(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            [(key, str(val), expires) for key, val in mapping.items()],
+        ))
+    
+    async def incr_many(self, mapping: Dict[str, int], expire: int = 0) -> Dict[str, int]:
+        """批量递增计数器（单个事务）"""
+        if not mapping:
+            return {}
+        
+        def incr(conn: sqlite3.Connection) -> Dict[str, int]:
+            now = time.time()
+            results = {}
+            for key, n in mapping.items():
+                row = conn.execute(
+                    f"SELECT value, expires FROM cache WHERE key = ? AND {_ALIVE}", (key, now)
+                ).fetchone()
+                try:
+                    value = (int(row[0]) if row else 0) + n
+                except ValueError:
+                    raise ValueError(f"Value of '{key}' is not an integer")
+                expires = _deadline(expire) if expire > 0 else (row[1] if row else None)
+                self._put_value(conn, key, value, expires)
+                results[key] = value
+            return results
+        
+        return await self._write(incr)
+    
+    async def delete_many(self, keys: List[str]) -> None:
+        """批量删除缓存键"""
+        if not keys:
+            return
+        await self._write(lambda conn: conn.executemany(
+            "DELETE FROM cache WHERE key = ?", [(key,) for key in keys]
+        ))
+    
+    async def scan(self, prefix: str = "", batch: int = 100) -> AsyncIterator[str]:
+        """
+        按前缀增量遍历键（主键区间查询，每批从上一批最后一个键之后继续）
+        
+        Args:
+            prefix: 键前缀，为空表示全部键
+            batch: 每批读取的键数量
+        """
+        batch = max(int(batch), 1)
+        upper = _prefix_upper(prefix)
+        cursor: Optional[str] = None
+        
+        def select(conn: sqlite3.Connection) -> List[str]:
+            sql = "SELECT key FROM cache WHERE " + ("key > ?" if cursor is not None else "key >= ?")
+            params: List[Any] = [prefix if cursor is None else cursor]
+            if upper is not None:
+                sql += " AND key < ?"
+                params.append(upper)
+            sql += " ORDER BY key LIMIT ?"
+            params.append(batch)
+            return [row[0] for row in conn.execute(sql, params)]
+        
+        def alive(conn: sqlite3.Connection, keys: List[str]) -> List[str]:
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT key FROM cache WHERE key IN ({placeholders}) AND {_ALIVE} ORDER BY key",
+                (*keys, time.time()),
+            )
+            return [row[0] for row in rows]
+        
+        while True:
+            keys = await self._read(select)
+            if not keys:
+                return
+            cursor = keys[-1]
+            for key in await self._read(lambda conn: alive(conn, keys)):
+                yield key
+            if len(keys) < batch:
+                return
+    
+    # ========== 锁（跨进程，依赖 ttl 过期，不自动续期） ==========
+    
+    async def acquire_lock(self, name: str, ttl: float = 30, wait: float = 10) -> CacheLock:
+        """
+        获取锁（同一数据库文件的所有进程互斥）
+        
+        Args:
+            name: 锁名称
+            ttl: 锁有效期（秒），需覆盖临界区执行时间
+            wait: 最长等待时间（秒），0 表示不等待
+        """
+        lock_key, fence_key = f"lock:{name}", f"lock:{name}:fence"
+        handle = CacheLock(name, 0, ttl)
+        
+        def try_acquire(conn: sqlite3.Connection) -> int:
+            if self._get_value(conn, lock_key) is not None:
+                return 0
+            self._put_value(conn, lock_key, handle.owner, _deadline(ttl))
+            row = conn.execute("SELECT value FROM cache WHERE key = ?", (fence_key,)).fetchone()
+            token = int(row[0]) + 1 if row else 1
+            self._put_value(conn, fence_key, token, None)
+            return token
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        delay = 0.01
+        while True:
+            token = await self._write(try_acquire)
+            if token:
+                handle.token = token
+                return handle
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise LockNotAcquired(name, wait)
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.2)
+    
+    async def release_lock(self, lock: CacheLock) -> None:
+        """释放锁（仅持有者可释放）"""
+        released = await self._write(lambda conn: conn.execute(
+            "DELETE FROM cache WHERE key = ? AND value = ?", (f"lock:{lock.name}", lock.owner)
+        ).rowcount)
+        if not released:
+            lock.lost = True
+            logger.warning(f"SQLite lock '{lock.name}' expired before release")
+    
+    async def close(self) -> None:
+        """关闭连接"""
+        if self._closed:
+            return
+        self._closed = True
+        
+        if self._purge_task:
+            self._purge_task.cancel()
+            try:
+                await self._purge_task
+            except asyncio.CancelledError:
+                pass
+            self._purge_task = None
+        
+        with self._write_lock, self._read_lock:
+            self._writer.close()
+            self._reader.close()
+        logger.debug("SQLite cache connection closed")
@@ -0,0 +1,8 @@
+"""
+Counter package - 计数器包
+"""
+from core.storage.counter.shared import SharedCounters
+
+__all__ = [
+    "SharedCounters",
+]
@@ -0,0 +1,359 @@
+"""
+Shared Counters - 跨进程共享内存计数器
+
+同一主机上的多个 worker 进程通过 multiprocessing.shared_memory 共享一张固定大小的计数表，
+用于单机限流与指标计数，无需 Redis 往返；
+表头记录挂载进程的 PID，worker 被强制结束（SIGKILL）后遗留的挂载在下次挂载时清理
+"""
+import asyncio
+import errno
+import hashlib
+import math
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows：无 fcntl，仅进程内互斥
+    fcntl = None
+
+
+# 表头：(magic, version, slots, refs)，其后为挂载进程 PID 表（0 表示空位）
+_MAGIC = b"DYSC"
+_VERSION = 2
+_HEADER = struct.Struct("<4sIII")
+# 挂载进程表容量（同一进程挂载多次时占用多个位置）
+MAX_ATTACH = 1024
+_PIDS = struct.Struct(f"<{MAX_ATTACH}i")
+_TABLE_OFFSET = _HEADER.size + _PIDS.size
+# 槽位：(键哈希, 窗口秒数, 保留, 窗口序号, 当前窗口计数, 上一窗口计数)，键哈希为 0 表示空槽
+_SLOT = struct.Struct("<QIIqqq")
+# 单个键最多探测的槽位数，超出后淘汰最旧的槽位
+MAX_PROBES = 16
+# 异步持锁被其他 worker 占用时的最大退避间隔（秒）
+MAX_LOCK_BACKOFF = 0.002
+
+
+def _key_hash(key: str) -> int:
+    """跨进程稳定的 64 位键哈希（内置 hash() 每个进程加盐不同）"""
+    value = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+    return value or 1
+
+
+def _pid_alive(pid: int) -> bool:
+    """进程是否仍存在（需与挂载进程处于同一 PID 命名空间）"""
+    if os.name == "nt":
+        # Windows 的 os.kill 会结束进程；共享内存随最后一个句柄关闭释放，无需清理
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedCounters:
+    """共享内存计数表"""
+    
+    def __init__(self, name: str, slots: int = 65536, stripes: int = 64):
+        """
+        创建或挂载共享计数表
+        
+        Args:
+            name: 共享内存名称，同名的进程共享同一张表
+            slots: 槽位数量（每个槽位 40 字节）
+            stripes: 锁分段数量，每段独占一段连续槽位，不同分段的键互不阻塞（进程内与跨进程均按分段加锁）
+        """
+        self.name = name
+        self.stripes = max(int(stripes), 1)
+        self._stripe_slots = max(int(slots) // self.stripes, 1)
+        self.slots = self._stripe_slots * self.stripes
+        size = _TABLE_OFFSET + self.slots * _SLOT.size
+        
+        # 每个分段（及表头）一把线程锁：fcntl 锁按进程持有，同一进程内的线程需要各自互斥
+        self._thread_locks = [threading.Lock() for _ in range(self.stripes + 1)]
+        self._lock_fd: Optional[int] = None
+        if fcntl is not None:
+            lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+            self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        
+        # 表头锁（偏移 stripes）串行化创建与挂载进程表
+        with self._locked(self.stripes):
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                _HEADER.pack_into(self._shm.buf, 0, _MAGIC, _VERSION, self.slots, 0)
+            except FileExistsError:
+                self._shm = shared_memory.SharedMemory(name=name)
+            # 生命周期由引用计数管理，避免任一 worker 退出时 resource_tracker 删除共享内存
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+            
+            magic, version, table_slots, _ = _HEADER.unpack_from(self._shm.buf, 0)
+            if magic != _MAGIC or version != _VERSION or table_slots != self.slots:
+                self._shm.close()
+                raise ValueError(f"Shared counter table '{name}' exists with an incompatible layout")
+            pids = self._live_pids()
+            if len(pids) < MAX_ATTACH:
+                pids.append(os.getpid())
+            else:
+                logger.warning(f"Shared counters '{name}' attach table full, pid {os.getpid()} not recorded")
+            refs = self._write_pids(pids)
+        
+        self._buf = self._shm.buf
+        self._closed = False
+        logger.debug(f"Shared counters attached: {name} ({self.slots} slots, refs={refs})")
+    
+    def _live_pids(self) -> List[int]:
+        """挂载进程表中仍存活的 PID，清理已退出却未卸载的挂载（调用方需持有表头锁）"""
+        pids = [pid for pid in _PIDS.unpack_from(self._shm.buf, _HEADER.size) if pid]
+        live = [pid for pid in pids if _pid_alive(pid)]
+        if len(live) < len(pids):
+            logger.warning(f"Shared counters '{self.name}' cleared {len(pids) - len(live)} stale attachment(s)")
+        return live
+    
+    def _write_pids(self, pids: List[int]) -> int:
+        """写回挂载进程表与引用计数（调用方需持有表头锁）"""
+        _PIDS.pack_into(self._shm.buf, _HEADER.size, *pids, *([0] * (MAX_ATTACH - len(pids))))
+        magic, version, slots, _ = _HEADER.unpack_from(self._shm.buf, 0)
+        _HEADER.pack_into(self._shm.buf, 0, magic, version, slots, len(pids))
+        return len(pids)
+    
+    def _lock_file(self, stripe: int, blocking: bool) -> bool:
+        """跨进程文件字节区间锁，非阻塞模式下被占用时返回 False"""
+        if self._lock_fd is None:
+            return True
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.lockf(self._lock_fd, flags, 1, stripe)
+        except OSError as e:
+            if blocking or e.errno not in (errno.EACCES, errno.EAGAIN):
+                raise
+            return False
+        return True
+    
+    def _unlock(self, stripe: int) -> None:
+        """释放分段锁"""
+        if self._lock_fd is not None:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, stripe)
+        self._thread_locks[stripe].release()
+    
+    @contextmanager
+    def _locked(self, stripe: int) -> Iterator[None]:
+        """阻塞持有分段锁：分段线程锁 + 跨进程文件字节区间锁（同步调用方、挂载与卸载使用）"""
+        self._thread_locks[stripe].acquire()
+        try:
+            self._lock_file(stripe, True)
+        except BaseException:
+            self._thread_locks[stripe].release()
+            raise
+        try:
+            yield
+        finally:
+            self._unlock(stripe)
+    
+    def _try_lock(self, stripe: int) -> bool:
+        """非阻塞尝试持有分段锁"""
+        if not self._thread_locks[stripe].acquire(blocking=False):
+            return False
+        try:
+            locked = self._lock_file(stripe, False)
+        except BaseException:
+            self._thread_locks[stripe].release()
+            raise
+        if not locked:
+            self._thread_locks[stripe].release()
+        return locked
+    
+    @asynccontextmanager
+    async def _alocked(self, stripe: int) -> AsyncIterator[None]:
+        """事件循环中持有分段锁：非阻塞尝试，被占用时让出事件循环并退避重试，不在系统调用中阻塞"""
+        delay = 0.0
+        while not self._try_lock(stripe):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2 or 0.0001, MAX_LOCK_BACKOFF)
+        try:
+            yield
+        finally:
+            self._unlock(stripe)
+    
+    def _offset(self, slot: int) -> int:
+        return _TABLE_OFFSET + slot * _SLOT.size
+    
+    def _find(self, h: int, window: int, index: int) -> int:
+        """
+        定位键所在槽位，不存在则占用空槽/过期槽，探测满时淘汰最旧的槽位（调用方需持有分段锁）
+        
+        Returns:
+            int: 槽位序号，已按当前窗口滚动
+        """
+        base = (h % self.stripes) * self._stripe_slots
+        start = h // self.stripes
+        now = time.time()
+        
+        candidate = -1
+        oldest, oldest_age = -1, None
+        for i in range(min(MAX_PROBES, self._stripe_slots)):
+            slot = base + (start + i) % self._stripe_slots
+            slot_hash, slot_window, _, slot_index, count, prev = _SLOT.unpack_from(self._buf, self._offset(slot))
+            if slot_hash == h:
+                if slot_window == window and slot_index != index:
+                    # 滚动窗口：相邻窗口保留上一窗口计数
+                    prev = count if slot_index == index - 1 else 0
+                    _SLOT.pack_into(self._buf, self._offset(slot), h, window, 0, index, 0, prev)
+                elif slot_window != window:
+                    _SLOT.pack_into(self._buf, self._offset(slot), h, window, 0, index, 0, 0)
+                return slot
+            if slot_hash == 0:
+                if candidate < 0:
+                    candidate = slot
+                break
+            stale = slot_window > 0 and slot_index < int(now // slot_window) - 1
+            if stale and candidate < 0:
+                candidate = slot
+            age = slot_index * slot_window if slot_window else math.inf
+            if oldest_age is None or age < oldest_age:
+                oldest, oldest_age = slot, age
+        
+        if candidate < 0:
+            candidate = oldest
+            logger.debug(f"Shared counters '{self.name}' evicted slot {candidate}")
+        _SLOT.pack_into(self._buf, self._offset(candidate), h, window, 0, index, 0, 0)
+        return candidate
+    
+    @staticmethod
+    def _window_index(window: int) -> int:
+        return int(time.time() // window) if window > 0 else 0
+    
+    def incr(self, key: str, n: int = 1, window: int = 0) -> int:
+        """
+        递增计数
+        
+        Args:
+            key: 键
+            n: 步长（可为负数）
+            window: 固定窗口大小（秒），0 表示不重置的普通计数器
+        
+        Returns:
+            int: 当前窗口内的计数
+        """
+        h = _key_hash(key)
+        index = self._window_index(window)
+        with self._locked(h % self.stripes):
+            slot = self._find(h, window, index)
+            offset = self._offset(slot)
+            fields = list(_SLOT.unpack_from(self._buf, offset))
+            fields[4] += n
+            _SLOT.pack_into(self._buf, offset, *fields)
+            return fields[4]
+    
+    def get(self, key: str, window: int = 0) -> int:
+        """获取当前窗口内的计数"""
+        return self.incr(key, 0, window)
+    
+    def reset(self, key: str, window: int = 0) -> None:
+        """清零计数"""
+        h = _key_hash(key)
+        with self._locked(h % self.stripes):
+            slot = self._find(h, window, self._window_index(window))
+            _SLOT.pack_into(self._buf, self._offset(slot), h, window, 0, self._window_index(window), 0, 0)
+    
+    def hit(self, key: str, limit: int, window: int) -> Tuple[bool, Optional[int], int, int]:
+        """
+        滑动窗口计数限流：估算值 = 上一窗口计数 × 剩余权重 + 当前窗口计数
+        
+        Args:
+            key: 限流标识
+            limit: 窗口内允许的最大请求数
+            window: 窗口大小（秒）
+        
+        Returns:
+            (是否允许, 被拒绝时建议的重试秒数, 剩余次数, 限额完全恢复的秒数)
+        """
+        h = _key_hash(key)
+        now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+        with self._locked(h % self.stripes):
+            allowed, count, prev = self._hit_slot(h, limit, window, index, elapsed)
+        return self._hit_result(allowed, count, prev, limit, window, elapsed)
+    
+    async def ahit(self, key: str, limit: int, window: int) -> Tuple[bool, Optional[int], int, int]:
+        """hit 的异步版本：分段锁被其他 worker 占用时让出事件循环，不阻塞同一 worker 的其他请求"""
+        h = _key_hash(key)
+        now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+        async with self._alocked(h % self.stripes):
+            allowed, count, prev = self._hit_slot(h, limit, window, index, elapsed)
+        return self._hit_result(allowed, count, prev, limit, window, elapsed)
+    
+    def _hit_slot(self, h: int, limit: int, window: int, index: int, elapsed: float) -> Tuple[bool, int, int]:
+        """
+        检查并计入一次请求（调用方需持有分段锁）
+        
+        Returns:
+            (是否允许, 当前窗口计数, 上一窗口计数)
+        """
+        slot = self._find(h, window, index)
+        offset = self._offset(slot)
+        fields = list(_SLOT.unpack_from(self._buf, offset))
+        count, prev = fields[4], fields[5]
+        
+        allowed = prev * (1 - elapsed / window) + count + 1 <= limit
+        if allowed:
+            count += 1
+            fields[4] = count
+            _SLOT.pack_into(self._buf, offset, *fields)
+        return allowed, count, prev
+    
+    @staticmethod
+    def _hit_result(
+        allowed: bool, count: int, prev: int, limit: int, window: int, elapsed: float
+    ) -> Tuple[bool, Optional[int], int, int]:
+        """由槽位计数计算限流结果（不需要持有锁）"""
+        # 当前窗口有计数时需等到下一窗口结束才完全恢复
+        reset = math.ceil(window - elapsed + (window if count else 0)) if count or prev else 0
+        if allowed:
+            remaining = max(math.floor(limit - prev * (1 - elapsed / window) - count), 0)
+            return True, None, remaining, reset
+        
+        if count + 1 > limit or prev <= 0:
+            retry_after = window - elapsed
+        else:
+            # 上一窗口权重衰减到估算值低于 limit 所需的时间
+            retry_after = window * (1 - (limit - count - 1) / prev) - elapsed
+        return False, max(math.ceil(retry_after), 1), 0, reset
+    
+    def close(self) -> None:
+        """卸载计数表，最后一个存活的挂载进程卸载时删除共享内存"""
+        if self._closed:
+            return
+        self._closed = True
+        
+        with self._locked(self.stripes):
+            pids = self._live_pids()
+            if os.getpid() in pids:
+                pids.remove(os.getpid())
+            refs = self._write_pids(pids)
+            self._buf = None
+            self._shm.close()
+            if refs == 0:
+                # unlink() 会向 resource_tracker 注销，先重新登记以保持配对
+                resource_tracker.register(self._shm._name, "shared_memory")
+                try:
+                    self._shm.unlink()
+                except FileNotFoundError:
+                    pass
+        
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        logger.debug(f"Shared counters detached: {self.name}")
@@ -74,16 +74,16 @@ class Redis(AdapterQueue):
         return instance
     
     async def _connect(self) -> None:
-        """连接到 Redis"""
+        """连接到 Redis（使用 runtime 共享连接池）"""
+        from core.runtime import runtime
+        
         try:
-            self._client = await aioredis.from_url(
-                f"redis://{self.host}:{self.port}/{self.db}",
+            self._client = await runtime.acquire_redis(
+                host=self.host,
+                port=self.port,
+                db=self.db,
                 password=self.password,
-                encoding="utf-8",
-                decode_responses=True
             )
-            # 测试连接
-            await self._client.ping()
             logger.info(f"Redis queue connected: {self.host}:{self.port}/{self.db}")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
@@ -274,5 +274,7 @@ class Redis(AdapterQueue):
             await self.shutdown()
         
         if self._client:
-            await self._client.close()
+            from core.runtime import runtime
+            await runtime.release_redis(self._client)
+            self._client = None
             logger.info("Redis queue connection closed")
@@ -15,8 +15,18 @@ from core import (
     close_database,
 )
 from common.storage import setup_storage, close_storage
-from common.middleware import init_rate_limiter, register_middlewares
+from common.middleware import (
+    init_rate_limiter,
+    close_rate_limiter,
+    init_load_shedder,
+    close_load_shedder,
+    init_compression,
+    close_compression,
+    init_cors,
+    register_middlewares,
+)
 from common.routers import register_routers
+from common.response import FastJSONResponse
 
 
 @asynccontextmanager
@@ -39,15 +49,58 @@ async def lifespan(app: FastAPI):
         init_rate_limiter(
             requests=settings.rate_limit.requests,
             window=settings.rate_limit.window,
-            use_redis=settings.rate_limit.use_redis
+            use_redis=settings.rate_limit.use_redis,
+            use_shared_memory=settings.rate_limit.use_shared_memory,
+            shared_name=settings.rate_limit.shared_name,
+            algorithm=settings.rate_limit.algorithm,
+            max_keys=settings.rate_limit.max_keys,
+            burst=settings.rate_limit.burst,
+            policies=settings.rate_limit.policies,
+            sync_interval=settings.rate_limit.sync_interval,
+        )
+    
+    # 5. 初始化并发限制与过载保护
+    if settings.concurrency.enabled:
+        init_load_shedder(
+            limit=settings.concurrency.limit,
+            queue_timeout=settings.concurrency.queue_timeout,
+            lag_threshold=settings.concurrency.lag_threshold,
+            lag_interval=settings.concurrency.lag_interval,
+            retry_after=settings.concurrency.retry_after,
+            classes=settings.concurrency.classes,
         )
     
+    # 6. 初始化响应压缩
+    if settings.compression.enabled:
+        init_compression(
+            minimum_size=settings.compression.minimum_size,
+            encodings=settings.compression.encodings,
+            gzip_level=settings.compression.gzip_level,
+            brotli_level=settings.compression.brotli_level,
+            zstd_level=settings.compression.zstd_level,
+            types=settings.compression.types,
+            offload_size=settings.compression.offload_size,
+        )
+    
+    # 7. 初始化 CORS 策略
+    init_cors(
+        allow_origins=settings.cors.allow_origins,
+        allow_credentials=settings.cors.allow_credentials,
+        allow_methods=settings.cors.allow_methods,
+        allow_headers=settings.cors.allow_headers,
+        expose_headers=settings.cors.expose_headers,
+        max_age=settings.cors.max_age,
+    )
+    
     # 保存配置到 Runtime
     runtime.set_config(settings.model_dump())
     
     yield
     
     # 关闭时清理资源
+    close_compression()
+    close_load_shedder()
+    await close_rate_limiter()
     await close_storage()
     await close_database()
 
@@ -63,6 +116,7 @@ def create_app() -> FastAPI:
         version=settings.application.version,
         description="企业级中后台应用框架",
         lifespan=lifespan,
+        default_response_class=FastJSONResponse,
     )
     
     # 1. 注册全局中间件
@@ -0,0 +1,117 @@
+"""
+响应压缩基准测试 - 字节数与延迟的权衡
+
+对每种编码与压缩级别统计（进程内直接调用 CompressionResponder，不含网络与服务器开销）：
+    字节数:   压缩后的响应体大小与压缩率
+    压缩耗时: 单个响应的 CPU 时间（中位数）
+    总延迟:   压缩耗时 + 按指定带宽估算的传输时间
+
+运行方式：
+    python tests/benchmark_compression.py
+    python tests/benchmark_compression.py --bandwidth 2 --runs 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.config import CompressionTypeConfig
+from common.middleware.compression import (
+    Compressor,
+    CompressionResponder,
+    ENCODING_BROTLI,
+    ENCODING_GZIP,
+    ENCODING_ZSTD,
+    available_encodings,
+)
+
+# 各编码参与对比的压缩级别
+LEVELS = {
+    ENCODING_GZIP: (1, 5, 9),
+    ENCODING_BROTLI: (1, 4, 11),
+    ENCODING_ZSTD: (1, 3, 9, 19),
+}
+
+
+def _users(count: int) -> List[dict]:
+    return [
+        {
+            "id": i,
+            "username": f"user{i}",
+            "nickName": f"用户{i}",
+            "phone": f"138{i:08d}",
+            "email": f"user{i}@example.com",
+            "sex": i % 2,
+            "deptId": i % 10,
+            "roleId": i % 3 + 1,
+            "status": 1,
+        }
+        for i in range(count)
+    ]
+
+
+def _payloads() -> List[Tuple[str, bytes, List[bytes]]]:
+    """(名称, 内容类型, 响应体分块)：单块为完整响应，多块为流式响应"""
+    page = json.dumps({"code": 200, "msg": "success", "data": {"list": _users(100)}}, ensure_ascii=False).encode()
+    large = json.dumps({"code": 200, "msg": "success", "data": {"list": _users(1000)}}, ensure_ascii=False).encode()
+    rows = [",".join(str(v) for v in user.values()).encode() + b"\n" for user in _users(10000)]
+    export = [b"".join(rows[i:i + 100]) for i in range(0, len(rows), 100)]
+    return [
+        ("用户分页(100)", b"application/json", [page]),
+        ("用户分页(1000)", b"application/json", [large]),
+        ("导出CSV(流式)", b"text/csv", export),
+    ]
+
+
+async def compress(compressor: Compressor, encoding: str, content_type: bytes, chunks: List[bytes]) -> Tuple[int, float]:
+    """压缩一个响应，返回 (压缩后字节数, 耗时秒)"""
+    size = 0
+    
+    async def send(message):
+        nonlocal size
+        size += len(message.get("body", b""))
+    
+    responder = CompressionResponder(compressor, encoding, send)
+    start = time.perf_counter()
+    await responder({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+    for i, chunk in enumerate(chunks):
+        await responder({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return size, time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="响应压缩基准测试")
+    parser.add_argument("--runs", type=int, default=20, help="每种组合的压缩次数")
+    parser.add_argument("--bandwidth", type=float, default=10, help="估算传输时间使用的带宽（Mbps）")
+    args = parser.parse_args()
+    
+    encodings = available_encodings()
+    missing = [e for e in LEVELS if e not in encodings]
+    if missing:
+        print(f"⚠️  未安装对应依赖，跳过: {', '.join(missing)}")
+    bytes_per_ms = args.bandwidth * 1_000_000 / 8 / 1000
+    types = [CompressionTypeConfig(content_type="application/json"), CompressionTypeConfig(content_type="text/csv")]
+    
+    for name, content_type, chunks in _payloads():
+        raw = sum(len(c) for c in chunks)
+        print(f"\n📦 {name}: 原始 {raw:,} 字节，传输 {raw / bytes_per_ms:.1f}ms @ {args.bandwidth:g}Mbps")
+        print(f"   {'编码':<6}{'级别':>4}{'字节数':>12}{'压缩率':>8}{'压缩耗时':>10}{'总延迟':>10}")
+        for encoding in encodings:
+            for level in LEVELS[encoding]:
+                compressor = Compressor(minimum_size=0, encodings=[encoding], levels={encoding: level}, types=types)
+                results = [await compress(compressor, encoding, content_type, chunks) for _ in range(args.runs)]
+                size = results[0][0]
+                cpu_ms = statistics.median(elapsed for _, elapsed in results) * 1000
+                total_ms = cpu_ms + size / bytes_per_ms
+                print(f"   {encoding:<6}{level:>4}{size:>12,}{size / raw:>8.1%}{cpu_ms:>8.2f}ms{total_ms:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+锁性能基准测试 - 竞争下的加锁延迟与吞吐
+
+运行方式：
+    python tests/benchmark_lock.py                      # Memory 适配器
+    python tests/benchmark_lock.py --redis localhost:6379  # Redis 适配器
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.storage.cache import AdapterCache, Memory, Redis
+
+
+async def run_benchmark(cache: AdapterCache, workers: int, iterations: int, locks: int) -> None:
+    """并发 worker 竞争 locks 把锁，统计加锁延迟与吞吐"""
+    latencies = []
+    
+    async def worker(index: int):
+        for i in range(iterations):
+            name = f"bench:{(index + i) % locks}"
+            start = time.perf_counter()
+            async with cache.lock(name, ttl=5, wait=30):
+                latencies.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(workers)))
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    total = len(latencies)
+    print(f"📊 {cache.string()} | workers={workers} locks={locks} 总次数={total}")
+    print(f"   吞吐: {total / elapsed:,.0f} 次/秒")
+    print(f"   延迟: p50={latencies[total // 2] * 1000:.3f}ms "
+          f"p99={latencies[int(total * 0.99) - 1] * 1000:.3f}ms "
+          f"mean={statistics.mean(latencies) * 1000:.3f}ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="锁性能基准测试")
+    parser.add_argument("--redis", help="Redis 地址 host:port，不指定则测试 Memory 适配器")
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    
+    if args.redis:
+        host, _, port = args.redis.partition(":")
+        cache = await Redis.create(host=host, port=int(port or 6379))
+    else:
+        cache = Memory()
+    
+    try:
+        # 高竞争：所有 worker 抢同一把锁；低竞争：分散到多把锁
+        for locks in (1, 10, args.workers):
+            await run_benchmark(cache, args.workers, args.iterations, locks)
+    finally:
+        await cache.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+"""
+中间件栈性能基准测试 - /health 每秒请求数
+
+对比以下实现（进程内直接调用 ASGI 应用，不含网络与服务器开销）：
+    base_http: 改写前的 app.middleware("http") 函数式中间件（每层包一个 BaseHTTPMiddleware）
+    asgi:      逐层注册的纯 ASGI 中间件（fused=False）
+    fused:     单层融合中间件，/health 启用全部阶段
+    fused_route: 单层融合中间件，/health 按路由规则只启用 error_handler、request_id
+
+运行方式：
+    python tests/benchmark_middleware.py
+    python tests/benchmark_middleware.py --requests 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI, Request
+from loguru import logger
+from starlette.responses import JSONResponse
+from core.config import MiddlewareRouteConfig
+from common.middleware import get_rate_limiter, init_rate_limiter, register_middlewares
+
+
+def _add_health(app: FastAPI) -> FastAPI:
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "version": "bench"}
+    return app
+
+
+def create_base_http_app() -> FastAPI:
+    """改写前的中间件栈：与原函数式中间件逻辑相同，注册顺序相同"""
+    app = FastAPI()
+    
+    async def error_handler(request: Request, call_next):
+        try:
+            response = await call_next(request)
+            if response.status_code == 404:
+                return JSONResponse(status_code=404, content={"code": 404})
+            return response
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"code": 500, "data": str(e)})
+    
+    async def secure(request: Request, call_next):
+        response = await call_next(request)
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        return response
+    
+    async def options(request: Request, call_next):
+        if request.method != "OPTIONS":
+            return await call_next(request)
+        return JSONResponse(status_code=200, content={})
+    
+    async def no_cache(request: Request, call_next):
+        response = await call_next(request)
+        response.headers["Cache-Control"] = "no-cache, no-store, max-age=0, must-revalidate"
+        response.headers["Expires"] = "Thu, 01 Jan 1970 00:00:00 GMT"
+        response.headers["Last-Modified"] = datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")
+        return response
+    
+    async def request_id(request: Request, call_next):
+        request.state.request_id = str(uuid.uuid4())
+        response = await call_next(request)
+        response.headers["X-Request-Id"] = request.state.request_id
+        return response
+    
+    async def log(request: Request, call_next):
+        start_time = time.time()
+        logger.info(f"→ {request.method} {request.url.path}")
+        response = await call_next(request)
+        logger.info(f"← {request.method} {request.url.path} {response.status_code} {time.time() - start_time:.3f}s")
+        return response
+    
+    async def rate_limit(request: Request, call_next):
+        limiter = get_rate_limiter()
+        client_id = f"ip:{request.client.host}" if request.client else "ip:unknown"
+        await limiter.is_allowed(client_id)
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(limiter.requests)
+        response.headers["X-RateLimit-Window"] = str(limiter.window)
+        return response
+    
+    for middleware in (error_handler, secure, options, no_cache, request_id, log, rate_limit):
+        app.middleware("http")(middleware)
+    return _add_health(app)
+
+
+def create_asgi_app(fused: bool = False, routes=()) -> FastAPI:
+    """纯 ASGI 中间件栈"""
+    app = FastAPI()
+    register_middlewares(app, fused=fused, routes=list(routes))
+    return _add_health(app)
+
+
+async def run_benchmark(name: str, app: FastAPI, requests: int, concurrency: int) -> float:
+    """并发调用 /health，返回每秒请求数"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/health",
+        "raw_path": b"/health",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def worker(n: int):
+        for _ in range(n):
+            status = []
+            
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+            
+            await app(dict(scope, state={}), receive, send)
+            assert status == [200]
+    
+    # 预热：构建中间件栈与路由缓存
+    await worker(100)
+    
+    per_worker = requests // concurrency
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    rps = per_worker * concurrency / elapsed
+    print(f"📊 {name:<11} | 请求数={per_worker * concurrency} 并发={concurrency} | 吞吐: {rps:,.0f} 次/秒")
+    return rps
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="中间件栈性能基准测试")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    
+    # 关闭日志输出，只测中间件本身
+    logger.remove()
+    init_rate_limiter(requests=10 ** 9, window=60)
+    
+    health_route = MiddlewareRouteConfig(path="/health", stages=["error_handler", "request_id"])
+    before = await run_benchmark("base_http", create_base_http_app(), args.requests, args.concurrency)
+    layered = await run_benchmark("asgi", create_asgi_app(), args.requests, args.concurrency)
+    fused = await run_benchmark("fused", create_asgi_app(True), args.requests, args.concurrency)
+    fused_route = await run_benchmark("fused_route", create_asgi_app(True, [health_route]), args.requests, args.concurrency)
+    print(f"   asgi 相对 base_http 提升: {layered / before:.2f}x")
+    print(f"   fused 相对 asgi 提升: {fused / layered:.2f}x，按路由选择阶段: {fused_route / layered:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+"""
+缓存适配器单元测试
+"""
+import asyncio
+import hashlib
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from redis.exceptions import NoScriptError
+
+from core.storage.cache import Memory, Redis, LockNotAcquired, register_script
+
+
+async def test_namespace_invalidation():
+    """测试命名空间代数失效"""
+    print("🧪 测试命名空间失效...")
+    cache = Memory()
+    
+    key = await cache.namespace_key("user_pages", "page:1")
+    assert key == "user_pages:g0:page:1"
+    await cache.set(key, "cached", expire=60)
+    assert await cache.get(await cache.namespace_key("user_pages", "page:1")) == "cached"
+    
+    assert await cache.invalidate_namespace("user_pages") == 1
+    assert await cache.get(await cache.namespace_key("user_pages", "page:1")) is None
+    assert await cache.invalidate_namespace("user_pages") == 2
+    
+    # 其他命名空间不受影响
+    assert await cache.namespace_key("perm:role:3", "check") == "perm:role:3:g0:check"
+    await cache.close()
+    print("✅ 命名空间失效测试通过")
+
+
+async def test_namespace_generation_cached_locally():
+    """测试代数在本地缓存，过期后重新读取"""
+    print("🧪 测试代数本地缓存...")
+    cache = Memory()
+    other = Memory()
+    # 模拟另一个进程：共享底层存储
+    other._items = cache._items
+    
+    assert await cache.namespace_generation("users") == 0
+    await other.invalidate_namespace("users")
+    assert await cache.namespace_generation("users") == 0, "TTL 内使用本地代数"
+    
+    cache.namespace_generation_ttl = 0
+    assert await cache.namespace_generation("users") == 1
+    await cache.close()
+    print("✅ 代数本地缓存测试通过")
+
+
+async def test_memory_lock():
+    """测试本地锁互斥与防护令牌"""
+    print("🧪 测试本地锁...")
+    cache = Memory()
+    order = []
+    
+    async def worker(i: int):
+        async with cache.lock("job", wait=5) as lock:
+            order.append(("in", i, lock.token))
+            await asyncio.sleep(0.01)
+            order.append(("out", i, lock.token))
+    
+    await asyncio.gather(*(worker(i) for i in range(5)))
+    
+    # 临界区不交叉，令牌单调递增
+    for j in range(0, len(order), 2):
+        assert order[j][0] == "in" and order[j + 1][0] == "out"
+        assert order[j][1] == order[j + 1][1]
+    assert [order[j][2] for j in range(0, len(order), 2)] == [1, 2, 3, 4, 5]
+    
+    async with cache.lock("job"):
+        try:
+            await cache.acquire_lock("job", wait=0.05)
+            assert False, "应抛出 LockNotAcquired"
+        except LockNotAcquired:
+            pass
+    await cache.close()
+    print("✅ 本地锁测试通过")
+
+
+async def test_script_emulation():
+    """测试 Memory 适配器执行脚本的模拟实现"""
+    print("🧪 测试脚本模拟...")
+    cache = Memory()
+    
+    async def emulate(adapter, keys, args):
+        total = 0
+        for key in keys:
+            total += await adapter.incr_by(key, int(args[0]))
+        return total
+    
+    register_script("test_incr_all", "-- 仅用于测试", emulate=emulate)
+    assert await cache.run_script("test_incr_all", keys=["a", "b"], args=[3]) == 6
+    assert await cache.get("b") == "3"
+    
+    # 内置脚本同样可在 Memory 上执行
+    assert await cache.run_script("incr_by", keys=["c"], args=[2, 0]) == 2
+    assert await cache.run_script("compare_and_set", keys=["c"], args=["0", "2", "x", 0]) == 1
+    assert await cache.get("c") == "x"
+    
+    register_script("test_no_emulate", "return 1")
+    try:
+        await cache.run_script("test_no_emulate")
+        assert False, "应抛出 NotImplementedError"
+    except NotImplementedError:
+        pass
+    await cache.close()
+    print("✅ 脚本模拟测试通过")
+
+
+async def test_redis_evalsha_reload():
+    """测试 EVALSHA 遇到 NOSCRIPT 时重新加载脚本"""
+    print("🧪 测试 EVALSHA 重新加载...")
+    
+    class FakeClient:
+        def __init__(self):
+            self.scripts = {}
+            self.loads = 0
+        
+        async def script_load(self, lua):
+            self.loads += 1
+            sha = hashlib.sha1(lua.encode("utf-8")).hexdigest()
+            self.scripts[sha] = lua
+            return sha
+        
+        async def evalsha(self, sha, numkeys, *keys_and_args):
+            if sha not in self.scripts:
+                raise NoScriptError("NOSCRIPT No matching script")
+            return list(keys_and_args)
+    
+    script = register_script("test_echo", "return {KEYS[1], ARGV[1]}")
+    client = FakeClient()
+    cache = Redis(client)
+    
+    # 首次调用：服务端无缓存，加载后重试
+    assert await cache.run_script(script, keys=["k"], args=["v"]) == ["k", "v"]
+    assert client.loads == 1
+    # 后续调用只传 SHA
+    assert await cache.run_script("test_echo", keys=["k"], args=["v"]) == ["k", "v"]
+    assert client.loads == 1
+    
+    # 模拟 SCRIPT FLUSH
+    client.scripts.clear()
+    assert await cache.run_script(script, keys=["k"], args=["v"]) == ["k", "v"]
+    assert client.loads == 2
+    print("✅ EVALSHA 重新加载测试通过")
+
+
+async def test_memory_scan():
+    """测试 Memory 有序索引遍历：跳过过期键，遍历期间删除、写入不影响后续批次，索引在遍历时才排序"""
+    print("🧪 测试前缀遍历...")
+    cache = Memory()
+    for i in range(10):
+        await cache.set(f"session:{i}", i)
+    await cache.set("session:expired", 1, expire=1)
+    await cache.set("sessions", 1)
+    cache._items["session:expired"].expired = cache._items["session:expired"].expired.replace(year=2000)
+    assert cache._keys is None, "写入新键只标记索引失效，不在写入路径上排序"
+    
+    seen = []
+    async for key in cache.scan("session:", batch=3):
+        seen.append(key)
+        await cache.delete(key)
+        if key == "session:2":
+            # 游标之后的新键在重建的索引上继续遍历到，游标之前的不会重复出现
+            await cache.set("session:0b", 1)
+            await cache.set("session:2b", 1)
+    assert seen == [f"session:{i}" for i in range(3)] + ["session:2b"] + [f"session:{i}" for i in range(3, 10)]
+    assert [key async for key in cache.scan("session")] == ["session:0b", "sessions"]
+    await cache.close()
+    print("✅ 前缀遍历测试通过")
@@ -0,0 +1,120 @@
+"""
+缓存适配器一致性测试 - Memory、SQLite 与 Redis 适配器必须行为一致
+
+Redis 用例默认连接 localhost:6379，可通过 REDIS_HOST / REDIS_PORT 指定，无法连接时跳过
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.runtime import runtime
+from core.storage.cache import Memory, Redis, SQLite
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+async def cache(request, tmp_path):
+    """按参数创建缓存适配器"""
+    if request.param == "memory":
+        adapter = Memory()
+    elif request.param == "sqlite":
+        adapter = SQLite(str(tmp_path / "cache.db"))
+    else:
+        try:
+            adapter = await Redis.create(
+                host=os.environ.get("REDIS_HOST", "localhost"),
+                port=int(os.environ.get("REDIS_PORT", "6379")),
+                socket_connect_timeout=0.5,
+            )
+        except Exception as e:
+            pytest.skip(f"Redis not available: {e}")
+    yield adapter
+    await adapter.close()
+    await runtime.close_all()
+
+
+@pytest.fixture
+def key():
+    """每个用例使用独立的键"""
+    return f"conformance:{uuid4().hex}"
+
+
+async def test_increase_creates_missing_key(cache, key):
+    """递增/递减不存在的键从 0 开始"""
+    assert await cache.increase(key) == 1
+    assert await cache.decrease(key) == 0
+    assert await cache.decrease(f"{key}:neg") == -1
+    await cache.delete_many([key, f"{key}:neg"])
+
+
+async def test_incr_by(cache, key):
+    """按步长递增，ttl_if_new 只在新建时生效"""
+    assert await cache.incr_by(key, 5, ttl_if_new=1) == 5
+    assert await cache.incr_by(key, -2, ttl_if_new=100) == 3
+    await asyncio.sleep(1.2)
+    assert await cache.get(key) is None, "新建时设置的过期时间应生效"
+    
+    assert await cache.incr_by(key, 10) == 10
+    await cache.delete(key)
+
+
+async def test_incr_by_non_integer(cache, key):
+    """非整数值递增抛出 ValueError"""
+    await cache.set(key, "abc")
+    with pytest.raises(ValueError):
+        await cache.incr_by(key, 1)
+    await cache.delete(key)
+
+
+async def test_set_if_absent(cache, key):
+    """键不存在时才设置"""
+    assert await cache.set_if_absent(key, "first", expire=60) is True
+    assert await cache.set_if_absent(key, "second") is False
+    assert await cache.get(key) == "first"
+    await cache.delete(key)
+
+
+async def test_compare_and_set(cache, key):
+    """比较并设置"""
+    assert await cache.compare_and_set(key, "x", "y") is False
+    assert await cache.compare_and_set(key, None, "v1") is True
+    assert await cache.compare_and_set(key, None, "v2") is False
+    assert await cache.compare_and_set(key, "v0", "v2") is False
+    assert await cache.compare_and_set(key, "v1", "v2", expire=60) is True
+    assert await cache.get(key) == "v2"
+    await cache.delete(key)
+
+
+async def test_get_and_delete(cache, key):
+    """原子读取并删除"""
+    await cache.set(key, "once")
+    assert await cache.get_and_delete(key) == "once"
+    assert await cache.get_and_delete(key) is None
+    assert not await cache.exists(key)
+
+
+async def test_concurrent_incr_by(cache, key):
+    """并发递增不丢失更新"""
+    await asyncio.gather(*(cache.incr_by(key, 2) for _ in range(50)))
+    assert await cache.get(key) == "100"
+    await cache.delete(key)
+
+
+async def test_scan_prefix(cache, key):
+    """按前缀分批遍历，前缀中的 glob 字符按字面匹配"""
+    keys = {f"{key}:*:{i}" for i in range(25)}
+    await cache.set_many({k: "1" for k in keys})
+    await cache.set(f"{key}:other", "1")
+    
+    found = {k async for k in cache.scan(f"{key}:*:", batch=7)}
+    assert found == keys
+    
+    assert await cache.delete_prefix(f"{key}:*:", batch=10) == 25
+    assert [k async for k in cache.scan(f"{key}:")] == [f"{key}:other"]
+    await cache.delete(f"{key}:other")
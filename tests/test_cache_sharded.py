@@ -0,0 +1,73 @@
+"""
+分片缓存单元测试（一致性哈希）
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.storage.cache import HashRing, Sharded, Memory
+
+
+def test_hash_ring_distribution():
+    """测试键在节点间的分布"""
+    print("🧪 测试哈希环分布...")
+    ring = HashRing(["node-a:6379", "node-b:6379", "node-c:6379"])
+    counts = {}
+    for i in range(3000):
+        node = ring.get_node(f"key:{i}")
+        counts[node] = counts.get(node, 0) + 1
+    
+    assert len(counts) == 3, "所有节点都应分配到键"
+    for node, count in counts.items():
+        assert 600 < count < 1400, f"节点 {node} 分布不均: {count}"
+    print(f"✅ 分布: {counts}")
+
+
+def test_hash_ring_add_node_moves_fraction():
+    """测试新增节点只迁移约 1/N 的键"""
+    print("🧪 测试新增节点迁移比例...")
+    ring = HashRing(["node-a:6379", "node-b:6379", "node-c:6379"])
+    keys = [f"key:{i}" for i in range(4000)]
+    before = {key: ring.get_node(key) for key in keys}
+    
+    ring.add_node("node-d:6379")
+    moved = [key for key in keys if ring.get_node(key) != before[key]]
+    
+    assert all(ring.get_node(key) == "node-d:6379" for key in moved), "迁移的键只能落到新节点"
+    ratio = len(moved) / len(keys)
+    assert 0.15 < ratio < 0.35, f"迁移比例异常: {ratio:.2f}"
+    print(f"✅ 迁移比例: {ratio:.2%}")
+
+
+def test_hash_tag():
+    """测试哈希标签保持相关键在同一分片"""
+    print("🧪 测试哈希标签...")
+    ring = HashRing(["node-a:6379", "node-b:6379", "node-c:6379"])
+    
+    assert HashRing.hash_tag("{user:1}:profile") == "user:1"
+    assert HashRing.hash_tag("{}:profile") == "{}:profile"
+    assert HashRing.hash_tag("plain") == "plain"
+    assert ring.get_node("{user:1}:profile") == ring.get_node("{user:1}:roles")
+    print("✅ 哈希标签测试通过")
+
+
+async def test_sharded_batch_fan_out():
+    """测试批量操作按分片扇出"""
+    print("🧪 测试批量操作...")
+    shards = {"node-a:6379": Memory(), "node-b:6379": Memory()}
+    cache = Sharded(shards)
+    mapping = {f"key:{i}": i for i in range(50)}
+    
+    await cache.set_many(mapping)
+    values = await cache.get_many(list(mapping.keys()) + ["missing"])
+    
+    assert values["missing"] is None
+    assert all(values[key] == str(val) for key, val in mapping.items())
+    assert all(len(shard._items) > 0 for shard in shards.values()), "键应分布到所有分片"
+    
+    await cache.delete_many(list(mapping.keys()))
+    assert not await cache.exists("key:1")
+    await cache.close()
+    print("✅ 批量操作测试通过")
@@ -0,0 +1,68 @@
+"""
+内存缓存快照与热启动测试
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.storage.cache import Memory
+
+
+async def test_snapshot_restore(tmp_path):
+    """测试关闭时保存快照，启动时懒加载恢复"""
+    print("🧪 测试快照保存与恢复...")
+    snapshot_file = str(tmp_path / "cache.snapshot")
+    
+    cache = Memory(snapshot_file=snapshot_file)
+    await cache.set("user:1", "alice")
+    await cache.set("counter", 41)
+    await cache.set("session:tmp", "x", expire=1)
+    await cache.close()
+    
+    await asyncio.sleep(1.1)
+    
+    restored = Memory(snapshot_file=snapshot_file)
+    assert restored.load_snapshot() == 2, "过期项应在恢复时丢弃"
+    assert restored._items == {}, "值应按需解码"
+    
+    assert await restored.get("user:1") == "alice"
+    assert await restored.increase("counter") == 42
+    assert await restored.get("session:tmp") is None
+    assert restored._mmap is None, "全部取出后应释放映射"
+    await restored.close()
+    print("✅ 快照恢复测试通过")
+
+
+async def test_snapshot_overrides_lazy_entries(tmp_path):
+    """测试写入/删除覆盖快照中的懒加载项"""
+    print("🧪 测试覆盖懒加载项...")
+    snapshot_file = str(tmp_path / "cache.snapshot")
+    
+    cache = Memory(snapshot_file=snapshot_file)
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    await cache.close()
+    
+    restored = Memory(snapshot_file=snapshot_file)
+    restored.load_snapshot()
+    await restored.set("a", "changed")
+    await restored.delete("b")
+    assert await restored.get("a") == "changed"
+    assert not await restored.exists("b")
+    
+    assert await restored.save_snapshot() == 1
+    await restored.close()
+    print("✅ 覆盖懒加载项测试通过")
+
+
+async def test_snapshot_ignores_corrupt_file(tmp_path):
+    """测试损坏的快照文件被忽略"""
+    snapshot_file = tmp_path / "cache.snapshot"
+    snapshot_file.write_bytes(b"not a snapshot")
+    
+    cache = Memory(snapshot_file=str(snapshot_file))
+    assert cache.load_snapshot() == 0
+    assert await cache.get("anything") is None
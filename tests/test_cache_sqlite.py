@@ -0,0 +1,80 @@
+"""
+SQLite 缓存适配器测试 - 多进程共享、过期清理、跨进程锁
+"""
+import asyncio
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.storage.cache import SQLite, LockNotAcquired
+
+
+def _worker_incr(path: str, n: int) -> None:
+    """子进程：对同一计数器递增 n 次"""
+    async def run():
+        cache = SQLite(path)
+        for _ in range(n):
+            await cache.increase("shared:counter")
+        await cache.close()
+    
+    asyncio.run(run())
+
+
+async def test_shared_across_processes(tmp_path):
+    """测试多个进程共享同一缓存文件，递增不丢失"""
+    print("🧪 测试多进程共享...")
+    path = str(tmp_path / "cache.db")
+    cache = SQLite(path)
+    
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_worker_incr, args=(path, 50)) for _ in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        await asyncio.to_thread(proc.join, 60)
+        assert proc.exitcode == 0
+    
+    assert await cache.get("shared:counter") == "200"
+    await cache.close()
+    print("✅ 多进程共享测试通过")
+
+
+async def test_purge_expired(tmp_path):
+    """测试过期键分批清理"""
+    print("🧪 测试过期清理...")
+    cache = SQLite(str(tmp_path / "cache.db"), purge_batch=10)
+    await cache.set_many({f"tmp:{i}": i for i in range(25)}, expire=1)
+    await cache.set("keep", "1")
+    await cache._write(lambda conn: conn.execute("UPDATE cache SET expires = ? WHERE key LIKE 'tmp:%'", (time.time() - 1,)))
+    
+    assert await cache.get("tmp:0") is None, "过期键读取时不可见"
+    assert await cache.purge_expired() == 25
+    rows = await cache._read(lambda conn: conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0])
+    assert rows == 1
+    await cache.close()
+    print("✅ 过期清理测试通过")
+
+
+async def test_lock_across_instances(tmp_path):
+    """测试同一文件上的两个实例互斥"""
+    print("🧪 测试跨实例锁...")
+    path = str(tmp_path / "cache.db")
+    first, second = SQLite(path), SQLite(path)
+    
+    lock = await first.acquire_lock("job", ttl=5)
+    try:
+        await second.acquire_lock("job", wait=0.05)
+        assert False, "应抛出 LockNotAcquired"
+    except LockNotAcquired:
+        pass
+    await first.release_lock(lock)
+    
+    async with second.lock("job", wait=1) as again:
+        assert again.token == lock.token + 1
+    await first.close()
+    await second.close()
+    print("✅ 跨实例锁测试通过")
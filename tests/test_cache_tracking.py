@@ -0,0 +1,170 @@
+"""
+Redis 客户端缓存（CLIENT TRACKING）测试
+使用本地 Redis 协议替身服务，无需真实 Redis
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.runtime import runtime
+from core.storage.cache import Redis
+from core.storage.cache.redis import INVALIDATE_CHANNEL
+
+
+def _encode(value) -> bytes:
+    """RESP2 编码"""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(v) for v in value)
+    data = str(value).encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+class FakeRedisServer:
+    """最小化 Redis 协议替身：支持 GET/SET/DEL、CLIENT ID/TRACKING REDIRECT OPTIN/CACHING、SUBSCRIBE"""
+    
+    def __init__(self):
+        self.data = {}
+        self.get_count = 0
+        self._writers = {}
+        self._next_id = 0
+        # {redirect_client_id: 已被跟踪的键集合}
+        self._tracked = {}
+        self._redirect = {}
+        # OPTIN 模式的连接与其下一条命令是否被跟踪
+        self._optin = set()
+        self._caching = set()
+        self._server = None
+        self.port = 0
+    
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+    
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        count = int(line[1:].strip())
+        args = []
+        for _ in range(count):
+            size = int((await reader.readline())[1:].strip())
+            args.append((await reader.readexactly(size + 2))[:-2].decode())
+        return args
+    
+    def _invalidate(self, key: str) -> None:
+        for redirect_id, keys in self._tracked.items():
+            if key in keys:
+                keys.discard(key)
+                writer = self._writers.get(redirect_id)
+                if writer:
+                    writer.write(_encode(["message", INVALIDATE_CHANNEL, [key]]))
+    
+    async def _handle(self, reader, writer):
+        self._next_id += 1
+        client_id = self._next_id
+        self._writers[client_id] = writer
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                cmd = args[0].upper()
+                caching = client_id in self._caching
+                self._caching.discard(client_id)
+                if cmd == "PING":
+                    writer.write(b"+PONG\r\n")
+                elif cmd == "CLIENT" and args[1].upper() == "ID":
+                    writer.write(_encode(client_id))
+                elif cmd == "CLIENT" and args[1].upper() == "TRACKING":
+                    self._redirect[client_id] = int(args[4])
+                    self._tracked.setdefault(int(args[4]), set())
+                    if "OPTIN" in (a.upper() for a in args[5:]):
+                        self._optin.add(client_id)
+                    writer.write(b"+OK\r\n")
+                elif cmd == "CLIENT" and args[1].upper() == "CACHING":
+                    self._caching.add(client_id)
+                    writer.write(b"+OK\r\n")
+                elif cmd == "SUBSCRIBE":
+                    writer.write(_encode(["subscribe", args[1], 1]))
+                elif cmd == "GET":
+                    self.get_count += 1
+                    redirect_id = self._redirect.get(client_id)
+                    if redirect_id is not None and (client_id not in self._optin or caching):
+                        self._tracked[redirect_id].add(args[1])
+                    writer.write(_encode(self.data.get(args[1])))
+                elif cmd == "SET":
+                    self.data[args[1]] = args[2]
+                    self._invalidate(args[1])
+                    writer.write(b"+OK\r\n")
+                elif cmd == "DEL":
+                    removed = sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+                    for key in args[1:]:
+                        self._invalidate(key)
+                    writer.write(_encode(removed))
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.pop(client_id, None)
+            writer.close()
+
+
+async def test_tracking_serves_repeats_locally_and_invalidates():
+    """测试重复读取走本地缓存，其他客户端写入后失效"""
+    print("🧪 测试客户端缓存...")
+    server = FakeRedisServer()
+    await server.start()
+    
+    cache = await Redis.create(host="127.0.0.1", port=server.port, tracking=True, tracking_max_keys=2)
+    other = await Redis.create(host="127.0.0.1", port=server.port)
+    try:
+        await other.set("user:1", "alice")
+        assert await cache.get("user:1") == "alice"
+        assert await cache.get("user:1") == "alice"
+        assert server.get_count == 1, "重复读取应命中本地缓存"
+        
+        # 其他客户端写入，等待失效通知
+        await other.set("user:1", "bob")
+        for _ in range(50):
+            if "user:1" not in cache._local:
+                break
+            await asyncio.sleep(0.01)
+        assert await cache.get("user:1") == "bob"
+        assert server.get_count == 2
+        
+        # 本地缓存容量受限
+        await other.set("user:2", "x")
+        await other.set("user:3", "y")
+        await cache.get("user:2")
+        await cache.get("user:3")
+        assert len(cache._local) == 2
+        assert "user:1" not in cache._local
+        
+        # 跟踪连接单独建池，普通连接池仍与其他适配器共享
+        assert cache.client is other.client
+        assert len(runtime._redis_pools) == 1
+        # OPTIN：共享连接池上的读取（如限流脚本）不注册跟踪
+        await other.set("rate:1", "1")
+        assert await cache.client.get("rate:1") == "1"
+        tracked = set().union(*server._tracked.values())
+        assert "rate:1" not in tracked
+        assert tracked <= {"user:1", "user:2", "user:3"}, "只跟踪经本地缓存读取的键"
+        print("✅ 客户端缓存测试通过")
+    finally:
+        await cache.close()
+        await other.close()
+        await runtime.close_all()
+        await server.stop()
@@ -0,0 +1,225 @@
+"""
+响应压缩测试（无需启动服务）
+"""
+import asyncio
+import gzip
+import sys
+import zlib
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from core.config import CompressionConfig, CompressionTypeConfig
+from common.middleware import compression, cors, register_middlewares
+from common.middleware.compression import Compressor, available_encodings, parse_accept_encoding
+
+
+ROWS = [{"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(200)]
+
+
+def _create_app(fused: bool = True) -> FastAPI:
+    app = FastAPI()
+    register_middlewares(app, fused=fused, routes=[])
+    
+    @app.get("/users")
+    async def users():
+        return {"code": 200, "data": ROWS}
+    
+    @app.get("/small")
+    async def small():
+        return {"code": 200}
+    
+    @app.get("/export")
+    async def export():
+        async def rows():
+            for row in ROWS:
+                yield f"{row['id']},{row['username']},{row['email']}\n".encode()
+                await asyncio.sleep(0)
+        return StreamingResponse(rows(), media_type="text/csv")
+    
+    @app.get("/binary")
+    async def binary():
+        return Response(b"\x00" * 4096, media_type="application/octet-stream")
+    
+    @app.get("/tagged")
+    async def tagged():
+        return PlainTextResponse("x" * 4096, headers={"ETag": '"v1"'})
+    
+    return app
+
+
+def _init(**kwargs) -> Compressor:
+    config = CompressionConfig(**kwargs)
+    return compression.init_compression(
+        minimum_size=config.minimum_size,
+        encodings=config.encodings,
+        gzip_level=config.gzip_level,
+        brotli_level=config.brotli_level,
+        zstd_level=config.zstd_level,
+        types=config.types,
+        offload_size=config.offload_size,
+    )
+
+
+def test_negotiate():
+    """测试 Accept-Encoding 协商"""
+    print("🧪 测试编码协商...")
+    assert parse_accept_encoding("gzip;q=0.5, br , *;q=0") == {"gzip": 0.5, "br": 1.0, "*": 0.0}
+    
+    compressor = Compressor(encodings=["zstd", "br", "gzip"])
+    assert compressor.negotiate(b"gzip") == "gzip"
+    assert compressor.negotiate(b"identity") is None
+    assert compressor.negotiate(b"gzip;q=0") is None
+    assert compressor.negotiate(b"*") == compressor.encodings[0], "通配符按服务端顺序"
+    assert compressor.negotiate(b"gzip, deflate, br, zstd") == compressor.encodings[0]
+    if "br" in available_encodings():
+        assert compressor.negotiate(b"gzip;q=1.0, br;q=0.8") == "gzip", "q 值优先于服务端顺序"
+        assert compressor.negotiate(b"br;q=0.8, gzip;q=0.8") == "br"
+    assert b"gzip" in compressor._negotiated, "协商结果已缓存"
+    
+    # 内容类型规则
+    types = [
+        CompressionTypeConfig(content_type="text/csv", minimum_size=0),
+        CompressionTypeConfig(content_type="text/*"),
+        CompressionTypeConfig(content_type="application/vnd.ms-*", enabled=False),
+    ]
+    compressor = Compressor(minimum_size=512, types=types)
+    assert compressor.minimum_for(b"text/csv; charset=utf-8") == 0
+    assert compressor.minimum_for(b"text/html") == 512
+    assert compressor.minimum_for(b"application/vnd.ms-excel") is None
+    assert compressor.minimum_for(b"image/png") is None
+    assert Compressor(levels={"gzip": 99}).levels["gzip"] == 9, "压缩级别限制在有效范围内"
+    print("✅ 编码协商测试通过")
+
+
+async def test_compression_middleware():
+    """测试完整响应压缩、阈值与跳过规则"""
+    print("🧪 测试响应压缩...")
+    _init(minimum_size=1024)
+    # 按来源配置 CORS 时响应带 Vary: Origin
+    cors.init_cors(allow_origins=["https://app.example.com"])
+    try:
+        for fused in (False, True):
+            transport = httpx.ASGITransport(app=_create_app(fused))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/users", headers={"Accept-Encoding": "gzip"})
+                assert response.headers["Content-Encoding"] == "gzip"
+                assert response.headers["Vary"] == "Origin, Accept-Encoding", "保留 CORS 的 Vary: Origin"
+                assert int(response.headers["Content-Length"]) < len(response.content) // 4
+                assert response.json()["data"] == ROWS
+                
+                small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+                assert "Content-Encoding" not in small.headers, "小于阈值不压缩"
+                assert small.headers["Vary"] == "Origin, Accept-Encoding"
+                
+                binary = await client.get("/binary", headers={"Accept-Encoding": "gzip"})
+                assert "Content-Encoding" not in binary.headers, "未配置的内容类型不压缩"
+                
+                plain = await client.get("/users", headers={"Accept-Encoding": "identity"})
+                assert "Content-Encoding" not in plain.headers
+                
+                tagged = await client.get("/tagged", headers={"Accept-Encoding": "gzip"})
+                assert tagged.headers["ETag"] == 'W/"v1"', "压缩后强 ETag 降级为弱 ETag"
+                
+                head = await client.head("/users", headers={"Accept-Encoding": "gzip"})
+                assert "Content-Encoding" not in head.headers
+    finally:
+        compression.close_compression()
+        cors.init_cors()
+    print("✅ 响应压缩测试通过")
+
+
+async def test_streaming_compression():
+    """测试流式响应逐块压缩"""
+    print("🧪 测试流式响应压缩...")
+    compressor = _init(minimum_size=1024, types=[CompressionTypeConfig(content_type="text/csv", minimum_size=0)])
+    try:
+        sent = []
+        
+        async def send(message):
+            sent.append(message)
+        
+        responder = compression.CompressionResponder(compressor, "gzip", send)
+        await responder({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/csv")]})
+        await responder({"type": "http.response.body", "body": b"id,name\n", "more_body": True})
+        # 第一块发出后即可解压，不等待整个响应体
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert decompressor.decompress(sent[1]["body"]) == b"id,name\n"
+        await responder({"type": "http.response.body", "body": b"1,a\n", "more_body": True})
+        await responder({"type": "http.response.body", "body": b"", "more_body": False})
+        assert dict(sent[0]["headers"])[b"content-encoding"] == b"gzip"
+        assert b"content-length" not in dict(sent[0]["headers"])
+        assert gzip.decompress(b"".join(m["body"] for m in sent[1:])) == b"id,name\n1,a\n"
+        
+        transport = httpx.ASGITransport(app=_create_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/export", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.text.count("\n") == len(ROWS)
+    finally:
+        compression.close_compression()
+    print("✅ 流式响应压缩测试通过")
+
+
+async def test_offload_compression():
+    """测试达到 offload_size 的响应体在线程池中压缩"""
+    print("🧪 测试大响应体线程池压缩...")
+    compressor = _init(minimum_size=0, offload_size=4096)
+    offloaded = []
+    to_thread = asyncio.to_thread
+    
+    async def counting_to_thread(func, *args):
+        offloaded.append(len(args[0]))
+        return await to_thread(func, *args)
+    
+    compression.asyncio.to_thread = counting_to_thread
+    try:
+        for body in (b"x" * 100, b"y" * 8192):
+            sent = []
+            
+            async def send(message):
+                sent.append(message)
+            
+            responder = compression.CompressionResponder(compressor, "gzip", send)
+            await responder({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+            await responder({"type": "http.response.body", "body": body})
+            assert gzip.decompress(sent[1]["body"]) == body
+            assert dict(sent[0]["headers"])[b"content-length"] == str(len(sent[1]["body"])).encode()
+        assert offloaded == [8192], "只有大响应体在线程池中压缩"
+    finally:
+        compression.asyncio.to_thread = to_thread
+        compression.close_compression()
+    print("✅ 大响应体线程池压缩测试通过")
+
+
+async def test_optional_encodings():
+    """测试 br / zstd 流式压缩（未安装对应库时跳过）"""
+    for encoding in ("br", "zstd"):
+        if encoding not in available_encodings():
+            print(f"⚠️  未安装 {encoding} 依赖，跳过")
+            continue
+        print(f"🧪 测试 {encoding} 压缩...")
+        compressor = Compressor(encodings=[encoding], types=[CompressionTypeConfig(content_type="text/*")])
+        sent = []
+        
+        async def send(message):
+            sent.append(message)
+        
+        responder = compression.CompressionResponder(compressor, encoding, send)
+        await responder({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        for i in range(3):
+            await responder({"type": "http.response.body", "body": b"chunk%d\n" % i * 100, "more_body": True})
+        await responder({"type": "http.response.body", "body": b"", "more_body": False})
+        body = b"".join(m["body"] for m in sent[1:])
+        if encoding == "br":
+            import brotli
+            data = brotli.decompress(body)
+        else:
+            import zstandard
+            data = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+        assert data == b"".join(b"chunk%d\n" % i * 100 for i in range(3))
+        print(f"✅ {encoding} 压缩测试通过")
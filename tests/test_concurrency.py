@@ -0,0 +1,123 @@
+"""
+并发限制与过载保护单元测试（无需启动服务）
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from starlette.responses import PlainTextResponse
+from core.config import ConcurrencyClassConfig
+from common.middleware import concurrency
+from common.middleware.concurrency import ConcurrencyLimiter, ConcurrencyMiddleware
+
+
+def _scope(method: str, path: str) -> dict:
+    """构造只包含方法和路径的 ASGI scope"""
+    return {"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}
+
+
+async def test_concurrency_limiter():
+    """测试并发上限：超出上限的请求排队，等待超时被拒绝"""
+    print("🧪 测试并发限制器...")
+    limiter = ConcurrencyLimiter(limit=2, queue_timeout=0.05)
+    assert await limiter.acquire() == 0.0
+    assert await limiter.acquire() == 0.0
+    assert limiter.in_flight == 2
+    
+    assert await limiter.acquire() is None, "槽位已满且等待超时"
+    assert limiter.waiting == 0
+    
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert limiter.waiting == 1
+    limiter.release()
+    waited = await waiter
+    assert waited is not None and waited > 0, "释放后排队请求获得槽位"
+    assert limiter.in_flight == 2
+    
+    # 超时与取消都不会丢失槽位
+    cancelled = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0.01)
+    cancelled.cancel()
+    try:
+        await cancelled
+    except asyncio.CancelledError:
+        pass
+    results = await asyncio.gather(*(limiter.acquire() for _ in range(5)))
+    assert results == [None] * 5
+    limiter.release()
+    limiter.release()
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+    assert [await limiter.acquire() for _ in range(2)] == [0.0, 0.0], "槽位全部归还"
+    assert await limiter.acquire() is None
+    print("✅ 并发限制器测试通过")
+
+
+async def test_load_shedding_by_priority():
+    """测试过载保护：延迟超过阈值丢弃 low，超过两倍阈值丢弃 normal，high 不丢弃"""
+    print("🧪 测试过载保护...")
+    shedder = concurrency.init_load_shedder(limit=10, lag_threshold=0.1, classes=[
+        ConcurrencyClassConfig(name="health", path="/health", limit=0, priority="high"),
+        ConcurrencyClassConfig(name="export", path="/api/v1/*/export", limit=1, priority="low"),
+    ])
+    try:
+        health = shedder.resolve("GET", "/health")
+        export = shedder.resolve("GET", "/api/v1/users/export")
+        default = shedder.resolve("GET", "/api/v1/users")
+        assert (health.name, export.name, default.name) == ("health", "export", "default")
+        assert not any(shedder.should_shed(c) for c in (health, export, default))
+        
+        shedder.monitor.lag = 0.15
+        assert [shedder.should_shed(c) for c in (health, export, default)] == [False, True, False]
+        shedder.monitor.lag = 0.3
+        assert [shedder.should_shed(c) for c in (health, export, default)] == [False, True, True]
+        
+        shedder.monitor.lag = 0.0
+        shedder.record_queue_time(1.0)
+        assert shedder.should_shed(export), "排队时间同样计入过载程度"
+        await asyncio.sleep(shedder.monitor.interval * 10)
+        assert not shedder.should_shed(export), "没有新样本时排队时间逐渐衰减"
+    finally:
+        concurrency.close_load_shedder()
+    print("✅ 过载保护测试通过")
+
+
+async def test_concurrency_middleware():
+    """测试中间件：超出分类并发上限返回 503 + Retry-After"""
+    print("🧪 测试并发限制中间件...")
+    concurrency.init_load_shedder(limit=10, queue_timeout=0.05, retry_after=3, classes=[
+        ConcurrencyClassConfig(name="export", path="/api/v1/*/export", limit=1, priority="low"),
+    ])
+    release = asyncio.Event()
+    
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await PlainTextResponse("ok")(scope, receive, send)
+    
+    middleware = ConcurrencyMiddleware(slow_app)
+    
+    async def call() -> list:
+        messages = []
+        
+        async def send(message):
+            messages.append(message)
+        
+        await middleware(_scope("GET", "/api/v1/users/export"), None, send)
+        return messages
+    
+    try:
+        first = asyncio.ensure_future(call())
+        await asyncio.sleep(0.01)
+        rejected = (await call())[0]
+        assert rejected["status"] == 503
+        assert (b"retry-after", b"3") in rejected["headers"]
+        
+        release.set()
+        assert (await first)[0]["status"] == 200
+        assert (await call())[0]["status"] == 200
+    finally:
+        concurrency.close_load_shedder()
+    print("✅ 并发限制中间件测试通过")
@@ -0,0 +1,128 @@
+"""
+条件请求测试（无需启动服务）
+"""
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import Depends, FastAPI
+from common.middleware import register_middlewares
+from common.middleware.conditional import Conditional, etag_matches, http_date, make_etag
+
+
+# 模拟数据版本与数据加载次数
+STATE = {"updated_at": datetime(2024, 1, 1, 12, 0, 0, 500000), "total": 3, "loads": 0}
+
+
+def _create_app(fused: bool = True) -> FastAPI:
+    app = FastAPI()
+    register_middlewares(app, fused=fused, routes=[])
+    
+    @app.get("/users")
+    async def users(conditional: Conditional = Depends()):
+        # 集合路由只用 ETag：物理删除不会改变 max(updated_at)
+        not_modified = conditional.check(STATE["updated_at"], STATE["total"])
+        if not_modified:
+            return not_modified
+        STATE["loads"] += 1
+        return {"code": 200, "data": list(range(STATE["total"]))}
+    
+    @app.get("/users/1")
+    async def user(conditional: Conditional = Depends()):
+        not_modified = conditional.check(STATE["updated_at"], last_modified=STATE["updated_at"])
+        if not_modified:
+            return not_modified
+        STATE["loads"] += 1
+        return {"code": 200, "data": 1}
+    
+    @app.get("/plain")
+    async def plain():
+        return {"code": 200}
+    
+    return app
+
+
+def test_make_etag():
+    """测试 ETag 生成与比较"""
+    print("🧪 测试 ETag 生成...")
+    updated_at = datetime(2024, 1, 1)
+    etag = make_etag("/users", updated_at, 3)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("/users", updated_at, 3), "相同版本生成相同 ETag"
+    assert etag != make_etag("/users", updated_at, 4)
+    assert etag != make_etag("/users", updated_at + timedelta(microseconds=1), 3)
+    assert make_etag("ab", "c") != make_etag("a", "bc"), "各部分带长度前缀，拼接不冲突"
+    
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag), "弱比较：压缩后的弱 ETag 同样命中"
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert http_date(datetime(2024, 1, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)) == "Mon, 01 Jan 2024 12:00:00 GMT"
+    print("✅ ETag 生成测试通过")
+
+
+async def test_conditional_get():
+    """测试 If-None-Match / If-Modified-Since 返回 304 且跳过数据加载"""
+    print("🧪 测试条件请求...")
+    for fused in (False, True):
+        STATE.update(updated_at=datetime(2024, 1, 1, 12, 0, 0, 500000), total=3, loads=0)
+        transport = httpx.ASGITransport(app=_create_app(fused))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/users")
+            assert response.status_code == 200
+            etag = response.headers["ETag"]
+            assert response.headers["Cache-Control"] == "private, no-cache", "启用校验器的路由不再 no-store"
+            assert "Expires" not in response.headers
+            assert "Last-Modified" not in response.headers, "集合路由不返回 Last-Modified"
+            assert STATE["loads"] == 1
+            
+            cached = await client.get("/users", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.content == b""
+            assert cached.headers["ETag"] == etag
+            assert cached.headers["X-Request-Id"]
+            assert STATE["loads"] == 1, "命中时不加载数据"
+            
+            weak = await client.get("/users", headers={"If-None-Match": f"W/{etag}"})
+            assert weak.status_code == 304
+            
+            item = await client.get("/users/1")
+            last_modified = item.headers["Last-Modified"]
+            assert last_modified == http_date(STATE["updated_at"])
+            since = await client.get("/users/1", headers={"If-Modified-Since": last_modified})
+            assert since.status_code == 304, "Last-Modified 按秒比较"
+            
+            # If-None-Match 优先于 If-Modified-Since
+            mismatch = await client.get("/users/1", headers={"If-None-Match": '"stale"', "If-Modified-Since": last_modified})
+            assert mismatch.status_code == 200
+            
+            # 删除记录：max(updated_at) 不变，记录数变化后 ETag 失效
+            STATE["total"] -= 1
+            deleted = await client.get("/users", headers={"If-None-Match": etag, "If-Modified-Since": last_modified})
+            assert deleted.status_code == 200, "删除后不返回过期的 304"
+            assert (await client.get("/users", headers={"If-Modified-Since": last_modified})).status_code == 200
+            STATE["total"] += 1
+            
+            other_query = await client.get("/users?page=2", headers={"If-None-Match": etag})
+            assert other_query.status_code == 200, "查询参数参与 ETag"
+            assert other_query.headers["ETag"] != etag
+            
+            # 数据变化后 ETag 失效
+            STATE["updated_at"] += timedelta(seconds=5)
+            changed = await client.get("/users", headers={"If-None-Match": etag})
+            assert changed.status_code == 200
+            assert changed.headers["ETag"] != etag
+            STATE["total"] += 1
+            assert (await client.get("/users", headers={"If-None-Match": changed.headers["ETag"]})).status_code == 200
+            
+            invalid = await client.get("/users/1", headers={"If-Modified-Since": "not a date"})
+            assert invalid.status_code == 200
+            
+            plain = await client.get("/plain")
+            assert plain.headers["Cache-Control"].startswith("no-cache"), "未启用的路由仍禁用缓存"
+            assert "ETag" not in plain.headers
+    print("✅ 条件请求测试通过")
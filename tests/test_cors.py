@@ -0,0 +1,124 @@
+"""
+CORS 测试（无需启动服务）
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from core.config import CORSConfig
+from common.middleware import cors, register_middlewares
+from common.middleware.cors import CORSPolicy
+
+
+ORIGIN = "https://app.example.com"
+
+
+def _create_app(fused: bool = True) -> FastAPI:
+    app = FastAPI()
+    register_middlewares(app, fused=fused, routes=[])
+    
+    @app.get("/users")
+    async def users():
+        return {"code": 200}
+    
+    return app
+
+
+def test_cors_policy():
+    """测试来源匹配与按来源缓存的响应头"""
+    print("🧪 测试 CORS 策略...")
+    policy = CORSPolicy(
+        allow_origins=[ORIGIN, "https://*.example.org"],
+        allow_credentials=True,
+        allow_methods=["get", "post"],
+        allow_headers=["Authorization", "Content-Type"],
+        max_age=1200,
+    )
+    assert policy.is_allowed(ORIGIN)
+    assert policy.is_allowed("https://admin.example.org")
+    assert not policy.is_allowed("https://example.org.evil.com")
+    assert not policy.is_allowed("http://app.example.com")
+    
+    headers = dict(policy.preflight_headers(ORIGIN.encode(), b"x-custom"))
+    assert headers[b"access-control-allow-origin"] == ORIGIN.encode()
+    assert headers[b"access-control-allow-credentials"] == b"true"
+    assert headers[b"access-control-allow-methods"] == b"GET,POST"
+    assert headers[b"access-control-allow-headers"] == b"authorization, content-type", "未配置 * 时不回显请求头"
+    assert headers[b"access-control-max-age"] == b"1200"
+    assert policy.preflight_headers(ORIGIN.encode(), b"x-other") is policy.preflight_headers(ORIGIN.encode()), "按来源缓存"
+    
+    denied = dict(policy.preflight_headers(b"https://evil.com"))
+    assert b"access-control-allow-origin" not in denied
+    assert denied[b"allow"] == b"HEAD,GET,POST,PUT,PATCH,DELETE,OPTIONS"
+    assert dict(policy.response_headers(b"https://evil.com")) == {b"vary": b"Origin"}
+    assert dict(policy.response_headers(None)) == {b"vary": b"Origin"}
+    
+    # 默认配置：允许所有来源时返回字面量 *，不携带凭证，请求头按预检请求回显
+    config = CORSConfig()
+    policy = CORSPolicy(config.allow_origins, config.allow_credentials, config.allow_methods, config.allow_headers, max_age=config.max_age)
+    headers = dict(policy.preflight_headers(b"https://any.com", b"authorization, x-token"))
+    assert headers[b"access-control-allow-origin"] == b"*"
+    assert b"access-control-allow-credentials" not in headers
+    assert headers[b"access-control-allow-headers"] == b"authorization, x-token"
+    assert headers[b"access-control-max-age"] == b"600"
+    
+    # * 与携带凭证同时配置时不回显任意来源，只对明确配置的来源携带凭证
+    mixed = CORSPolicy(["*", ORIGIN], allow_credentials=True)
+    headers = dict(mixed.response_headers(b"https://evil.com"))
+    assert headers[b"access-control-allow-origin"] == b"*"
+    assert b"access-control-allow-credentials" not in headers
+    assert headers[b"vary"] == b"Origin"
+    headers = dict(mixed.response_headers(ORIGIN.encode()))
+    assert headers[b"access-control-allow-origin"] == ORIGIN.encode()
+    assert headers[b"access-control-allow-credentials"] == b"true"
+    wildcard = dict(CORSPolicy(allow_credentials=True).response_headers(b"https://evil.com"))
+    assert wildcard == {b"access-control-allow-origin": b"*"}, "只配置 * 时忽略 allow_credentials"
+    
+    public = CORSPolicy(allow_credentials=False, max_age=None)
+    headers = dict(public.preflight_headers(b"https://any.com"))
+    assert headers[b"access-control-allow-origin"] == b"*"
+    assert b"access-control-max-age" not in headers
+    assert public.response_headers(None) == (), "返回 * 时响应不随来源变化"
+    print("✅ CORS 策略测试通过")
+
+
+async def test_cors_middleware():
+    """测试预检响应与跨域响应头（逐层注册与融合模式）"""
+    print("🧪 测试 CORS 中间件...")
+    cors.init_cors(allow_origins=[ORIGIN], allow_credentials=True, expose_headers=["X-Request-Id"], max_age=1200)
+    try:
+        for fused in (False, True):
+            transport = httpx.ASGITransport(app=_create_app(fused))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                preflight = await client.options("/users", headers={
+                    "Origin": ORIGIN,
+                    "Access-Control-Request-Method": "POST",
+                    "Access-Control-Request-Headers": "authorization",
+                })
+                assert preflight.status_code == 200
+                assert preflight.json() == {}
+                assert preflight.headers["Access-Control-Allow-Origin"] == ORIGIN
+                assert preflight.headers["Access-Control-Max-Age"] == "1200"
+                assert preflight.headers["Access-Control-Allow-Headers"] == "authorization"
+                assert preflight.headers["X-Content-Type-Options"] == "nosniff"
+                
+                denied = await client.options("/users", headers={"Origin": "https://evil.com"})
+                assert denied.status_code == 200
+                assert "Access-Control-Allow-Origin" not in denied.headers
+                
+                response = await client.get("/users", headers={"Origin": ORIGIN})
+                assert response.headers["Access-Control-Allow-Origin"] == ORIGIN
+                assert response.headers["Access-Control-Allow-Credentials"] == "true"
+                assert response.headers["Access-Control-Expose-Headers"] == "X-Request-Id"
+                assert response.headers["Vary"] == "Origin"
+                
+                other = await client.get("/users", headers={"Origin": "https://evil.com"})
+                assert "Access-Control-Allow-Origin" not in other.headers
+                assert other.headers["Vary"] == "Origin"
+    finally:
+        cors.init_cors()
+    print("✅ CORS 中间件测试通过")
@@ -0,0 +1,229 @@
+"""
+中间件栈测试（无需启动服务，使用 httpx ASGITransport 进程内调用）
+"""
+import asyncio
+import sys
+import warnings
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from starlette.responses import StreamingResponse
+from core.config import MiddlewareRouteConfig
+import common.middleware as middleware
+from common.middleware import cors, rate_limit, register_middlewares
+
+
+# 逐层注册与单层融合两种模式行为一致
+MODES = (False, True)
+
+
+def _create_app(fused: bool = True, routes=()) -> FastAPI:
+    """注册完整中间件栈的最小应用"""
+    app = FastAPI()
+    register_middlewares(app, fused=fused, routes=list(routes))
+    
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+    
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+    
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"chunk{i}\n".encode()
+                await asyncio.sleep(0)
+        return StreamingResponse(chunks(), media_type="text/plain")
+    
+    return app
+
+
+async def test_middleware_headers():
+    """测试各层中间件添加的响应头"""
+    print("🧪 测试中间件响应头...")
+    for fused in MODES:
+        rate_limit.init_rate_limiter(requests=100, window=60)
+        try:
+            transport = httpx.ASGITransport(app=_create_app(fused))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/health")
+            assert response.status_code == 200
+            assert response.json() == {"status": "healthy"}
+            assert len(response.headers["X-Request-Id"]) == 36
+            assert response.headers["X-Content-Type-Options"] == "nosniff"
+            assert response.headers["Cache-Control"].startswith("no-cache")
+            assert response.headers["Last-Modified"]
+            assert response.headers["X-RateLimit-Limit"] == "100"
+            assert response.headers["RateLimit-Remaining"] == "99"
+        finally:
+            await rate_limit.close_rate_limiter()
+    print("✅ 中间件响应头测试通过")
+
+
+async def test_middleware_errors():
+    """测试统一错误格式：404、未处理异常、429、OPTIONS 预检"""
+    print("🧪 测试中间件错误处理...")
+    for fused in MODES:
+        rate_limit.init_rate_limiter(requests=1, window=60)
+        try:
+            transport = httpx.ASGITransport(app=_create_app(fused), raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                missing = await client.get("/missing")
+                assert missing.status_code == 404
+                assert missing.json()["msg"] == "路由 GET /missing 不存在"
+                assert missing.json()["requestId"]
+                
+                limited = await client.get("/missing")
+                assert limited.status_code == 429, "限流异常由最外层错误处理转换"
+                assert limited.headers["Retry-After"]
+                assert limited.headers["RateLimit-Remaining"] == "0"
+                
+                await rate_limit.close_rate_limiter()
+                failed = await client.get("/boom")
+                assert failed.status_code == 500
+                assert failed.json()["msg"] == "Internal Server Error"
+                
+                preflight = await client.options("/health")
+                assert preflight.status_code == 200
+                assert preflight.headers["Allow"] == "HEAD,GET,POST,PUT,PATCH,DELETE,OPTIONS"
+                assert preflight.headers["X-Content-Type-Options"] == "nosniff"
+        finally:
+            await rate_limit.close_rate_limiter()
+    print("✅ 中间件错误处理测试通过")
+
+
+async def test_middleware_error_headers():
+    """测试统一格式的错误响应同样带有跨域头、安全头与 X-Request-Id"""
+    print("🧪 测试错误响应的响应头...")
+    origin = "https://app.example.com"
+    cors.init_cors(allow_origins=[origin])
+    try:
+        for fused in MODES:
+            rate_limit.init_rate_limiter(requests=2, window=60)
+            transport = httpx.ASGITransport(app=_create_app(fused), raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = [
+                    await client.get(path, headers={"Origin": origin})
+                    for path in ("/boom", "/missing", "/missing")
+                ]
+            assert [r.status_code for r in responses] == [500, 404, 429]
+            for response in responses:
+                assert response.headers["Access-Control-Allow-Origin"] == origin
+                assert response.headers["X-Content-Type-Options"] == "nosniff"
+                assert response.headers["Cache-Control"].startswith("no-cache")
+                assert response.headers["X-Request-Id"] == response.json()["requestId"]
+            await rate_limit.close_rate_limiter()
+    finally:
+        await rate_limit.close_rate_limiter()
+        cors.init_cors()
+    print("✅ 错误响应的响应头测试通过")
+
+
+async def test_deprecated_function_middlewares():
+    """测试旧函数式中间件按原方式注册（app.middleware("http")）仍可工作并发出弃用警告"""
+    print("🧪 测试弃用的函数式中间件...")
+    from common.middleware.header import no_cache_middleware
+    
+    app = FastAPI()
+    
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+    
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+    
+    # 旧的注册顺序：后注册的在外层
+    for func in (
+        middleware.rate_limit_middleware,
+        middleware.logger_middleware,
+        middleware.request_id_middleware,
+        no_cache_middleware,
+        middleware.options_middleware,
+        middleware.secure_middleware,
+        middleware.error_handler_middleware,
+    ):
+        app.middleware("http")(func)
+    
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/health")
+            assert response.status_code == 200
+            assert response.json() == {"status": "healthy"}
+            assert len(response.headers["X-Request-Id"]) == 36
+            assert response.headers["X-Content-Type-Options"] == "nosniff"
+            assert response.headers["Cache-Control"].startswith("no-cache")
+            
+            missing = await client.get("/missing")
+            assert missing.status_code == 404
+            assert missing.json()["msg"] == "路由 GET /missing 不存在"
+            
+            failed = await client.get("/boom")
+            assert failed.status_code == 500
+            assert failed.json()["msg"] == "Internal Server Error"
+            
+            preflight = await client.options("/health")
+            assert preflight.status_code == 200
+            assert preflight.headers["Allow"] == "HEAD,GET,POST,PUT,PATCH,DELETE,OPTIONS"
+    messages = {str(w.message) for w in caught if issubclass(w.category, DeprecationWarning)}
+    assert any("NoCacheMiddleware" in m for m in messages)
+    assert any("ErrorHandlerMiddleware" in m for m in messages)
+    print("✅ 弃用的函数式中间件测试通过")
+
+
+async def test_middleware_streaming():
+    """测试流式响应逐块透传"""
+    print("🧪 测试流式响应...")
+    for fused in MODES:
+        transport = httpx.ASGITransport(app=_create_app(fused))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async with client.stream("GET", "/stream") as response:
+                chunks = [chunk async for chunk in response.aiter_bytes()]
+        assert b"".join(chunks) == b"chunk0\nchunk1\nchunk2\n"
+        assert response.headers["X-Request-Id"]
+    print("✅ 流式响应测试通过")
+
+
+async def test_pipeline_route_stages():
+    """测试融合中间件按路由选择阶段"""
+    print("🧪 测试按路由选择中间件阶段...")
+    routes = [
+        MiddlewareRouteConfig(path="/health", stages=["error_handler", "request_id"]),
+        MiddlewareRouteConfig(path="/st*", stages=[]),
+    ]
+    rate_limit.init_rate_limiter(requests=1, window=60)
+    try:
+        transport = httpx.ASGITransport(app=_create_app(True, routes))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # /health 只经过错误处理与请求 ID，不计入限流
+            for _ in range(3):
+                health = await client.get("/health")
+                assert health.status_code == 200
+                assert health.headers["X-Request-Id"]
+                assert "X-RateLimit-Limit" not in health.headers
+                assert "Cache-Control" not in health.headers
+                assert "X-Content-Type-Options" not in health.headers
+            
+            # 无阶段的路由直接透传
+            stream = await client.get("/stream")
+            assert stream.status_code == 200
+            assert "X-Request-Id" not in stream.headers
+            
+            # 未命中规则的路径启用全部阶段
+            missing = await client.get("/missing")
+            assert missing.status_code == 404
+            assert missing.json()["requestId"]
+            assert (await client.get("/missing")).status_code == 429
+    finally:
+        await rate_limit.close_rate_limiter()
+    print("✅ 按路由选择中间件阶段测试通过")
@@ -0,0 +1,311 @@
+"""
+限流器单元测试（无需启动服务）
+"""
+import asyncio
+import sys
+import time
+from jose import jwt
+from starlette.requests import Request
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.config import RateLimitPolicyConfig
+from core.runtime import runtime
+from core.storage.cache import Memory
+from common.middleware import rate_limit
+from common.middleware.rate_limit import IdentityExtractor, RateLimiter, SLIDING_WINDOW_SCRIPT
+
+
+class FakeScriptCache(Memory):
+    """按 Lua 脚本语义在 Python 中执行滑动窗口脚本，记录调用次数"""
+    
+    def __init__(self):
+        super().__init__()
+        self.zsets = {}
+        self.calls = 0
+    
+    async def run_script(self, script, keys=(), args=()):
+        assert script is SLIDING_WINDOW_SCRIPT
+        self.calls += 1
+        await asyncio.sleep(0)
+        now, window, limit, member = int(args[0]), int(args[1]), int(args[2]), args[3]
+        zset = self.zsets.setdefault(keys[0], {})
+        for m, score in list(zset.items()):
+            if score <= now - window:
+                del zset[m]
+        if len(zset) >= limit:
+            return [0, 0, min(zset.values()) + window - now, max(zset.values()) + window - now]
+        zset[member] = now
+        return [1, limit - len(zset), 0, window]
+
+
+async def test_redis_sliding_window_single_call():
+    """测试 Redis 滑动窗口：每次检查一次脚本调用，同一时刻的请求不合并"""
+    print("🧪 测试 Redis 滑动窗口脚本...")
+    cache = FakeScriptCache()
+    runtime.set_cache_client("default", cache)
+    try:
+        limiter = RateLimiter(requests=5, window=60, use_redis=True)
+        results = await asyncio.gather(*(limiter.is_allowed("ip:1.1.1.1") for _ in range(8)))
+        
+        assert [r.allowed for r in results].count(True) == 5, "并发请求不应超出限额"
+        assert cache.calls == 8
+        assert len(cache.zsets["rate_limit:ip:1.1.1.1"]) == 5, "成员唯一，同一毫秒的请求不合并"
+        assert all(1 <= r.retry_after <= 60 for r in results if not r.allowed)
+        assert sorted(r.remaining for r in results) == [0, 0, 0, 0, 1, 2, 3, 4]
+        assert limiter.memory_store == {}
+    finally:
+        runtime.set_cache_client("default", None)
+    print("✅ Redis 滑动窗口脚本测试通过")
+
+
+async def test_redis_fallback_to_memory():
+    """测试缓存适配器不支持脚本时回退到内存模式"""
+    print("🧪 测试回退内存模式...")
+    runtime.set_cache_client("default", Memory())
+    try:
+        limiter = RateLimiter(requests=2, window=60, use_redis=True)
+        results = [await limiter.is_allowed("ip:2.2.2.2") for _ in range(3)]
+        assert [r.allowed for r in results] == [True, True, False]
+        assert "ip:2.2.2.2" in limiter.memory_store
+    finally:
+        runtime.set_cache_client("default", None)
+    print("✅ 回退内存模式测试通过")
+
+
+async def test_memory_sliding_log_ring():
+    """测试精确模式：环形缓冲长度固定为限额，窗口滑过后放行"""
+    print("🧪 测试环形缓冲精确模式...")
+    limiter = RateLimiter(requests=3, window=10)
+    assert [limiter._check_memory("k", t)[0] for t in (0, 1, 2, 3)] == [True, True, True, False]
+    assert limiter._check_memory("k", 9.5) == (False, 1, 0, 3)
+    assert limiter._check_memory("k", 10.0)[0] is True, "最早一次滑出窗口后放行"
+    assert len(limiter.memory_store["k"][1]) == 3
+    print("✅ 环形缓冲精确模式测试通过")
+
+
+async def test_memory_sliding_window_counter():
+    """测试滑动窗口计数：上一窗口按剩余时间加权"""
+    print("🧪 测试滑动窗口计数模式...")
+    limiter = RateLimiter(requests=10, window=10, algorithm="sliding_window")
+    assert all(limiter._check_memory("k", 5)[0] for _ in range(10))
+    assert limiter._check_memory("k", 5)[0] is False
+    
+    # 进入下一窗口 2.5 秒：上一窗口权重 0.75，估算 7.5，还可放行 2 次
+    assert [limiter._check_memory("k", 12.5)[0] for _ in range(3)] == [True, True, False]
+    assert limiter.memory_store["k"][1] == [1, 2, 10]
+    print("✅ 滑动窗口计数模式测试通过")
+
+
+async def test_memory_gc_and_max_keys():
+    """测试空闲标识清理与总数上限"""
+    print("🧪 测试空闲清理与上限...")
+    limiter = RateLimiter(requests=5, window=10, max_keys=100, gc_interval=30)
+    limiter._last_gc = 0
+    for i in range(150):
+        limiter._check_memory(f"ip:{i}", 1 + i * 0.1)
+    assert len(limiter.memory_store) == 100, "超出上限淘汰最久未访问的标识"
+    assert "ip:49" not in limiter.memory_store and "ip:50" in limiter.memory_store
+    
+    limiter._check_memory("ip:149", 22)
+    limiter._check_memory("active", 30)
+    # gc 时刻 30：10 秒内未访问的标识被清理
+    assert list(limiter.memory_store) == ["ip:149", "active"]
+    print("✅ 空闲清理与上限测试通过")
+
+
+async def test_memory_gcra_and_token_bucket():
+    """测试 GCRA / 令牌桶：允许 burst 次突发，之后按发放间隔均匀放行，每键一个数字"""
+    print("🧪 测试 GCRA 与令牌桶...")
+    for algorithm in ("gcra", "token_bucket"):
+        limiter = RateLimiter(requests=10, window=10, algorithm=algorithm, burst=3)
+        assert [limiter._check_memory("k", 100)[0] for _ in range(4)] == [True, True, True, False]
+        assert limiter._check_memory("k", 100) == (False, 1, 0, 3)
+        assert limiter._check_memory("k", 100.5)[0] is False
+        assert limiter._check_memory("k", 101)[0] is True, "每个发放间隔补充一次"
+        assert limiter._check_memory("k", 101)[0] is False
+        assert isinstance(limiter.memory_store["k"][1], float)
+        
+        # 空闲 burst 个间隔后桶重新装满
+        assert [limiter._check_memory("k", 105)[0] for _ in range(4)] == [True, True, True, False]
+    print("✅ GCRA 与令牌桶测试通过")
+
+
+async def test_remaining_and_reset():
+    """测试各算法在同一次检查中返回剩余次数与完全恢复时间"""
+    print("🧪 测试剩余次数与恢复时间...")
+    limiter = RateLimiter(requests=3, window=10)
+    assert [limiter._check_memory("k", t)[2:] for t in (0, 1, 2)] == [(2, 10), (1, 10), (0, 10)]
+    assert limiter._check_memory("k", 12.5)[2:] == (2, 10), "滑出窗口的记录被弹出"
+    
+    limiter = RateLimiter(requests=10, window=10, algorithm="sliding_window")
+    assert limiter._check_memory("k", 5)[2:] == (9, 15)
+    assert limiter._check_memory("k", 12.5)[2:] == (8, 18), "上一窗口计数按剩余权重计入"
+    
+    limiter = RateLimiter(requests=10, window=10, algorithm="gcra", burst=3)
+    assert [limiter._check_memory("k", 100)[2:] for _ in range(3)] == [(2, 1), (1, 2), (0, 3)]
+    print("✅ 剩余次数与恢复时间测试通过")
+
+
+async def test_unknown_algorithm():
+    """测试未知算法抛出 ValueError"""
+    try:
+        RateLimiter(algorithm="leaky")
+        assert False, "应抛出 ValueError"
+    except ValueError:
+        pass
+
+
+async def test_approximate_sync():
+    """测试近似分布式限流：两个 worker 本地计数，同步后按 worker 数均分剩余限额"""
+    print("🧪 测试近似分布式限流...")
+    cache = Memory()
+    workers = [RateLimiter(requests=10, window=3600, use_redis=True, sync_interval=1) for _ in range(2)]
+    try:
+        first, second = workers
+        now = time.time()
+        index = int(now // 3600)
+        assert [first._check_approximate("ip:1", now)[0] for _ in range(4)] == [True] * 4
+        assert [second._check_approximate("ip:1", now)[0] for _ in range(2)] == [True] * 2
+        
+        for worker in workers:
+            await worker._sync(cache)
+        await first._sync(cache)
+        assert first._workers == 2, "心跳键每周期只登记一次"
+        assert first._approx["ip:1"][1:] == [6, 0]
+        assert int(await cache.get(f"rate_limit:ip:1:{index}")) == 6, "本地计数已批量提交"
+        
+        # 剩余 4 次由两个 worker 各分 2 次
+        results = [first._check_approximate("ip:1", now) for _ in range(3)]
+        assert [r.allowed for r in results] == [True, True, False]
+        assert 1 <= results[2].retry_after <= 3600, "被拒绝时等待到窗口结束"
+        
+        # 已结束窗口的计数提交后清理
+        first._approx["ip:2"] = [index - 1, 0, 1]
+        await first._sync(cache)
+        assert "ip:2" not in first._approx
+        assert int(await cache.get(f"rate_limit:ip:2:{index - 1}")) == 1
+    finally:
+        for worker in workers:
+            await worker.close()
+    print("✅ 近似分布式限流测试通过")
+
+
+async def test_approximate_keeps_pending_counts():
+    """测试近似模式不丢弃未同步计数：淘汰跳过有未同步计数的标识，关闭时提交"""
+    print("🧪 测试未同步计数保留...")
+    cache = Memory()
+    previous = runtime.get_cache_client()
+    runtime.set_cache_client("default", cache)
+    limiter = RateLimiter(requests=10, window=3600, use_redis=True, sync_interval=1, max_keys=2)
+    try:
+        now = time.time()
+        index = int(now // 3600)
+        for key in ("ip:1", "ip:2", "ip:3"):
+            limiter._check_approximate(key, now)
+        assert set(limiter._approx) == {"ip:1", "ip:2", "ip:3"}, "有未同步计数的标识不被淘汰"
+        
+        await limiter._sync(cache)
+        limiter._check_approximate("ip:4", now)
+        assert "ip:1" not in limiter._approx, "同步后的标识可以淘汰"
+        assert "ip:4" in limiter._approx
+        
+        limiter._check_approximate("ip:4", now)
+        await limiter.close()
+        assert int(await cache.get(f"rate_limit:ip:4:{index}")) == 2, "关闭时提交未同步计数"
+    finally:
+        await limiter.close()
+        runtime.set_cache_client("default", previous)
+    print("✅ 未同步计数保留测试通过")
+
+
+async def test_policy_matcher():
+    """测试按方法、路径、角色匹配策略，各策略计数独立"""
+    print("🧪 测试限流策略...")
+    rate_limit.init_rate_limiter(requests=100, window=60, policies=[
+        RateLimitPolicyConfig(name="health", path="/health", requests=0),
+        RateLimitPolicyConfig(name="admin", path="/api/v1/*", roles=["admin"], requests=1000),
+        RateLimitPolicyConfig(name="login", path="/api/v1/login", methods=["POST"], requests=2),
+        RateLimitPolicyConfig(name="user_detail", path="/api/v1/users/{user_id}", methods=["get"], requests=5),
+    ])
+    matcher = rate_limit.get_policy_matcher()
+    try:
+        assert matcher.resolve("GET", "/health") == ("health", None)
+        assert matcher.resolve("POST", "/api/v1/login")[0] == "login"
+        assert matcher.resolve("POST", "/api/v1/login", "admin")[0] == "admin", "按配置顺序第一条命中生效"
+        assert matcher.resolve("GET", "/api/v1/login")[0] == "default"
+        assert matcher.resolve("GET", "/api/v1/users/42")[0] == "user_detail"
+        assert matcher.resolve("GET", "/api/v1/users/42/roles")[0] == "default"
+        assert matcher.resolve("GET", "/api/v1/users/42") is matcher.resolve("GET", "/api/v1/users/42"), "结果已缓存"
+        
+        _, login = matcher.resolve("POST", "/api/v1/login")
+        default = rate_limit.get_rate_limiter()
+        assert [(await login.is_allowed("ip:1"))[0] for _ in range(3)] == [True, True, False]
+        assert (await default.is_allowed("ip:1"))[0] is True, "各策略计数互不影响"
+        assert "login:ip:1" in login.memory_store
+    finally:
+        await rate_limit.close_rate_limiter()
+    assert rate_limit.get_policy_matcher() is None
+    print("✅ 限流策略测试通过")
+
+
+def _request(headers: dict, host: str = "10.0.0.1") -> Request:
+    """构造只包含请求头和客户端地址的请求"""
+    return Request({
+        "type": "http",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": (host, 12345),
+    })
+
+
+async def test_identity_extractor():
+    """测试限流标识提取：只有验签过的 Token 按用户计数，未验签、过期或无效 Token 回退到 IP"""
+    print("🧪 测试限流标识提取...")
+    extractor = IdentityExtractor()
+    claims = {"identity": 42, "rolekey": "admin", "exp": time.time() + 60}
+    token = jwt.encode(claims, "any-secret")
+    request = _request({"Authorization": f"Bearer {token}"})
+    
+    assert extractor.extract(request) == ("ip:10.0.0.1", ""), "未验签的声明不参与限流"
+    assert len(extractor._cache) == 0, "未验签的 Token 不写入缓存"
+    
+    extractor.verified(request, claims)
+    assert extractor.extract(request) == ("user:42", "admin")
+    assert extractor.extract(request) == ("user:42", "admin")
+    
+    expired_claims = {"identity": 7, "exp": time.time() - 1}
+    expired = _request({"Authorization": f"Bearer {jwt.encode(expired_claims, 'any-secret')}"})
+    extractor.verified(expired, expired_claims)
+    assert extractor.extract(expired) == ("ip:10.0.0.1", "")
+    assert extractor.extract(_request({"Authorization": "Bearer not-a-jwt"})) == ("ip:10.0.0.1", "")
+    assert extractor.extract(_request({"X-Forwarded-For": "1.2.3.4, 10.0.0.1"})) == ("ip:1.2.3.4", "")
+    print("✅ 限流标识提取测试通过")
+
+
+async def test_forged_tokens_share_ip_bucket():
+    """测试伪造 Token：每次换一个未签名 Token 或冒用他人身份，仍与同一 IP 共用计数桶"""
+    print("🧪 测试伪造 Token 限流...")
+    extractor = IdentityExtractor()
+    limiter = RateLimiter(requests=3, window=60)
+    try:
+        victim = {"identity": 1, "exp": time.time() + 60}
+        victim_request = _request({"Authorization": f"Bearer {jwt.encode(victim, 'server-secret')}"}, host="10.0.0.9")
+        extractor.verified(victim_request, victim)
+        
+        results = []
+        for i in range(5):
+            forged = jwt.encode({"identity": 1000 + i if i % 2 else 1, "exp": time.time() + 60}, "attacker")
+            key, _ = extractor.extract(_request({"Authorization": f"Bearer {forged}"}, host="6.6.6.6"))
+            assert key == "ip:6.6.6.6"
+            results.append((await limiter.is_allowed(key)).allowed)
+        assert results == [True, True, True, False, False], "伪造 Token 共用同一 IP 的计数桶"
+        
+        # 受害者的计数桶未被消耗
+        key, _ = extractor.extract(victim_request)
+        assert key == "user:1"
+        assert (await limiter.is_allowed(key)).remaining == 2
+    finally:
+        await limiter.close()
+    print("✅ 伪造 Token 限流测试通过")
@@ -0,0 +1,128 @@
+"""
+快速 JSON 响应测试（无需启动服务）
+"""
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+from common.response import FastJSONResponse, TrustedRoute, encode_envelope
+from common.schemas.pagination import PaginationResponse
+from common.schemas.response import APIResponse
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+    note: Optional[str] = None
+
+
+def _items(count: int) -> PaginationResponse[Item]:
+    return PaginationResponse[Item](
+        page=1,
+        page_size=count,
+        total=count,
+        list=[Item(id=i, name=f"用户{i}") for i in range(count)],
+    )
+
+
+def _create_router(route_class) -> APIRouter:
+    """同一组端点，分别使用默认路由与可信路由"""
+    router = APIRouter(prefix="/items", route_class=route_class)
+    
+    @router.get("/page", response_model=APIResponse[PaginationResponse[Item]])
+    async def page():
+        return APIResponse(data=_items(3))
+    
+    @router.get("/plain", response_model=APIResponse[PaginationResponse[Item]])
+    async def plain():
+        # 未参数化的泛型：类型不一致，走默认校验流程
+        return APIResponse(data=PaginationResponse(page=1, page_size=1, total=1, list=[Item(id=1, name="a")]))
+    
+    @router.post("", response_model=APIResponse[bool], status_code=201)
+    async def create():
+        return APIResponse(data=True, msg="已创建")
+    
+    @router.get("/empty", response_model=APIResponse[Item])
+    async def empty():
+        return APIResponse(code=404, msg="不存在")
+    
+    @router.get("/header", response_model=APIResponse[Item])
+    async def header(response: Response):
+        # 注入的 Response 上设置的头、Cookie 与状态码需要保留
+        response.headers["X-Item-Count"] = "1"
+        response.set_cookie("seen", "1")
+        response.status_code = 202
+        return APIResponse(data=Item(id=1, name="a"))
+    
+    return router
+
+
+def _create_app(route_class) -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.include_router(_create_router(route_class))
+    return app
+
+
+def test_fast_json_response():
+    """测试与 JSONResponse 输出一致，已编码内容直接使用"""
+    print("🧪 测试 FastJSONResponse...")
+    content = {"code": 200, "msg": "成功", "data": {"list": [1, 2.5, None, True]}}
+    assert FastJSONResponse(content).body == JSONResponse(content).body
+    assert FastJSONResponse(b'{"a":1}').body == b'{"a":1}'
+    assert json.loads(FastJSONResponse({"item": Item(id=1, name="a")}).body) == {"item": {"id": 1, "name": "a", "note": None}}
+    
+    envelope = encode_envelope(200, "success", b"[1]", "rid")
+    assert json.loads(envelope) == APIResponse(data=[1], request_id="rid").model_dump()
+    print("✅ FastJSONResponse 测试通过")
+
+
+async def test_trusted_route():
+    """测试可信路由与默认路由的响应一致"""
+    print("🧪 测试 TrustedRoute...")
+    responses = {}
+    for route_class in (APIRoute, TrustedRoute):
+        transport = httpx.ASGITransport(app=_create_app(route_class))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses[route_class] = [
+                await client.get("/items/page"),
+                await client.get("/items/plain"),
+                await client.post("/items"),
+                await client.get("/items/empty"),
+                await client.get("/items/header"),
+            ]
+    for default, trusted in zip(responses[APIRoute], responses[TrustedRoute]):
+        assert trusted.status_code == default.status_code
+        assert trusted.headers["content-type"] == "application/json"
+        assert trusted.json() == default.json()
+    assert responses[TrustedRoute][2].status_code == 201
+    assert responses[TrustedRoute][0].json()["data"]["list"][2]["name"] == "用户2"
+    header = responses[TrustedRoute][4]
+    assert header.status_code == 202
+    assert header.headers["X-Item-Count"] == "1"
+    assert header.cookies["seen"] == "1"
+    print("✅ TrustedRoute 测试通过")
+
+
+async def test_trusted_route_skips_validation():
+    """测试可信输出直接序列化，类型不一致时交给默认流程"""
+    print("🧪 测试可信输出跳过校验...")
+    routes = {route.path: route for route in _create_router(TrustedRoute).routes}
+    
+    page = await routes["/items/page"].endpoint()
+    assert isinstance(page, FastJSONResponse), "类型一致：直接生成响应"
+    assert json.loads(page.body)["data"]["total"] == 3
+    
+    plain = await routes["/items/plain"].endpoint()
+    assert isinstance(plain, APIResponse), "类型不一致：返回原值，由 response_model 校验"
+    
+    assert routes["/items/header"].data_type is None, "注入 Response 参数的端点不走快速路径"
+    print("✅ 可信输出跳过校验测试通过")
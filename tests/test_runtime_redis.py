@@ -0,0 +1,136 @@
+"""
+Runtime 共享 Redis 连接池测试
+使用本地 Redis 协议替身服务，无需真实 Redis
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.runtime.runtime import Runtime
+
+
+class PingServer:
+    """最小化 Redis 协议替身：PING 回复 PONG，其他命令回复 OK，记录当前打开的连接数"""
+    
+    def __init__(self):
+        self.connections = 0
+        self.port = 0
+        self._server = None
+    
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+    
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:].strip())):
+                    size = int((await reader.readline())[1:].strip())
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                writer.write(b"+PONG\r\n" if args[0].upper() == b"PING" else b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+    
+    async def wait_closed(self) -> None:
+        """等待服务端感知到所有连接关闭"""
+        for _ in range(100):
+            if self.connections == 0:
+                return
+            await asyncio.sleep(0.01)
+
+
+async def test_acquire_release_redis():
+    """测试相同参数共享连接池、不同参数分开、最后一次释放时关闭"""
+    print("🧪 测试共享 Redis 连接池...")
+    server = PingServer()
+    await server.start()
+    runtime = Runtime()
+    try:
+        first = await runtime.acquire_redis(host="127.0.0.1", port=server.port)
+        second = await runtime.acquire_redis(host="127.0.0.1", port=server.port)
+        assert first is second, "相同参数复用同一个客户端"
+        
+        other_db = await runtime.acquire_redis(host="127.0.0.1", port=server.port, db=1)
+        other_options = await runtime.acquire_redis(host="127.0.0.1", port=server.port, socket_timeout=5)
+        assert other_db is not first and other_options is not first, "不同参数使用各自的连接池"
+        assert len(runtime._redis_pools) == 3
+        
+        await runtime.release_redis(first)
+        assert first in runtime._redis_pools.values(), "仍有引用时不关闭"
+        await runtime.release_redis(second)
+        assert first not in runtime._redis_pools.values(), "最后一次释放时关闭连接池"
+        
+        await runtime.release_redis(other_db)
+        await runtime.release_redis(other_options)
+        assert runtime._redis_pools == {} and runtime._redis_refs == {}
+        await server.wait_closed()
+        assert server.connections == 0
+    finally:
+        await runtime.close_all()
+        await server.stop()
+    print("✅ 共享 Redis 连接池测试通过")
+
+
+async def test_release_waits_for_acquire():
+    """测试释放与并发获取串行执行，不会关闭刚被取走的连接池"""
+    print("🧪 测试释放与获取并发...")
+    server = PingServer()
+    await server.start()
+    runtime = Runtime()
+    try:
+        client = await runtime.acquire_redis(host="127.0.0.1", port=server.port)
+        
+        # 持有锁期间先排队 acquire 再排队 release，两者按顺序执行
+        async with runtime._get_redis_lock():
+            acquiring = asyncio.create_task(runtime.acquire_redis(host="127.0.0.1", port=server.port))
+            await asyncio.sleep(0)
+            releasing = asyncio.create_task(runtime.release_redis(client))
+            await asyncio.sleep(0)
+            assert client in runtime._redis_pools.values(), "release 等待锁，不提前关闭"
+        acquired, _ = await asyncio.gather(acquiring, releasing)
+        
+        assert acquired is client, "acquire 取到原连接池"
+        assert list(runtime._redis_refs.values()) == [1]
+        assert await acquired.ping() is True, "取走的连接池仍可用"
+        await runtime.release_redis(acquired)
+        assert runtime._redis_pools == {}
+    finally:
+        await runtime.close_all()
+        await server.stop()
+    print("✅ 释放与获取并发测试通过")
+
+
+async def test_close_all_closes_leftover_pools():
+    """测试 close_all 关闭仍被持有的连接池"""
+    print("🧪 测试 close_all 关闭剩余连接池...")
+    server = PingServer()
+    await server.start()
+    runtime = Runtime()
+    try:
+        await runtime.acquire_redis(host="127.0.0.1", port=server.port)
+        await runtime.acquire_redis(host="127.0.0.1", port=server.port, db=2)
+        assert server.connections == 2
+        
+        await runtime.close_all()
+        assert runtime._redis_pools == {} and runtime._redis_refs == {}
+        await server.wait_closed()
+        assert server.connections == 0, "close_all 断开剩余连接"
+    finally:
+        await server.stop()
+    print("✅ close_all 测试通过")
@@ -0,0 +1,160 @@
+"""
+共享内存计数表测试 - 多进程计数与滑动窗口限流
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import sys
+from pathlib import Path
+from uuid import uuid4
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.storage import SharedCounters
+from core.storage.counter.shared import _key_hash
+from common.middleware.rate_limit import RateLimiter
+
+
+def _worker_incr(name: str, n: int) -> None:
+    """子进程：挂载同名计数表并递增 n 次"""
+    counters = SharedCounters(name, slots=1024)
+    for _ in range(n):
+        counters.incr("requests")
+    counters.close()
+
+
+def _worker_hit(name: str, n: int, allowed) -> None:
+    """子进程：对同一限流键请求 n 次，记录放行次数"""
+    counters = SharedCounters(name, slots=1024)
+    # 窗口取 1 小时，避免测试期间跨越窗口边界
+    passed = sum(1 for _ in range(n) if counters.hit("ip:1.2.3.4", 100, 3600)[0])
+    with allowed.get_lock():
+        allowed.value += passed
+    counters.close()
+
+
+def _worker_killed(name: str) -> None:
+    """子进程：挂载计数表后被强制结束，不调用 close"""
+    SharedCounters(name, slots=1024).incr("requests")
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def test_incr_across_processes():
+    """测试多进程递增同一计数不丢失"""
+    print("🧪 测试多进程计数...")
+    name = f"dy_test_{uuid4().hex[:8]}"
+    counters = SharedCounters(name, slots=1024)
+    
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_worker_incr, args=(name, 500)) for _ in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(60)
+        assert proc.exitcode == 0
+    
+    assert counters.get("requests") == 2000
+    counters.close()
+    if sys.platform == "linux":
+        assert not Path(f"/dev/shm/{name}").exists(), "最后一个进程卸载时应删除共享内存"
+    print("✅ 多进程计数测试通过")
+
+
+def test_limit_is_per_host():
+    """测试 4 个 worker 共享限额：总放行次数等于配置值，而不是 4 倍"""
+    print("🧪 测试跨 worker 限流...")
+    name = f"dy_test_{uuid4().hex[:8]}"
+    counters = SharedCounters(name, slots=1024)
+    
+    ctx = multiprocessing.get_context("spawn")
+    allowed = ctx.Value("i", 0)
+    procs = [ctx.Process(target=_worker_hit, args=(name, 60, allowed)) for _ in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(60)
+        assert proc.exitcode == 0
+    
+    assert allowed.value == 100
+    ok, retry_after, remaining, reset = counters.hit("ip:1.2.3.4", 100, 3600)
+    assert not ok and retry_after >= 1
+    assert remaining == 0 and reset >= retry_after
+    counters.close()
+    print("✅ 跨 worker 限流测试通过")
+
+
+def test_windows_and_eviction():
+    """测试窗口计数与槽位淘汰"""
+    print("🧪 测试窗口与淘汰...")
+    counters = SharedCounters(f"dy_test_{uuid4().hex[:8]}", slots=64, stripes=4)
+    
+    counters.incr("total", 5)
+    assert counters.incr("minute", 2, window=60) == 2
+    assert counters.get("minute") == 0, "不同窗口大小视为独立计数"
+    
+    # 写入远超槽位数的窗口计数，普通计数器最后才被淘汰
+    for i in range(500):
+        counters.incr(f"burst:{i}", window=1)
+    assert counters.get("total") == 5
+    
+    counters.reset("total")
+    assert counters.get("total") == 0
+    counters.close()
+    print("✅ 窗口与淘汰测试通过")
+
+
+def test_stale_attachment_cleared():
+    """测试被 SIGKILL 的 worker 遗留的挂载在下次挂载时清理，最后一个存活进程卸载时删除共享内存"""
+    if sys.platform != "linux":
+        print("⚠️  非 Linux 环境，跳过")
+        return
+    print("🧪 测试清理遗留挂载...")
+    name = f"dy_test_{uuid4().hex[:8]}"
+    ctx = multiprocessing.get_context("spawn")
+    proc = ctx.Process(target=_worker_killed, args=(name,))
+    proc.start()
+    proc.join(60)
+    assert proc.exitcode == -signal.SIGKILL
+    assert Path(f"/dev/shm/{name}").exists()
+    
+    counters = SharedCounters(name, slots=1024)
+    assert counters.get("requests") == 1, "计数保留"
+    assert counters._live_pids() == [os.getpid()], "已退出进程的挂载被清理"
+    counters.close()
+    assert not Path(f"/dev/shm/{name}").exists(), "遗留挂载不再阻止删除共享内存"
+    print("✅ 清理遗留挂载测试通过")
+
+
+async def test_ahit_yields_while_locked():
+    """测试分段锁被占用时 ahit 让出事件循环而不是阻塞"""
+    print("🧪 测试异步持锁...")
+    counters = SharedCounters(f"dy_test_{uuid4().hex[:8]}", slots=64, stripes=4)
+    stripe = _key_hash("user:1") % counters.stripes
+    
+    # 模拟其他持有者占用该分段
+    assert counters._try_lock(stripe)
+    task = asyncio.create_task(counters.ahit("user:1", 10, 60))
+    await asyncio.sleep(0.01)
+    assert not task.done(), "锁被占用时等待"
+    counters._unlock(stripe)
+    ok, _, remaining, _ = await asyncio.wait_for(task, 1)
+    assert ok and remaining == 9
+    assert counters._try_lock(stripe), "ahit 完成后释放分段锁"
+    counters._unlock(stripe)
+    counters.close()
+    print("✅ 异步持锁测试通过")
+
+
+async def test_rate_limiter_shared_backend():
+    """测试 RateLimiter 使用共享内存后端"""
+    print("🧪 测试限流器共享内存后端...")
+    limiter = RateLimiter(requests=3, window=60, use_shared_memory=True, shared_name=f"dy_test_{uuid4().hex[:8]}")
+    results = [await limiter.is_allowed("user:1") for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining for r in results] == [2, 1, 0, 0]
+    assert results[-1].retry_after >= 1
+    assert limiter.memory_store == {}
+    await limiter.close()
+    print("✅ 限流器共享内存后端测试通过")